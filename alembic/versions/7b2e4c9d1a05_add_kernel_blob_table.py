@@ -0,0 +1,71 @@
+"""add kernel_blob table
+
+Revision ID: 7b2e4c9d1a05
+Revises: 3dc38e5e11c3
+Create Date: 2026-10-18 09:12:41.518203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.mysql import MEDIUMBLOB, TINYINT
+
+# revision identifiers, used by Alembic.
+revision = '7b2e4c9d1a05'
+down_revision = '3dc38e5e11c3'
+branch_labels = None
+depends_on = None
+
+# kernel cache tables referencing kernel_blob
+KERNEL_CACHE_TABLES = [
+    'conv_job_cache_fin', 'conv_kernel_cache', 'bn_job_cache_fin',
+    'bn_kernel_cache'
+]
+
+
+def upgrade() -> None:
+  op.create_table('kernel_blob',
+                  sa.Column('id', sa.Integer, primary_key=True),
+                  sa.Column('insert_ts',
+                            sa.DateTime,
+                            nullable=False,
+                            server_default=sa.func.now()),
+                  sa.Column(
+                      'update_ts',
+                      sa.DateTime,
+                      nullable=False,
+                      server_default=sa.text(
+                          'CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP')),
+                  sa.Column('valid',
+                            TINYINT(1),
+                            nullable=False,
+                            server_default='1'),
+                  sa.Column('md5', sa.String(length=32), nullable=False),
+                  sa.Column('blob', MEDIUMBLOB, nullable=False),
+                  sa.Column('ref_count',
+                            sa.Integer,
+                            nullable=False,
+                            server_default='0'),
+                  sa.UniqueConstraint('md5', name='uq_idx'),
+                  mysql_engine='InnoDB')
+  for table in KERNEL_CACHE_TABLES:
+    op.alter_column(table,
+                    'kernel_blob',
+                    existing_type=MEDIUMBLOB,
+                    nullable=True)
+    op.add_column(table, sa.Column('blob_id', sa.Integer, nullable=True))
+    op.create_index(f'ix_{table}_blob_id', table, ['blob_id'])
+    op.create_foreign_key(f'fk_{table}_blob_id', table, 'kernel_blob',
+                          ['blob_id'], ['id'])
+
+
+def downgrade() -> None:
+  # rows moved to kernel_blob must be moved back before downgrading
+  for table in KERNEL_CACHE_TABLES:
+    op.drop_constraint(f'fk_{table}_blob_id', table, type_='foreignkey')
+    op.drop_index(f'ix_{table}_blob_id', table)
+    op.drop_column(table, 'blob_id')
+    op.alter_column(table,
+                    'kernel_blob',
+                    existing_type=MEDIUMBLOB,
+                    nullable=False)
+  op.drop_table('kernel_blob')
@@ -27,6 +27,8 @@
 import os
 import sys
 import socket
+import logging
+from time import sleep
 from multiprocessing import Value, Lock, Queue
 
 sys.path.append("../tuna")
@@ -46,6 +48,7 @@ from tuna.miopen_tables import ConvolutionJob
 from load_job import test_tag_name as tag_name_test, add_jobs
 from utils import add_test_session
 from tuna.dbBase.sql_alchemy import DbSession
+from tuna.abort import AbortWatcher, chk_abort_flag
 
 
 def test_abort():
@@ -144,3 +147,25 @@ def test_abort():
     print(res)
     assert (res[0][0] == num_jobs)
   os.remove('/tmp/miopen_abort_mid_{}'.format(m.id))
+
+
+def test_abort_watcher():
+  mid = 12345
+  mid_abort = '/tmp/miopen_abort_mid_{}'.format(mid)
+  if os.path.exists(mid_abort):
+    os.remove(mid_abort)
+
+  watcher = AbortWatcher(interval=0.1)
+  flag = watcher.watch(mid, 'gfx_test')
+  assert flag.value == 0
+  assert watcher.watch(mid, 'gfx_test') is flag
+
+  os.mknod(mid_abort)
+  sleep(0.5)
+  assert flag.value == 1
+  assert chk_abort_flag(flag, mid, logging.getLogger('test_abort'), 'gfx_test')
+
+  os.remove(mid_abort)
+  sleep(0.5)
+  assert flag.value == 0
+  watcher.stop()
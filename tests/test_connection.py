@@ -26,6 +26,7 @@
 
 import sys
 import pytest
+from types import SimpleNamespace
 
 sys.path.append("../tuna")
 sys.path.append("tuna")
@@ -54,6 +55,94 @@ def commands(cnx):
   assert (o is not None)
 
 
+def transfers(cnx):
+  filename = '/tmp/tuna_sftp_test'
+  cnx.write_file(b'tuna', filename)
+  assert (cnx.read_file(filename) == b'tuna')
+  cnx.write_file(b'tuna_sftp', filename)
+  assert (cnx.read_file(filename) == b'tuna_sftp')
+
+  stats = cnx.get_xfer_stats()
+  assert (stats['sftp_opens'] == 1)
+  assert (stats['writes'] == 2 and stats['reads'] == 2)
+  assert (stats['bytes_written'] == 13 and stats['bytes_read'] == 13)
+
+  cnx.close_sftp()
+  assert (cnx.read_file(filename) == b'tuna_sftp')
+  assert (cnx.get_xfer_stats()['sftp_opens'] == 2)
+
+
+class CatChannel():
+  """Remote cat over a channel with a small window, it only reads more input
+  while its unread output fits the window"""
+  window = 64
+
+  def __init__(self):
+    self.out = b''
+    self.eof = False
+    self.sent = 0
+
+  def send_ready(self):
+    return len(self.out) < self.window
+
+  def send(self, data):
+    data = data[:self.window - len(self.out)]
+    self.out += data
+    self.sent += len(data)
+    return len(data)
+
+  def shutdown_write(self):
+    self.eof = True
+
+  def recv_ready(self):
+    return bool(self.out)
+
+  def recv(self, size):
+    data, self.out = self.out[:size], self.out[size:]
+    return data
+
+  def recv_stderr_ready(self):
+    return False
+
+  def exit_status_ready(self):
+    return self.eof and not self.out
+
+  def recv_exit_status(self):
+    return 0
+
+
+class CatSSH():
+
+  def __init__(self):
+    self.channel = CatChannel()
+
+  def get_transport(self):
+    return self
+
+  def is_active(self):
+    return True
+
+  def exec_command(self, _cmd, timeout=None):
+    return None, SimpleNamespace(channel=self.channel), None
+
+
+def test_exec_stream_window():
+  cnx = Connection.__new__(Connection)
+  cnx.local_machine = False
+  cnx.ssh = CatSSH()
+
+  #the input is far larger than the window, output is drained while sending
+  data = bytes(range(256)) * 64
+  ret_code, out, err = cnx.exec_stream('cat', data)
+  assert (ret_code == 0)
+  assert (out == data)
+  assert (err == '')
+
+  cnx.ssh = CatSSH()
+  assert (cnx.exec_stream('cat', b'') == (0, b'', ''))
+  assert (cnx.ssh.channel.eof)
+
+
 def test_machine():
   res = None
   with DbCursor() as cur:
@@ -82,3 +171,4 @@ def test_machine():
   commands(cnx1)
 
   commands(cnx2)
+  transfers(cnx2)
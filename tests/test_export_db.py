@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+import os
+import sys
+import tempfile
+
+sys.path.append("../tuna")
+sys.path.append("tuna")
+
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.find_db import ConvolutionFindDB
+from tuna.miopen_tables import ConvolutionConfig, Solver
+from tuna.tables import DBTables
+from tuna.export_db import export_fdb, export_pdb
+from utils import add_test_session, DummyArgs
+
+NUM_CONFIGS = 8
+NUM_SOLVERS = 3
+NUM_JOBS = 3
+
+
+def add_fdb_entries(session_id):
+  """add a find db row per config and tunable solver, the fdb keys spread
+  over the export shards"""
+  with DbSession() as session:
+    cfg_ids = [
+        row[0] for row in session.query(ConvolutionConfig.id).order_by(
+            ConvolutionConfig.id).limit(NUM_CONFIGS).all()
+    ]
+    solver_ids = [
+        row[0] for row in session.query(Solver.id).filter(
+            Solver.tunable == 1).order_by(Solver.id).limit(NUM_SOLVERS).all()
+    ]
+    for cfg_idx, cfg_id in enumerate(cfg_ids):
+      for solver_idx, solver_id in enumerate(solver_ids):
+        fdb_entry = ConvolutionFindDB()
+        fdb_entry.config = cfg_id
+        fdb_entry.solver = solver_id
+        fdb_entry.session = session_id
+        fdb_entry.opencl = False
+        fdb_entry.fdb_key = f'export_test_{cfg_idx}'
+        fdb_entry.alg_lib = 'miopenConvolutionFwdAlgoDirect'
+        fdb_entry.params = f'{cfg_idx},{solver_idx}'
+        fdb_entry.workspace_sz = solver_idx
+        fdb_entry.valid = True
+        fdb_entry.kernel_time = 10 * cfg_idx + solver_idx + 1
+        session.add(fdb_entry)
+    session.commit()
+
+
+def export_args(session_id, jobs, filename):
+  args = DummyArgs()
+  args.session_id = session_id
+  args.golden_v = None
+  args.config_tag = None
+  args.opencl = False
+  args.arch = 'gfx908'
+  args.num_cu = 120
+  args.jobs = jobs
+  args.filename = filename
+  return args
+
+
+def read_file(file_name):
+  with open(file_name, 'rb') as fin:
+    return fin.read()
+
+
+def test_export_db():
+  session_id = add_test_session()
+  add_fdb_entries(session_id)
+  dbt = DBTables(session_id=session_id)
+
+  #the exports write to the cwd, keep the outputs out of the checkout
+  cwd = os.getcwd()
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    os.chdir(tmp_dir)
+    try:
+      for export in (export_fdb, export_pdb):
+        serial = export(dbt, export_args(session_id, 1, 'serial'))
+        sharded = export(dbt, export_args(session_id, NUM_JOBS, 'sharded'))
+        assert (read_file(serial))
+        assert (read_file(serial) == read_file(sharded))
+        #the shard files are merged and removed
+        assert (not [
+            name for name in os.listdir(os.path.dirname(sharded))
+            if '.shard' in name
+        ])
+    finally:
+      os.chdir(cwd)
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+from collections import namedtuple
+
+from tuna.utils.fdb_records import FdbRecords
+
+Row = namedtuple(
+    'Row', ['fdb_key', 'solver', 'alg_lib', 'kernel_time', 'workspace_sz'])
+
+
+def test_fastest_rows():
+  rows = [
+      Row('b', 1, 'Direct', 0.3, 0),
+      Row('b', 2, 'Direct', 0.1, 0),
+      Row('b', 3, 'GEMM', 0.1, 8),
+      Row('b', 1, 'Direct', 0.05, 0),
+      Row('a', 4, 'GEMM', 0.2, 8)
+  ]
+  records = FdbRecords.from_rows(rows)
+  assert records.keys == ['a', 'b']
+  assert len(records) == 5
+
+  #second row of solver 1 for key b is a duplicate
+  kept = records.unique_solvers()
+  assert kept.tolist() == [0, 1, 2, 4]
+
+  #fastest per algorithm, ordered by key then time, Direct came first on ties
+  fastest = records.fastest(kept)
+  assert fastest.tolist() == [4, 1, 2]
+  assert records.split_by_key(fastest) == [('a', [4]), ('b', [1, 2])]
+
+
+def test_text_records():
+  find_db = {
+      'k2': {
+          'Direct': 'SlvA,0.5,0,Direct,not used',
+          'GEMM': 'SlvB,0.25,64,GEMM,not used'
+      },
+      'k1': {
+          'Direct': 'SlvC,1.0,0,Direct,not used'
+      },
+      'k0': {}
+  }
+  records = FdbRecords.from_text(find_db)
+  assert records.keys == ['k0', 'k1', 'k2']
+  assert records.workspace_sz.tolist() == [0, 64, 0]
+  assert records.best_solvers() == {'k1': ('SlvC', 1.0), 'k2': ('SlvB', 0.25)}
+
+  order = records.ordered()
+  assert [records.rows[idx] for idx in order] == [
+      'SlvC,1.0,0,Direct,not used', 'SlvB,0.25,64,GEMM,not used',
+      'SlvA,0.5,0,Direct,not used'
+  ]
+  assert records.key_counts(order) == [0, 1, 2]
+
+
+def test_text_records_tolerant():
+  find_db = {
+      'k1': {
+          'Direct': 'SlvA,0.5',
+          'GEMM': 'SlvB,0.25,64,GEMM',
+          'Winograd': 'SlvC'
+      },
+      'k0': {
+          'Direct': 'SlvD,not a time,0,Direct,not used'
+      }
+  }
+  #values without a workspace default to 0, without a time are skipped
+  records = FdbRecords.from_text(find_db)
+  assert records.keys == ['k0', 'k1']
+  assert records.rows == ['SlvA,0.5', 'SlvB,0.25,64,GEMM']
+  assert records.workspace_sz.tolist() == [0, 64]
+  assert records.best_solvers() == {'k1': ('SlvB', 0.25)}
@@ -42,6 +42,7 @@ from load_job import test_tag_name as tag_name_test, add_jobs
 from utils import CfgImportArgs, LdJobArgs, GoFishArgs
 from utils import get_worker_args, add_test_session
 from tuna.metadata import ALG_SLV_MAP, get_solver_ids
+from tuna.miopen_tables import KernelBlob
 
 
 def add_cfgs():
@@ -121,3 +122,14 @@ def test_fin_builder():
     count = session.query(dbt.job_table).filter(dbt.job_table.session==args.session_id)\
                                          .filter(dbt.job_table.state=='compiled').count()
     assert (count == num_jobs)
+
+    #kernels of the compiled jobs are stored once in kernel_blob
+    kernels = session.query(dbt.kernel_cache.blob_id, dbt.kernel_cache.kernel_blob)\
+                     .join(dbt.find_db_table, dbt.find_db_table.kernel_group == dbt.kernel_cache.kernel_group)\
+                     .filter(dbt.find_db_table.session == args.session_id).all()
+    assert (kernels)
+    for blob_id, kernel_blob in kernels:
+      assert (blob_id is not None and kernel_blob is None)
+    blob_ids = set(blob_id for blob_id, _ in kernels)
+    assert (session.query(KernelBlob).filter(
+        KernelBlob.id.in_(blob_ids)).count() == len(blob_ids))
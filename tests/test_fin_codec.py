@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import sys
+
+sys.path.append("../tuna")
+sys.path.append("tuna")
+
+import subprocess
+
+from tuna.utils.fin_codec import FIN_CODECS, CODEC_TOOLS, CODEC_ERRORS
+from tuna.utils.fin_codec import negotiate_codec, get_tools_cmd
+from tuna.utils.fin_codec import compress, decompress, wrap_cmd
+
+PAYLOAD = b'{"config": {"batchsize": 128}, "steps": ["miopen_find_eval"]}' * 64
+
+
+def run_wrapped(codec, cmd, data):
+  """Run the wrapped cmd locally the way it runs on the machine"""
+  return subprocess.run(['bash', '-c', wrap_cmd(codec, cmd)],
+                        input=compress(codec, data),
+                        stdout=subprocess.PIPE,
+                        stderr=subprocess.PIPE,
+                        check=False)
+
+
+def test_round_trip():
+  for codec in FIN_CODECS:
+    if codec == 'auto':
+      continue
+    data = compress(codec, PAYLOAD)
+    assert decompress(codec, data) == PAYLOAD
+    if codec != 'none':
+      assert len(data) < len(PAYLOAD)
+
+  #corrupt payloads raise one of the errors the caller falls back on
+  for codec in CODEC_TOOLS:
+    data = compress(codec, PAYLOAD)
+    try:
+      decompress(codec, data[:len(data) // 2])
+      assert False
+    except CODEC_ERRORS:
+      pass
+
+
+def test_negotiate_codec():
+  assert get_tools_cmd() == 'which xz gzip'
+
+  #output of which on machines with both, one or none of the tools
+  assert negotiate_codec('/usr/bin/xz\n/usr/bin/gzip\n') == 'lzma'
+  assert negotiate_codec('/usr/bin/gzip\n') == 'gzip'
+  assert negotiate_codec('/usr/bin/xz\n') == 'lzma'
+  assert negotiate_codec('') == 'none'
+
+  #an explicit codec is kept whatever is installed
+  assert negotiate_codec('/usr/bin/gzip\n', 'lzma') == 'lzma'
+  assert negotiate_codec('', 'gzip') == 'gzip'
+  assert negotiate_codec('/usr/bin/xz\n', 'none') == 'none'
+
+
+def test_wrap_cmd():
+  assert wrap_cmd('none', 'fin -i -') == 'fin -i -'
+  for codec in CODEC_TOOLS:
+    cmd = wrap_cmd(codec, 'fin -i -')
+    assert cmd.startswith('set -o pipefail; ')
+    assert '| fin -i - |' in cmd
+
+    #the payload goes through the remote tools unchanged
+    ret = run_wrapped(codec, 'cat', PAYLOAD)
+    assert ret.returncode == 0
+    assert decompress(codec, ret.stdout) == PAYLOAD
+
+    #pipefail keeps the exit code of cmd although the compressor succeeds
+    ret = run_wrapped(codec, 'sh -c "cat > /dev/null; exit 3"', PAYLOAD)
+    assert ret.returncode == 3
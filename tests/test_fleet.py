@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+
+import sys
+
+sys.path.append("../tuna")
+sys.path.append("tuna")
+
+from threading import Lock
+from time import sleep
+
+from tuna.fleet import FleetExecutor, DRY_RUN_TASK_TIME
+
+
+class FakeMachine():
+  """Machine with an address only, the tasks never reach it"""
+
+  def __init__(self, hostname, port):
+    self.hostname = hostname
+    self.port = port
+    self.closed = []
+
+  def new_connection(self):
+    return FakeCnx(self)
+
+
+class FakeCnx():
+  """Connection recording that it was closed"""
+
+  def __init__(self, machine):
+    self.machine = machine
+
+  def close(self):
+    self.machine.closed.append(self)
+
+
+class InFlight():
+  """Counts the tasks running at once per host"""
+
+  def __init__(self):
+    self.lock = Lock()
+    self.running = {}
+    self.peak = {}
+
+  def __call__(self, machine, _cnx, _gpu_id):
+    with self.lock:
+      self.running[machine.hostname] = self.running.get(machine.hostname, 0) + 1
+      self.peak[machine.hostname] = max(self.peak.get(machine.hostname, 0),
+                                        self.running[machine.hostname])
+    sleep(0.02)
+    with self.lock:
+      self.running[machine.hostname] -= 1
+    return True, ''
+
+
+def test_dry_run():
+  machines = [
+      FakeMachine('h2', 22),
+      FakeMachine('h1', 23),
+      FakeMachine('h1', 22)
+  ]
+  fleet = FleetExecutor(max_workers=16,
+                        host_limit=2,
+                        dry_run=True,
+                        progress=None)
+  #queued in no particular order
+  for gpu_id in [3, 1, 2, 0]:
+    for machine in machines:
+      fleet.add(machine, 'gpu', None, gpu_id)
+  for machine in machines:
+    fleet.add(machine, 'docker', None)
+
+  tasks = fleet.run()
+  assert fleet.report()
+  assert all(task.success and task.output == 'dry run' for task in tasks)
+
+  #per host and port, the machine wide task first and then per gpu
+  order = [
+      (task.machine.hostname, task.machine.port, task.gpu_id) for task in tasks
+  ]
+  expected = []
+  for host, port in [('h1', 22), ('h1', 23), ('h2', 22)]:
+    expected.append((host, port, None))
+    expected.extend((host, port, gpu_id) for gpu_id in range(4))
+  assert order == expected
+
+  #5 tasks per machine, at most 2 at once, take at least 3 task times
+  assert fleet.elapsed >= 3 * DRY_RUN_TASK_TIME
+  assert all(not machine.closed for machine in machines)
+
+
+def test_host_limit():
+  machines = [FakeMachine('h1', 22), FakeMachine('h2', 22)]
+  in_flight = InFlight()
+  fleet = FleetExecutor(max_workers=16, host_limit=3, progress=None)
+  for machine in machines:
+    for gpu_id in range(8):
+      fleet.add(machine, 'gpu', in_flight, gpu_id)
+
+  tasks = fleet.run()
+  assert len(tasks) == 16
+  assert fleet.failed == 0
+  assert all(peak <= 3 for peak in in_flight.peak.values())
+
+  #every connection the tasks opened is closed at the end
+  for machine in machines:
+    assert 0 < len(machine.closed) <= 3
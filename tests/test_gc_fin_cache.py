@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+import sys
+from time import time
+from types import SimpleNamespace
+
+sys.path.append("../tuna")
+sys.path.append("tuna")
+
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.sql import DbCursor
+from tuna.miopen_tables import ConvolutionConfig, ConvolutionJob
+from tuna.miopen_tables import ConvFinJobCache, Solver
+from tuna.gc_fin_cache import FIN_CACHE_TABLES, gc_table, get_start_tables
+from tuna.gc_fin_cache import main as gc_main
+from utils import add_test_session
+
+# job states of the seeded rows, the last row stays fresh
+SEED_STATES = [
+    'compiled', 'eval_start', 'evaluating', 'evaluated', 'errored', 'evaluated'
+]
+
+
+def seed_cache_rows():
+  """add a job and a fin cache row per seeded state, all rows but the last one
+  are older than the ttl"""
+  session_id = add_test_session()
+  cache_ids = []
+  with DbSession() as session:
+    config_id = session.query(ConvolutionConfig.id).first()[0]
+    solvers = session.query(Solver.id, Solver.solver).order_by(Solver.id).limit(
+        len(SEED_STATES)).all()
+    for state, (solver_id, solver) in zip(SEED_STATES, solvers):
+      job = ConvolutionJob(session=session_id,
+                           config=config_id,
+                           solver=solver,
+                           state=state,
+                           reason='tuna_pytest_gc_fin_cache')
+      session.add(job)
+      session.flush()
+      cache = ConvFinJobCache(job_id=job.id,
+                              solver_id=solver_id,
+                              kernel_name='gc_test_kernel',
+                              kernel_args='-DGC_TEST',
+                              kernel_blob=b'0123456789',
+                              kernel_hash='0',
+                              uncompressed_size=10)
+      session.add(cache)
+      session.flush()
+      cache_ids.append(cache.id)
+    session.commit()
+
+  stale_ids = ', '.join(str(cache_id) for cache_id in cache_ids[:-1])
+  with DbCursor() as cur:
+    cur.execute(
+        "UPDATE conv_job_cache_fin SET update_ts = NOW() - INTERVAL 2 DAY"
+        f" WHERE id IN ({stale_ids})")
+  return cache_ids
+
+
+def get_left_ids(cache_ids):
+  with DbSession() as session:
+    return sorted(row[0] for row in session.query(ConvFinJobCache.id).filter(
+        ConvFinJobCache.id.in_(cache_ids)).all())
+
+
+def gc_args(**kwargs):
+  args = SimpleNamespace(ttl=24,
+                         chunk=2,
+                         time_budget=3600,
+                         pause=0,
+                         dry_run=False)
+  args.__dict__.update(kwargs)
+  return args
+
+
+def test_gc_fin_cache():
+  cache_ids = seed_cache_rows()
+  active_ids = cache_ids[:3]
+  stale_ids = cache_ids[3:5]
+  fresh_id = cache_ids[5]
+  start_id = cache_ids[0] - 1
+  deadline = time() + 3600
+
+  # tables before the one a run stopped in are skipped
+  assert (get_start_tables(
+      FIN_CACHE_TABLES[0][0].__tablename__) == FIN_CACHE_TABLES)
+  assert (get_start_tables(
+      FIN_CACHE_TABLES[1][0].__tablename__) == FIN_CACHE_TABLES[1:])
+  assert (get_start_tables('kernel_blob') == [])
+
+  # a dry run finds the stale rows of inactive jobs but deletes nothing
+  _, num_rows, freed, last_id = gc_table(ConvFinJobCache, ConvolutionJob,
+                                         gc_args(dry_run=True), deadline,
+                                         start_id)
+  assert (num_rows >= len(stale_ids))
+  assert (freed >= 10 * len(stale_ids))
+  assert (last_id is None)
+  assert (get_left_ids(cache_ids) == cache_ids)
+
+  argv = sys.argv
+  sys.argv = [
+      'gc_fin_cache.py', '--dry_run', '--pause', '0', '--chunk', '2',
+      '--start_table', ConvFinJobCache.__tablename__, '--start_id',
+      str(start_id)
+  ]
+  try:
+    gc_main()
+  finally:
+    sys.argv = argv
+  assert (get_left_ids(cache_ids) == cache_ids)
+
+  # a spent time budget returns the id to resume from
+  scanned, num_rows, _, last_id = gc_table(ConvFinJobCache, ConvolutionJob,
+                                           gc_args(),
+                                           time() - 1, start_id)
+  assert (scanned == 0 and num_rows == 0)
+  assert (last_id == start_id)
+
+  # resuming after the first stale row leaves it and the rows before it
+  gc_table(ConvFinJobCache, ConvolutionJob, gc_args(), deadline, stale_ids[0])
+  assert (get_left_ids(cache_ids) == active_ids + [stale_ids[0], fresh_id])
+
+  # only the stale rows of inactive jobs are deleted
+  _, _, _, last_id = gc_table(ConvFinJobCache, ConvolutionJob, gc_args(),
+                              deadline, start_id)
+  assert (last_id is None)
+  assert (get_left_ids(cache_ids) == active_ids + [fresh_id])
@@ -26,13 +26,14 @@
 
 import os
 import sys
+import tempfile
 
 sys.path.append("../tuna")
 sys.path.append("tuna")
 
 this_path = os.path.dirname(__file__)
 
-from tuna.import_configs import import_cfgs
+from tuna.import_configs import import_cfgs, import_cfgs_bulk
 from tuna.sql import DbCursor
 from tuna.tables import DBTables, ConfigType
 from utils import CfgImportArgs
@@ -41,6 +42,7 @@ from utils import CfgImportArgs
 def test_importconfigs():
   test_import_conv()
   test_import_batch_norm()
+  test_import_conv_bulk()
 
 
 def test_import_conv():
@@ -114,3 +116,56 @@ def test_import_batch_norm():
     res = cur.fetchall()
     after_cfg_num = res[0][0]
     assert (after_cfg_num - before_cfg_num == counts['cnt_configs'])
+
+
+def test_import_conv_bulk():
+  dbt = DBTables(config_type=ConfigType.convolution)
+  res = None
+  clean_tags = "DELETE FROM conv_config_tags WHERE tag='conv_config_bulk_test';"
+  find_tags = "SELECT count(*) FROM conv_config_tags WHERE tag='conv_config_bulk_test';"
+  find_configs = "SELECT count(*), max(batchsize) FROM conv_config;"
+  with DbCursor() as cur:
+    cur.execute(clean_tags)
+
+  before_cfg_num = 0
+  with DbCursor() as cur:
+    cur.execute(find_configs)
+    res = cur.fetchall()
+    before_cfg_num = res[0][0]
+    #batch sizes above any in the table make configs not imported yet
+    batchsize = (res[0][1] or 0) + 1
+
+  num_lines = 3
+  with tempfile.NamedTemporaryFile('w', suffix='.txt') as cfg_file:
+    for i in range(num_lines):
+      cfg_file.write(
+          f"./bin/MIOpenDriver conv -n {batchsize + i} -c 64 -H 28 -W 28 -k 64"
+          " -y 3 -x 3 -p 1 -q 1 -u 1 -v 1 -l 1 -j 1 -m conv -g 1 -F 1 -t 1"
+          " --fil_layout NHWC --in_layout NHWC --out_layout NHWC\n")
+    cfg_file.flush()
+
+    args = CfgImportArgs
+    args.file_name = cfg_file.name
+    args.tag = "conv_config_bulk_test"
+    args.version = '1.0.0'
+    args.config_type = ConfigType.convolution
+    args.bulk = True
+    counts = import_cfgs_bulk(args, dbt)
+    assert (counts['cnt_configs'] > 0)
+    assert (counts['cnt_configs'] == num_lines)
+
+    with DbCursor() as cur:
+      cur.execute(find_tags)
+      res = cur.fetchall()
+      assert (res[0][0] == len(counts['cnt_tagged_configs']))
+
+      cur.execute(find_configs)
+      res = cur.fetchall()
+      after_cfg_num = res[0][0]
+      assert (after_cfg_num - before_cfg_num == counts['cnt_configs'])
+
+    #second import finds every config and inserts nothing
+    counts_again = import_cfgs_bulk(args, dbt)
+  assert (counts_again['cnt_configs'] == 0)
+  assert (counts_again['cnt_tagged_configs'] == counts['cnt_tagged_configs'])
+  args.bulk = False
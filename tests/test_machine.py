@@ -29,7 +29,11 @@ import sys
 sys.path.append("../tuna")
 sys.path.append("tuna")
 
+import os
+import tempfile
+
 from tuna.machine import Machine
+from tuna.machine_inventory import MachineInventory
 from tuna.sql import DbCursor
 
 
@@ -80,3 +84,29 @@ def test_machine():
 
   config_cpus(m)
   config_gpus(m)
+
+
+def test_machine_inventory():
+  m = Machine(hostname='localhost', local_machine=True)
+  m.get_num_cpus()
+  _, filename = tempfile.mkstemp()
+  os.remove(filename)
+
+  inv = MachineInventory(filename)
+  entry = inv.probe_all([m])[0]
+  assert (inv.misses == 1 and inv.hits == 0)
+  assert (entry['num_cpus'] == m.num_cpus)
+  assert (len(entry['gpus']) == len(m.gpus))
+  assert (os.path.isfile(filename))
+
+  m2 = Machine(hostname='localhost', local_machine=True)
+  inv = MachineInventory(filename)
+  inv.probe_all([m2])
+  assert (inv.hits == 1 and inv.misses == 0)
+  assert (m2.get_num_cpus() == m.num_cpus)
+  assert ([gpu['arch'] for gpu in m2.gpus] == [gpu['arch'] for gpu in m.gpus])
+
+  inv = MachineInventory(filename, ttl=0)
+  inv.probe_all([m2])
+  assert (inv.misses == 1)
+  os.remove(filename)
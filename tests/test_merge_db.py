@@ -26,6 +26,7 @@
 ###############################################################################
 import sys
 import os
+import tempfile
 
 from tuna.utils.merge_db import merge_files
 
@@ -55,6 +56,17 @@ def test_merge_fdb():
   master_db = parse_fdb(master_file)
   target_db = parse_fdb(target_file)
 
+  #merge_files writes to the cwd, keep the outputs out of the checkout
+  cwd = os.getcwd()
+  with tempfile.TemporaryDirectory() as tmp_dir:
+    os.chdir(tmp_dir)
+    try:
+      check_merge(master_file, target_file, master_db, target_db)
+    finally:
+      os.chdir(cwd)
+
+
+def check_merge(master_file, target_file, master_db, target_db):
   copy_only = False
   keep_keys = False
   output_file = merge_files(master_file, copy_only, keep_keys, target_file)
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+import sys
+
+sys.path.append("../tuna")
+sys.path.append("tuna")
+
+import base64
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+from io import StringIO
+
+from tuna.node_blob_cache import NodeBlobCache, FinInput, expand_blobs
+from tuna.node_blob_cache import BLOB_MISSING, BLOB_REF
+
+
+class LocalCnx():
+  """stands in for the connection to a remote machine"""
+
+  def exec_command(self, cmd):
+    subp = subprocess.run(['bash', '-c', cmd],
+                          capture_output=True,
+                          text=True,
+                          check=False)
+    return subp.returncode, StringIO(subp.stdout), StringIO(subp.stderr)
+
+  def write_file(self, contents, filename):
+    with open(filename, 'wb') as fout:
+      fout.write(contents)
+
+  def rename_file(self, src, dst):
+    os.replace(src, dst)
+
+
+class LocalMachine():
+  hostname = 'localhost'
+
+  def connect(self):
+    return LocalCnx()
+
+
+def kernel_obj(size):
+  blob = base64.b64encode(os.urandom(size)).decode()
+  return {'blob': blob, 'md5_sum': hashlib.md5(blob.encode()).hexdigest()}
+
+
+def fin_job(kernel_objs):
+  return {'miopen_perf_compile_result': [{'kernel_objects': kernel_objs}]}
+
+
+def expand(cache, fin_input):
+  return subprocess.run(['bash', '-c', cache.get_expand_cmd()],
+                        input=bytes(fin_input),
+                        capture_output=True,
+                        check=False)
+
+
+def test_node_blob_cache():
+  cache_dir = tempfile.mkdtemp()
+  cache = NodeBlobCache(LocalMachine(), size=1, cache_dir=cache_dir)
+  kernel_objs = [kernel_obj(200000), kernel_obj(100)]
+  fjobs = [fin_job(kernel_objs), fin_job([dict(kernel_objs[1])])]
+  orig = json.dumps(fjobs, indent=2).encode()
+
+  blobs = {}
+  assert (cache.prepare(fjobs[0], blobs) == (0, 2))
+  assert (cache.prepare(fjobs[1], blobs) == (1, 0))
+  assert (sorted(
+      os.listdir(cache_dir)) == sorted([obj['md5_sum'] for obj in kernel_objs] +
+                                       ['expand.awk']))
+  assert (fjobs[1]['miopen_perf_compile_result'][0]['kernel_objects'][0]['blob']
+          == BLOB_REF.format(kernel_objs[1]['md5_sum']))
+
+  fin_input = FinInput(json.dumps(fjobs, indent=2).encode(), blobs)
+  assert (len(fin_input) < len(orig) / 100)
+  assert (expand_blobs(fin_input) == orig)
+  assert (FinInput(b'{}').blobs == {})
+
+  # the filter on the machine splices the same blobs in
+  subp = expand(cache, fin_input)
+  assert (subp.returncode == 0)
+  assert (json.loads(subp.stdout) == json.loads(orig))
+
+  # blobs already on the machine are not uploaded again
+  cache = NodeBlobCache(LocalMachine(), size=1, cache_dir=cache_dir)
+  assert (cache.prepare(fin_job([dict(kernel_objs[0])]), {}) == (1, 0))
+
+  os.remove(os.path.join(cache_dir, kernel_objs[0]['md5_sum']))
+  subp = expand(cache, fin_input)
+  assert (subp.returncode == 2)
+  assert (BLOB_MISSING in subp.stderr.decode())
+
+  cache.forget([kernel_objs[0]['md5_sum']])
+  assert (not cache.is_cached(kernel_objs[0]['md5_sum']))
+  shutil.rmtree(cache_dir)
@@ -25,7 +25,7 @@
 ###############################################################################
 
 import sys
-from tuna.update_golden import merge_golden_entries, get_fdb_query
+from tuna.update_golden import merge_golden_entries, get_fdb_query, merge_golden_set
 from tuna.tables import DBTables
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.config_type import ConfigType
@@ -75,3 +75,25 @@ def test_update_golden():
     query = session.query(ConvolutionGolden)
     res = query.all()
   assert len(res) is not None
+
+  #set based promotion, dry run only counts
+  golden_v = 2
+  totals = merge_golden_set(dbt, golden_v, dry_run=True)
+  assert totals['rows'] == len(entries)
+  assert totals['added'] == len(entries)
+  with DbSession() as session:
+    query = session.query(ConvolutionGolden)\
+        .filter(ConvolutionGolden.golden_miopen_v == golden_v)
+    assert not query.all()
+
+  totals = merge_golden_set(dbt, golden_v)
+  assert totals['rows'] == len(entries)
+  with DbSession() as session:
+    query = session.query(ConvolutionGolden)\
+        .filter(ConvolutionGolden.golden_miopen_v == golden_v)
+    assert len(query.all()) == len(entries)
+
+  #promoting again changes nothing
+  totals = merge_golden_set(dbt, golden_v, dry_run=True)
+  assert totals['added'] == 0
+  assert totals['updated'] == 0
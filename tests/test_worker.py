@@ -24,11 +24,16 @@
 #
 ###############################################################################
 
+import logging
 import os
 import sys
 #import pytest
 from multiprocessing import Value, Lock, Queue
 from subprocess import Popen, PIPE
+from threading import Thread, Event
+from types import SimpleNamespace
+from threading import Lock as ThreadLock
+from time import sleep
 
 sys.path.append("../tuna")
 sys.path.append("tuna")
@@ -41,6 +46,7 @@ from tuna.fin_class import FinClass
 from tuna.machine import Machine
 from utils import get_worker_args, add_test_session
 from tuna.sql import DbCursor
+from tuna.dbBase.sql_alchemy import DbSession
 from tuna.tables import ConfigType
 from utils import add_test_session
 from utils import CfgImportArgs, LdJobArgs, GoFishArgs
@@ -164,6 +170,117 @@ def multi_queue_test(w):
     cur.execute("UPDATE conv_job SET valid=0 WHERE reason='tuna_pytest_worker'")
 
 
+def concurrent_claims(w):
+  with DbCursor() as cur:
+    cur.execute("UPDATE conv_job SET valid=0 WHERE reason='tuna_pytest_worker'")
+  with DbCursor() as cur:
+    cur.execute(
+        f"UPDATE conv_job SET state='new', valid=1, retries=0 WHERE reason='tuna_pytest_worker' AND session={w.session_id} LIMIT {4 * w.claim_num}"
+    )
+  with DbCursor() as cur:
+    cur.execute(
+        f"SELECT count(*) FROM conv_job WHERE reason='tuna_pytest_worker' AND session={w.session_id} AND state='new' AND valid=1"
+    )
+    num_jobs = cur.fetchall()[0][0]
+  assert (num_jobs > w.claim_num)
+
+  #claimers racing for the same jobs never claim one twice and skip none
+  claimed = []
+  claimed_lock = ThreadLock()
+
+  def claim():
+    while True:
+      with DbSession() as session:
+        ids = w.claim_jobs(session, 'new', 'compile_start')
+      if not ids:
+        return
+      with claimed_lock:
+        claimed.extend(ids)
+
+  threads = [Thread(target=claim) for _ in range(4)]
+  for thread in threads:
+    thread.start()
+  for thread in threads:
+    thread.join()
+  assert (len(claimed) == num_jobs)
+  assert (len(set(claimed)) == num_jobs)
+  with DbSession() as session:
+    assert (not w.jobs_pending(session, 'new'))
+
+
+def locked_claim(w):
+  with DbCursor() as cur:
+    cur.execute(
+        f"SELECT id FROM conv_job WHERE reason='tuna_pytest_worker' AND session={w.session_id} LIMIT 1"
+    )
+    job_id = cur.fetchall()[0][0]
+    cur.execute(
+        f"UPDATE conv_job SET state='new', valid=1, retries=0 WHERE id={job_id}"
+    )
+
+  #another worker holds the only job while it claims it
+  locked = Event()
+
+  def hold():
+    with DbCursor() as cur:
+      cur.execute(f"SELECT id FROM conv_job WHERE id={job_id} FOR UPDATE")
+      cur.fetchall()
+      locked.set()
+      sleep(2)
+
+  thread = Thread(target=hold)
+  thread.start()
+  locked.wait()
+  with DbSession() as session:
+    assert (w.claim_jobs(session, 'new', 'compile_start') == ())
+    assert (w.jobs_pending(session, 'new'))
+    session.commit()
+
+  #a locked job is not the end of the queue, get_job waits for the lock
+  w.queue_end_reset()
+  assert (w.get_job('new', 'compile_start', True) == True)
+  assert (w.end_jobs.value == 0)
+  assert (w.job.id == job_id)
+  thread.join()
+  with DbCursor() as cur:
+    cur.execute(f"SELECT state FROM conv_job WHERE id={job_id}")
+    assert (cur.fetchall()[0][0] == 'compile_start')
+    cur.execute("UPDATE conv_job SET valid=0 WHERE reason='tuna_pytest_worker'")
+
+
+def test_demux_fin_output():
+  w = WorkerInterface.__new__(WorkerInterface)
+  w.logger = logging.getLogger('test_demux_fin_output')
+  cfg = SimpleNamespace(id=7)
+  w.job_batch = [(SimpleNamespace(id=idx, solver=solver), cfg, None)
+                 for idx, solver in enumerate(['SlvA', 'SlvB', ''])]
+
+  def result(*solvers):
+    return {
+        'config_tuna_id':
+            7,
+        'miopen_find_compile_result': [{
+            'solver_name': solver
+        } for solver in solvers]
+    }
+
+  fin_json = [result('SlvA'), result('SlvB'), result('SlvA', 'SlvC')]
+  pairs = w.demux_fin_output(fin_json)
+  assert [job_json for _, job_json in pairs] == fin_json
+
+  #a dropped result fails the whole batch instead of shifting the others
+  pairs = w.demux_fin_output(fin_json[1:])
+  assert [job_json for _, job_json in pairs] == [None, None, None]
+
+  #results out of job order are not written under the wrong job
+  pairs = w.demux_fin_output([fin_json[1], fin_json[0], fin_json[2]])
+  assert [job_json for _, job_json in pairs] == [None, None, None]
+
+  wrong_cfg = dict(fin_json[0], config_tuna_id=8)
+  pairs = w.demux_fin_output([wrong_cfg] + fin_json[1:])
+  assert [job_json for _, job_json in pairs] == [None, None, None]
+
+
 def test_worker():
 
   cmd = 'hostname'
@@ -203,4 +320,8 @@ def test_worker():
   get_job(w)
   w.queue_end_reset()
   multi_queue_test(w)
+  concurrent_claims(w)
+  locked_claim(w)
+  assert w.claim_stats['claims'] > 0
+  assert w.claim_stats['claimed_jobs'] >= w.claim_stats['claims']
   w.check_env()
@@ -66,6 +66,7 @@ class CfgImportArgs():
   mark_recurrent = False
   tag = None
   tag_only = False
+  bulk = False
 
 
 class LdJobArgs():
@@ -102,6 +103,11 @@ class GoFishArgs():
   docker_name = None
   ticket = None
   solver_id = None
+  fin_batch = 1
+  prefetch = False
+  fin_transport = 'file'
+  fin_codec = 'auto'
+  blob_cache_size = 4096
 
 
 class DummyArgs(object):
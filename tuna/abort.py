@@ -27,10 +27,15 @@
 """Utility module for checking abort attempts"""
 
 import os
+from multiprocessing import Value
+from threading import Thread, Event, Lock
 
+# interval at which the node abort watcher checks the abort files
+ABORT_POLL_INTERVAL = 1.0  # in seconds
 
-def chk_abort_file(mid, logger, arch=None):
-  """Checking presence of abort file to terminate processes immediately"""
+
+def get_abort_reasons(mid, arch=None):
+  """List the abort files present for a machine id and arch"""
   abort_reason = []
 
   if not arch is None:
@@ -39,9 +44,77 @@ def chk_abort_file(mid, logger, arch=None):
 
   if os.path.exists(f'/tmp/miopen_abort_mid_{mid}'):
     abort_reason.append('mid_' + str(mid))
+
+  return abort_reason
+
+
+def chk_abort_file(mid, logger, arch=None):
+  """Checking presence of abort file to terminate processes immediately"""
+  abort_reason = get_abort_reasons(mid, arch)
   if abort_reason:
     for reason in abort_reason:
       logger.warning('/tmp/mipen_abort_%s file found, returning', reason)
     return True
 
   return False
+
+
+class AbortWatcher():
+  """Checks the abort files of every watched machine from a single thread of
+  the node and publishes the result in a flag per machine shared with the
+  worker processes"""
+
+  def __init__(self, interval=ABORT_POLL_INTERVAL):
+    self.interval = interval
+    self.flags = {}
+    self.lock = Lock()
+    self.stop_event = Event()
+    self.thread = None
+
+  def watch(self, mid, arch=None):
+    """Shared flag for mid and arch, set while one of their abort files
+    exists. Must be called before the workers are forked"""
+    with self.lock:
+      key = (mid, arch)
+      if key not in self.flags:
+        self.flags[key] = Value('i',
+                                int(bool(get_abort_reasons(mid, arch))),
+                                lock=False)
+      if self.thread is None:
+        self.thread = Thread(target=self.run, daemon=True)
+        self.thread.start()
+      return self.flags[key]
+
+  def poll(self):
+    """Refresh all flags from the abort files"""
+    with self.lock:
+      for (mid, arch), flag in self.flags.items():
+        flag.value = int(bool(get_abort_reasons(mid, arch)))
+
+  def run(self):
+    """Poll until stopped"""
+    while not self.stop_event.wait(self.interval):
+      self.poll()
+
+  def stop(self):
+    """Stop the polling thread"""
+    self.stop_event.set()
+    if self.thread is not None:
+      self.thread.join()
+      self.thread = None
+
+
+ABORT_WATCHER = AbortWatcher()
+
+
+def chk_abort_flag(flag, mid, logger, arch=None):
+  """Check the abort flag published by the node abort watcher, fall back to
+  the abort files if there is no flag"""
+  if flag is None:
+    return chk_abort_file(mid, logger, arch)
+  if flag.value:
+    logger.warning('Abort flag set for machine %s (arch %s), returning', mid,
+                   arch)
+    return True
+
+  return False
@@ -28,8 +28,8 @@
 import socket
 from random import randrange
 from subprocess import Popen, PIPE, STDOUT
-from time import sleep
-from io import StringIO
+from time import sleep, time
+from io import StringIO, BytesIO
 import paramiko
 
 from tuna.utils.logger import setup_logger
@@ -38,12 +38,29 @@ from tuna.abort import chk_abort_file
 NUM_SSH_RETRIES = 40
 NUM_CMD_RETRIES = 30
 SSH_TIMEOUT = 60.0  # in seconds
+NUM_SFTP_RETRIES = 2
+STREAM_BUFSIZE = 32768
+STREAM_POLL_INTERVAL = 0.01  # in seconds
+
+
+def send_stdin(channel, stdin_data, sent):
+  """Send the next part of stdin_data the channel window takes, stdin is
+  closed once all is sent or the command stopped reading. Returns the number
+  of bytes sent so far"""
+  try:
+    sent += channel.send(stdin_data[sent:sent + STREAM_BUFSIZE])
+  except socket.error:
+    # the command exited before it read all of its input
+    sent = len(stdin_data)
+  if sent == len(stdin_data):
+    channel.shutdown_write()
+  return sent
 
 
 class Connection():
   """Connection class defined an ssh or ftp client connection. Instantiated by the machine class"""
 
-  #pylint: disable=no-member
+  #pylint: disable=no-member, too-many-instance-attributes
 
   def __init__(self, **kwargs):
     #pylint
@@ -61,6 +78,16 @@ class Connection():
         (key, value) for key, value in kwargs.items() if key in allowed_keys)
 
     self.ssh = None
+    self.sftp = None
+    self.xfer_stats = {
+        'sftp_opens': 0,
+        'writes': 0,
+        'reads': 0,
+        'bytes_written': 0,
+        'bytes_read': 0,
+        'write_time': 0.0,
+        'read_time': 0.0
+    }
 
     if self.logger is None:
       self.logger = setup_logger('Connection')
@@ -225,6 +252,54 @@ class Connection():
       if e_var and hasattr(e_var, "close"):
         e_var.close()
 
+  def exec_stream(self, cmd, stdin_data, timeout=SSH_TIMEOUT):
+    """Run cmd with stdin_data on its stdin, returns the exit code, stdout as
+    bytes and stderr as text. The streams are kept apart. The exit code is
+    None if the command could not be run over ssh, timeout only applies to
+    the ssh channel"""
+    if self.local_machine:
+      with Popen(cmd,
+                 stdin=PIPE,
+                 stdout=PIPE,
+                 stderr=PIPE,
+                 shell=True,
+                 close_fds=True) as subp:
+        out, err = subp.communicate(input=stdin_data)
+        return subp.returncode, out, err.decode(errors='replace')
+
+    try:
+      self.ssh_connect()
+      _, o_var, _ = self.ssh.exec_command(cmd, timeout=timeout)
+      channel = o_var.channel
+      sent = 0
+      if not stdin_data:
+        channel.shutdown_write()
+      out, err = BytesIO(), BytesIO()
+      # stdin is sent as the window allows while both outputs are drained, so
+      # a command writing output before it read all of its input cannot stall
+      while True:
+        busy = False
+        if sent < len(stdin_data) and channel.send_ready():
+          sent = send_stdin(channel, stdin_data, sent)
+          busy = True
+        if channel.recv_ready():
+          out.write(channel.recv(STREAM_BUFSIZE))
+          busy = True
+        if channel.recv_stderr_ready():
+          err.write(channel.recv_stderr(STREAM_BUFSIZE))
+          busy = True
+        if not busy:
+          if channel.exit_status_ready():
+            break
+          sleep(STREAM_POLL_INTERVAL)
+      ret_code = channel.recv_exit_status()
+    except (paramiko.ssh_exception.SSHException, socket.error) as exc:
+      self.logger.warning('Machine %s failed to stream command: %s', self.id,
+                          cmd)
+      self.logger.warning('Exception occurred %s', exc)
+      return None, None, ''
+    return ret_code, out.getvalue(), err.getvalue().decode(errors='replace')
+
   def connect(self, abort=None):
     """Establishing new connecion"""
     if not self.local_machine:
@@ -271,8 +346,99 @@ class Connection():
     return False
 
   def open_sftp(self):
-    """Helper function for ftp client"""
-    ftp_client = None
-    if self.ssh and not self.local_machine:
-      ftp_client = self.ssh.open_sftp()
-    return ftp_client
+    """Helper function for ftp client, the client is cached on the connection
+    and only reopened when its channel or the ssh transport is gone"""
+    if self.local_machine:
+      return None
+    if self.sftp is not None:
+      channel = self.sftp.get_channel()
+      if channel is not None and not channel.closed and channel.get_transport(
+      ).is_active():
+        return self.sftp
+      self.close_sftp()
+    self.ssh_connect()
+    if self.ssh is None:
+      return None
+    self.sftp = self.ssh.open_sftp()
+    self.xfer_stats['sftp_opens'] += 1
+    return self.sftp
+
+  def close_sftp(self):
+    """Close the cached ftp client"""
+    if self.sftp is not None:
+      try:
+        self.sftp.close()
+      except (paramiko.ssh_exception.SSHException, socket.error, EOFError):
+        pass
+    self.sftp = None
+
+  def close(self):
+    """Close the ftp client and the ssh connection"""
+    self.close_sftp()
+    if self.ssh is not None:
+      self.ssh.close()
+      self.ssh = None
+
+  def sftp_retry(self, callback):
+    """Run callback(sftp), reopening the ftp client once if it failed"""
+    for idx in range(NUM_SFTP_RETRIES):
+      try:
+        return callback(self.open_sftp())
+      except (paramiko.ssh_exception.SSHException, socket.error,
+              EOFError) as err:
+        self.logger.warning(
+            'sftp transfer failed on machine %s (attempt %u): %s', self.id, idx,
+            err)
+        self.close_sftp()
+        if idx == NUM_SFTP_RETRIES - 1:
+          raise
+    return None
+
+  def write_file(self, contents, filename):
+    """Write contents to filename on the remote machine, pipelined"""
+
+    def write(sftp):
+      with sftp.open(filename, 'wb') as fout:
+        fout.set_pipelined(True)
+        fout.write(contents)
+        fout.flush()
+
+    start = time()
+    self.sftp_retry(write)
+    self.xfer_stats['writes'] += 1
+    self.xfer_stats['bytes_written'] += len(contents)
+    self.xfer_stats['write_time'] += time() - start
+    return filename
+
+  def read_file(self, filename):
+    """Read filename from the remote machine, prefetching the whole file"""
+
+    def read(sftp):
+      with sftp.open(filename, 'rb') as fin:
+        fin.prefetch()
+        return fin.read()
+
+    start = time()
+    contents = self.sftp_retry(read)
+    self.xfer_stats['reads'] += 1
+    self.xfer_stats['bytes_read'] += len(contents)
+    self.xfer_stats['read_time'] += time() - start
+    return contents
+
+  def put_file(self, local_file, filename):
+    """Copy local_file to filename on the remote machine"""
+    start = time()
+    attr = self.sftp_retry(lambda sftp: sftp.put(local_file, filename))
+    self.xfer_stats['writes'] += 1
+    self.xfer_stats['bytes_written'] += attr.st_size or 0
+    self.xfer_stats['write_time'] += time() - start
+    return filename
+
+  def rename_file(self, src, dst):
+    """Atomically rename src to dst on the remote machine, replacing dst"""
+    self.sftp_retry(lambda sftp: sftp.posix_rename(src, dst))
+    return dst
+
+  def get_xfer_stats(self):
+    """File transfer counters: bytes, count and total latency per direction"""
+    return dict(self.xfer_stats)
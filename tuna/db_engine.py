@@ -25,13 +25,84 @@
 #
 ###############################################################################
 """ Database resource manager """
-from sqlalchemy import create_engine
-from sqlalchemy.pool import NullPool
+import os
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.pool import NullPool, QueuePool
 from sqlalchemy.orm import sessionmaker
 from tuna.utils.utility import get_env_vars
 
 ENV_VARS = get_env_vars()
+
+#per process connection pool counters, reset after fork
+POOL_STATS = {'pid': os.getpid(), 'connects': 0, 'checkouts': 0, 'stale': 0}
+
+
+def get_pool_args(env_vars):
+  """Connection pool settings from env vars, a pool size of 0 disables pooling"""
+  if env_vars['pool_size'] <= 0:
+    return {'poolclass': NullPool}
+
+  return {
+      'poolclass': QueuePool,
+      'pool_size': env_vars['pool_size'],
+      'max_overflow': env_vars['pool_max_overflow'],
+      'pool_recycle': env_vars['pool_recycle'],
+      'pool_pre_ping': env_vars['pool_pre_ping']
+  }
+
+
 ENGINE = create_engine(f"mysql+pymysql://{ENV_VARS['user_name']}:{ENV_VARS['user_password']}" \
                        f"@{ENV_VARS['db_hostname']}:3306/{ENV_VARS['db_name']}",
-                       poolclass=NullPool)
+                       encoding="utf8",
+                       **get_pool_args(ENV_VARS))
 SESSION_FACTORY = sessionmaker(bind=ENGINE)
+
+
+def reset_pool_stats():
+  """Start counting for the current process"""
+  POOL_STATS['pid'] = os.getpid()
+  POOL_STATS['connects'] = 0
+  POOL_STATS['checkouts'] = 0
+  POOL_STATS['stale'] = 0
+
+
+def get_pool_stats():
+  """Return the connection pool counters of the current process"""
+  if POOL_STATS['pid'] != os.getpid():
+    reset_pool_stats()
+  stats = dict(POOL_STATS)
+  stats['status'] = ENGINE.pool.status()
+  return stats
+
+
+def reinit_pool():
+  """Drop connections inherited from the parent process without closing them,
+  the sockets are still in use by the parent"""
+  ENGINE.pool = ENGINE.pool.recreate()
+  reset_pool_stats()
+
+
+@event.listens_for(ENGINE, "connect")
+def on_connect(_dbapi_connection, connection_record):
+  """Tag new connections with the process that owns them"""
+  if POOL_STATS['pid'] != os.getpid():
+    reset_pool_stats()
+  connection_record.info['pid'] = os.getpid()
+  POOL_STATS['connects'] += 1
+
+
+@event.listens_for(ENGINE, "checkout")
+def on_checkout(_dbapi_connection, connection_record, connection_proxy):
+  """Never hand out a connection created by another process"""
+  if POOL_STATS['pid'] != os.getpid():
+    reset_pool_stats()
+  if connection_record.info['pid'] != os.getpid():
+    POOL_STATS['stale'] += 1
+    connection_record.connection = connection_proxy.connection = None
+    raise exc.DisconnectionError(
+        f"Connection record belongs to pid {connection_record.info['pid']}, "
+        f"attempting to check out in pid {os.getpid()}")
+  POOL_STATS['checkouts'] += 1
+
+
+os.register_at_fork(after_in_child=reinit_pool)
@@ -27,20 +27,13 @@
 """ Module for creating DB tables"""
 import os
 from sqlalchemy.exc import OperationalError, ProgrammingError
-from sqlalchemy import create_engine
 from tuna.miopen_tables import get_miopen_tables
 from tuna.miopen_db_helpers import get_miopen_triggers, drop_miopen_triggers
 from tuna.db_engine import ENV_VARS, ENGINE
 from tuna.utils.logger import setup_logger
-from tuna.utils.utility import get_env_vars
 
 #pylint: disable=too-few-public-methods
 LOGGER = setup_logger('db_tables')
-ENV_VARS = get_env_vars()
-
-ENGINE = create_engine(f"mysql+pymysql://{ENV_VARS['user_name']}:{ENV_VARS['user_password']}" +\
-                         f"@{ENV_VARS['db_hostname']}:3306/{ENV_VARS['db_name']}",
-                       encoding="utf8")
 
 
 def connect_db():
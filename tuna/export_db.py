@@ -27,13 +27,24 @@
 """Module to export find_db to txt file"""
 import sqlite3
 import os
-from collections import OrderedDict
-import base64
+from collections import namedtuple
+from contextlib import ExitStack
+from heapq import merge
+from itertools import chain, groupby
+from multiprocessing import Pool
+from operator import attrgetter, itemgetter
+from time import time
+
+import numpy as np
+from sqlalchemy import cast, func
+from sqlalchemy.dialects.mysql import BINARY
 
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.tables import DBTables
-from tuna.metadata import SQLITE_PERF_DB_COLS
+from tuna.metadata import SQLITE_PERF_DB_COLS, SQLITE_CONFIG_COLS
 from tuna.utils.db_utility import get_id_solvers, DB_Type
+from tuna.utils.fdb_records import FdbRecords
+from tuna.utils.blob_store import query_kernels, get_blob_binary
 from tuna.utils.utility import arch2targetid
 from tuna.utils.logger import setup_logger
 from tuna.parse_args import TunaArgs, setup_arg_parser
@@ -42,6 +53,23 @@ from tuna.fin_utils import compose_config_obj
 
 DIR_NAME = {'F': 'Fwd', 'B': 'BwdData', 'W': 'BwdWeights'}
 
+#rows fetched per round trip from the server side cursor
+YIELD_PER = 10000
+FDB_COLS = [
+    'fdb_key', 'solver', 'alg_lib', 'kernel_time', 'workspace_sz',
+    'kernel_group', 'config', 'update_ts'
+]
+#kernel groups per IN query and blobs per sqlite executemany for kdb export
+KDB_GROUP_CHUNK = 500
+#configs per IN query for pdb export
+PDB_CONFIG_CHUNK = 500
+KDB_INSERT_BATCH = 1000
+KDB_COLS = [
+    'kernel_name', 'kernel_args', 'kernel_blob', 'kernel_hash',
+    'uncompressed_size'
+]
+PdbRow = namedtuple('PdbRow', SQLITE_PERF_DB_COLS)
+
 # Setup logging
 LOGGER = setup_logger('export_db')
 
@@ -82,6 +110,13 @@ def parse_args():
                       dest='filename',
                       help='Custom filename for DB dump',
                       default=None)
+  parser.add_argument(
+      '-j',
+      '--jobs',
+      dest='jobs',
+      type=int,
+      default=1,
+      help='Number of worker processes, each exporting one shard of the db')
 
   group = parser.add_mutually_exclusive_group(required=True)
   group.add_argument('-k',
@@ -106,6 +141,8 @@ def parse_args():
 
   if args.golden_v and not (args.arch and args.num_cu):
     parser.error('arch and num_cu must be set with golden_v')
+  if args.jobs < 1:
+    parser.error('jobs must be at least 1')
 
   return args
 
@@ -135,11 +172,16 @@ def get_filename(arch, num_cu, filename, ocl, db_type):
   return final_name
 
 
+def get_src_table(dbt, args):
+  """ find db or golden table, based on args """
+  if args.golden_v is not None:
+    return dbt.golden_table
+  return dbt.find_db_table
+
+
 def get_base_query(dbt, args):
   """ general query for fdb/pdb results """
-  src_table = dbt.find_db_table
-  if args.golden_v is not None:
-    src_table = dbt.golden_table
+  src_table = get_src_table(dbt, args)
 
   with DbSession() as session:
     query = session.query(src_table, dbt.config_table)
@@ -164,161 +206,288 @@ def get_base_query(dbt, args):
       query = query.filter(dbt.config_tags_table.tag == args.config_tag)\
           .filter(dbt.config_table.config == dbt.config_table.id)
 
-    LOGGER.info("base db query returned: %s", len(query.all()))
+    LOGGER.info("base db query returned: %s", query.count())
 
   return query
 
 
+def filter_shard(query, column, shard):
+  """ restrict query to the rows of one export shard, shard is (idx, jobs) """
+  if shard is None:
+    return query
+  idx, jobs = shard
+  return query.filter(column % jobs == idx)
+
+
+def get_shard_name(file_name, idx):
+  """ file name of one export shard """
+  return f'{file_name}.shard{idx}'
+
+
+def run_shards(worker, jobs, shard_args):
+  """ run one export worker per shard, results are returned in shard order """
+  with Pool(jobs) as pool:
+    return pool.starmap(worker, shard_args)
+
+
+def stream_query(query, columns):
+  """ iterate plain column tuples through a server side cursor """
+  return query.with_entities(*columns)\
+      .execution_options(stream_results=True)\
+      .yield_per(YIELD_PER)
+
+
 def get_fdb_query(dbt, args):
   """ Helper function to create find db query
   """
-  src_table = dbt.find_db_table
-  if args.golden_v is not None:
-    src_table = dbt.golden_table
+  src_table = get_src_table(dbt, args)
 
   query = get_base_query(dbt, args)
   query = query.filter(src_table.kernel_time != -1)\
       .filter(src_table.workspace_sz != -1)
 
-  query = query.order_by(src_table.fdb_key, src_table.update_ts.desc())
+  #binary order matches python string sorting, so the text fdb can be written
+  #one key at a time
+  query = query.order_by(cast(src_table.fdb_key, BINARY),
+                         src_table.update_ts.desc())
 
   return query
 
 
+def get_fdb_rows(dbt, args, shard=None):
+  """ stream the find db columns needed for export, ordered by fdb_key """
+  src_table = get_src_table(dbt, args)
+  query = get_fdb_query(dbt, args)
+  #shard by key hash, all rows of a fdb_key land in the same shard
+  query = filter_shard(query, func.crc32(src_table.fdb_key), shard)
+
+  return stream_query(query, [getattr(src_table, col) for col in FDB_COLS])
+
+
 def get_pdb_query(dbt, args):
   """Compose query to get perf_db rows based on filters from args"""
-  src_table = dbt.find_db_table
-  if args.golden_v is not None:
-    src_table = dbt.golden_table
+  src_table = get_src_table(dbt, args)
 
   query = get_base_query(dbt, args)
   query = query.filter(dbt.solver_table.tunable == 1)\
       .filter(src_table.params != '')
 
-  LOGGER.info("pdb query returned: %s", len(query.all()))
+  LOGGER.info("pdb query returned: %s", query.count())
 
   return query
 
 
-def get_fdb_alg_lists(query):
-  """return dict with key: fdb_key + alg_lib, val: solver list"""
-  find_db = OrderedDict()
-  solvers = {}
-  for fdb_entry, _ in query.all():
-    fdb_key = fdb_entry.fdb_key
-    if fdb_key not in solvers:
-      solvers[fdb_key] = {}
-    if fdb_entry.solver in solvers[fdb_key].keys():
+def chunk_fdb_rows(rows, size=YIELD_PER):
+  """ group rows ordered by fdb_key into lists of about size rows, a fdb_key
+  never spans two lists """
+  chunk = []
+  for _, key_rows in groupby(rows, key=attrgetter('fdb_key')):
+    chunk.extend(key_rows)
+    if len(chunk) >= size:
+      yield chunk
+      chunk = []
+  if chunk:
+    yield chunk
+
+
+def get_unique_solvers(records):
+  """ indices of the newest record for each (fdb_key, solver), logs the rest """
+  kept = records.unique_solvers()
+  if len(kept) < len(records):
+    dupes = np.ones(len(records), dtype=bool)
+    dupes[kept] = False
+    for idx in np.flatnonzero(dupes):
+      prev = kept[(records.key_idx[kept] == records.key_idx[idx]) &
+                  (records.solver[kept] == records.solver[idx])][0]
+      fdb_entry = records.rows[idx]
       LOGGER.warning("Skipped duplicate solver: %s : %s with ts %s vs prev %s",
-                     fdb_key, fdb_entry.solver, fdb_entry.update_ts,
-                     solvers[fdb_key][fdb_entry.solver])
-      continue
-    solvers[fdb_key][fdb_entry.solver] = fdb_entry.update_ts
-
-    fdb_key_alg = (fdb_entry.fdb_key, fdb_entry.alg_lib)
-    lst = find_db.get(fdb_key_alg)
-    if not lst:
-      find_db[fdb_key_alg] = [fdb_entry]
-    else:
-      lst.append(fdb_entry)
+                     fdb_entry.fdb_key, fdb_entry.solver, fdb_entry.update_ts,
+                     records.rows[prev].update_ts)
+  return kept
 
-  return find_db
 
-
-def build_miopen_fdb(fdb_alg_lists):
-  """ create miopen find db object for export
-  """
-  total_entries = len(fdb_alg_lists)
+def stream_miopen_fdb(rows):
+  """ yield (fdb_key, fastest entry per algorithm) one fdb_key at a time,
+  entries are ordered by kernel_time and rows must be ordered by fdb_key """
+  num_fdb_keys = 0
   num_fdb_entries = 0
-  miopen_fdb = OrderedDict()
-  for fdbkey_alg, alg_entries in fdb_alg_lists.items():
-    fdb_key = fdbkey_alg[0]
-    num_fdb_entries += 1
-    #pick fastest solver for each algorithm
-    alg_entries.sort(key=lambda x: float(x.kernel_time))
-    fastest_entry = alg_entries[0]
-    lst = miopen_fdb.get(fdb_key)
-    if not lst:
-      miopen_fdb[fdb_key] = [fastest_entry]
-    else:
-      lst.append(fastest_entry)
-
-    if num_fdb_entries % (total_entries // 10) == 0:
-      LOGGER.info("FDB count: %s, fdb: %s, cfg: %s, slv: %s", num_fdb_entries,
-                  fastest_entry.fdb_key, fastest_entry.config,
-                  ID_SOLVER_MAP[fastest_entry.solver])
+  for chunk in chunk_fdb_rows(rows):
+    records = FdbRecords.from_rows(chunk)
+    fastest = records.fastest(get_unique_solvers(records))
+    for fdb_key, idx in records.split_by_key(fastest):
+      entries = [records.rows[i] for i in idx]
+
+      num_fdb_keys += 1
+      num_fdb_entries += len(entries)
+      if num_fdb_keys % YIELD_PER == 0:
+        LOGGER.info("FDB count: %s, fdb: %s, cfg: %s, slv: %s", num_fdb_entries,
+                    fdb_key, entries[0].config,
+                    ID_SOLVER_MAP[entries[0].solver])
+      yield fdb_key, entries
 
   LOGGER.warning("Total number of entries in Find DB: %s", num_fdb_entries)
 
-  return miopen_fdb
 
+def write_fdb_line(out, key, solvers):
+  """ write the entries of one fdb_key, ordered by kernel_time, in MIOpen text
+  format """
+  lst = []
+  # for alg_lib, solver_id, kernel_time, workspace_sz in solvers:
+  for rec in solvers:
+    # pylint: disable-next=consider-using-f-string ; more reable
+    lst.append('{alg}:{},{},{},{alg},{}'.format(ID_SOLVER_MAP[rec.solver],
+                                                rec.kernel_time,
+                                                rec.workspace_sz,
+                                                'not used',
+                                                alg=rec.alg_lib))
+  out.write(f"{key}={';'.join(lst)}\n")
 
-def write_fdb(arch, num_cu, ocl, find_db, filename=None):
+
+def write_fdb_stream(arch, num_cu, ocl, fdb_groups, filename=None):
   """
-  Serialize find_db map to plain text file in MIOpen format
+  Serialize (fdb_key, entries) pairs, already in key order, to plain text
   """
   file_name = get_filename(arch, num_cu, filename, ocl, DB_Type.FIND_DB)
 
   with open(file_name, 'w') as out:  # pylint: disable=unspecified-encoding
-    for key, solvers in sorted(find_db.items(), key=lambda kv: kv[0]):
-      solvers.sort(key=lambda x: float(x.kernel_time))
-      lst = []
-      # for alg_lib, solver_id, kernel_time, workspace_sz in solvers:
-      for rec in solvers:
-        # pylint: disable-next=consider-using-f-string ; more reable
-        lst.append('{alg}:{},{},{},{alg},{}'.format(ID_SOLVER_MAP[rec.solver],
-                                                    rec.kernel_time,
-                                                    rec.workspace_sz,
-                                                    'not used',
-                                                    alg=rec.alg_lib))
-      out.write(f"{key}={';'.join(lst)}\n")
+    for key, solvers in fdb_groups:
+      write_fdb_line(out, key, solvers)
+  return file_name
+
+
+def export_fdb_shard(args, shard):
+  """ write the find db lines of one shard to its own file """
+  dbt = DBTables(session_id=args.session_id)
+  rows = get_fdb_rows(dbt, args, shard)
+  file_name = get_filename(args.arch, args.num_cu, args.filename, args.opencl,
+                           DB_Type.FIND_DB)
+  shard_name = get_shard_name(file_name, shard[0])
+
+  with open(shard_name, 'w') as out:  # pylint: disable=unspecified-encoding
+    for key, solvers in stream_miopen_fdb(rows):
+      write_fdb_line(out, key, solvers)
+  return shard_name
+
+
+def merge_fdb_shards(file_name, shard_names):
+  """ merge the sorted shard files by fdb_key into the final find db """
+  with ExitStack() as stack:
+    # pylint: disable=unspecified-encoding
+    out = stack.enter_context(open(file_name, 'w'))
+    shards = [stack.enter_context(open(name)) for name in shard_names]
+    out.writelines(merge(*shards, key=lambda line: line.split('=', 1)[0]))
+
+  for name in shard_names:
+    os.remove(name)
   return file_name
 
 
 def export_fdb(dbt, args):
   """Function to export find_db to txt file
   """
-  query = get_fdb_query(dbt, args)
-  fdb_alg_lists = get_fdb_alg_lists(query)
-  miopen_fdb = build_miopen_fdb(fdb_alg_lists)
+  if getattr(args, 'jobs', 1) > 1:
+    shard_names = run_shards(
+        export_fdb_shard, args.jobs,
+        [(args, (idx, args.jobs)) for idx in range(args.jobs)])
+    file_name = get_filename(args.arch, args.num_cu, args.filename, args.opencl,
+                             DB_Type.FIND_DB)
+    return merge_fdb_shards(file_name, shard_names)
+
+  rows = get_fdb_rows(dbt, args)
+
+  return write_fdb_stream(args.arch, args.num_cu, args.opencl,
+                          stream_miopen_fdb(rows), args.filename)
 
-  return write_fdb(args.arch, args.num_cu, args.opencl, miopen_fdb,
-                   args.filename)
 
+def get_fastest_groups(fdb_groups):
+  """ yield (fdb_key, kernel group of the fastest solver) in export order """
+  for fdb_key, entries in fdb_groups:
+    #entries come ordered by kernel_time
+    yield fdb_key, entries[0].kernel_group
 
-def build_miopen_kdb(dbt, find_db):
-  """ create miopen kernel db object for export
+
+def get_kernel_groups(key_groups):
+  """ unique kernel groups from (fdb_key, kernel_group) pairs, in export order """
+  kernel_groups = []
+  seen = set()
+  for _, kernel_group in key_groups:
+    if kernel_group not in seen:
+      seen.add(kernel_group)
+      kernel_groups.append(kernel_group)
+
+  return kernel_groups
+
+
+def get_key_groups_shard(args, shard):
+  """ (fdb_key, kernel_group) pairs of one shard, ordered by fdb_key """
+  dbt = DBTables(session_id=args.session_id)
+  return list(
+      get_fastest_groups(stream_miopen_fdb(get_fdb_rows(dbt, args, shard))))
+
+
+def build_miopen_kdb(dbt, kernel_groups):
+  """ fetch the kernel cache rows of all kernel groups with chunked IN queries,
+  yields rows grouped in the order of kernel_groups
   """
-  num_fdb_entries = 0
+  kcache = dbt.kernel_cache
+  columns = [
+      kcache.kernel_group, kcache.kernel_name, kcache.kernel_args,
+      kcache.kernel_blob, kcache.kernel_hash, kcache.uncompressed_size
+  ]
   num_kdb_blobs = 0
-  kern_db = []
+  total = len(kernel_groups)
+  last_pcnt = 0
   with DbSession() as session:
-    total = len(find_db.items())
-    last_pcnt = 0
-    for _, entries in find_db.items():
-      num_fdb_entries += 1
-      entries.sort(key=lambda x: float(x.kernel_time))
-      fastest_slv = entries[0]
-      query = session.query(dbt.kernel_cache)\
-          .filter(dbt.kernel_cache.kernel_group == fastest_slv.kernel_group)
+    for idx in range(0, total, KDB_GROUP_CHUNK):
+      chunk = kernel_groups[idx:idx + KDB_GROUP_CHUNK]
+      query = query_kernels(session, kcache, *columns)\
+          .filter(kcache.kernel_group.in_(chunk))\
+          .order_by(kcache.id)
+      blobs = {}
       for kinder in query.all():
-        num_kdb_blobs += 1
-        kern_db.append(kinder)
-      pcnt = int(num_fdb_entries * 100 / total)
+        blobs.setdefault(kinder.kernel_group, []).append(kinder)
+
+      for group in chunk:
+        for kinder in blobs.get(group, []):
+          num_kdb_blobs += 1
+          yield kinder
+
+      pcnt = int((idx + len(chunk)) * 100 / total)
       if pcnt > last_pcnt:
         LOGGER.warning("Building db: %s%%, blobs: %s", pcnt, num_kdb_blobs)
         last_pcnt = pcnt
 
-  LOGGER.warning("Total FDB entries: %s, Total blobs: %s", num_fdb_entries,
-                 num_kdb_blobs)
-  return kern_db
+  LOGGER.warning("Total FDB entries: %s, Total blobs: %s", total, num_kdb_blobs)
 
 
-def write_kdb(arch, num_cu, kern_db, filename=None):
-  """
-  Write blob map to sqlite
-  """
-  file_name = get_filename(arch, num_cu, filename, None, DB_Type.KERN_DB)
+def compose_kdb_rows(arch, kern_db):
+  """ yield kern_db insert tuples, adding the extensions MIOpen expects """
+  arch_ext = arch2targetid(arch)
+  for kern in kern_db:
+    name = kern.kernel_name
+    args = kern.kernel_args
+    #check if extensions should be added
+    if not name.endswith('.o'):
+      name += ".o"
+    if not "-mcpu=" in args:
+      if not name.endswith('.mlir.o'):
+        args += f" -mcpu={arch_ext}"
+
+    yield (name, args, get_blob_binary(kern, kern.stored_blob),
+           kern.kernel_hash, kern.uncompressed_size)
+
+
+def unique_kdb_rows(rows):
+  """ drop rows with an already seen (kernel_name, kernel_args) """
+  ins_keys = set()
+  for row in rows:
+    if row[:2] not in ins_keys:
+      ins_keys.add(row[:2])
+      yield row
+
+
+def create_kdb_file(file_name):
+  """ create an empty sqlite kernel db """
   if os.path.isfile(file_name):
     os.remove(file_name)
 
@@ -330,33 +499,106 @@ def write_kdb(arch, num_cu, kern_db, filename=None):
       "`uncompressed_size` INT NOT NULL);")
   cur.execute(
       "CREATE UNIQUE INDEX `idx_kern_db` ON kern_db(kernel_name, kernel_args);")
+  cur.close()
+  return conn
 
-  ins_list = []
-  arch_ext = arch2targetid(arch)
-  for kern in kern_db:
-    name = kern.kernel_name
-    args = kern.kernel_args
-    #check if extensions should be added
-    if not name.endswith('.o'):
-      name += ".o"
-    if not "-mcpu=" in args:
-      if not name.endswith('.mlir.o'):
-        args += f" -mcpu={arch_ext}"
-
-    ins_key = (name, args)
-    if ins_key not in ins_list:
-      ins_list.append(ins_key)
-      cur.execute(
-          "INSERT INTO kern_db (kernel_name, kernel_args, kernel_blob, kernel_hash, "
-          "uncompressed_size) VALUES(?, ?, ?, ?, ?);",
-          (name, args, base64.b64decode(
-              kern.kernel_blob), kern.kernel_hash, kern.uncompressed_size))
 
+def insert_kdb_rows(conn, rows):
+  """ insert rows with executemany in one transaction, returns (#rows, #bytes) """
+  query = f"INSERT INTO kern_db ({', '.join(KDB_COLS)}) VALUES(?, ?, ?, ?, ?);"
+  cur = conn.cursor()
+  num_rows = 0
+  num_bytes = 0
+  batch = []
+  for row in rows:
+    num_rows += 1
+    num_bytes += len(row[2])
+    batch.append(row)
+    if len(batch) >= KDB_INSERT_BATCH:
+      cur.executemany(query, batch)
+      batch = []
+
+  if batch:
+    cur.executemany(query, batch)
   conn.commit()
   cur.close()
+  return num_rows, num_bytes
+
+
+def write_kdb(arch, num_cu, kern_db, filename=None):
+  """
+  Write blob map to sqlite
+  """
+  file_name = get_filename(arch, num_cu, filename, None, DB_Type.KERN_DB)
+  conn = create_kdb_file(file_name)
+
+  start = time()
+  num_blobs, num_bytes = insert_kdb_rows(
+      conn, unique_kdb_rows(compose_kdb_rows(arch, kern_db)))
+  conn.close()
+
+  elapsed = max(time() - start, 1e-6)
+  LOGGER.warning("Inserted blobs: %s, %.1f MB in %.1fs (%.1f MB/s)", num_blobs,
+                 num_bytes / 1e6, elapsed, num_bytes / 1e6 / elapsed)
+  return file_name
+
+
+def export_kdb_shard(args, kernel_groups, idx):
+  """ write the kernels of a slice of kernel groups to a shard kdb """
+  dbt = DBTables(session_id=args.session_id)
+  file_name = get_filename(args.arch, args.num_cu, args.filename, None,
+                           DB_Type.KERN_DB)
+  shard_name = get_shard_name(file_name, idx)
+  conn = create_kdb_file(shard_name)
+  insert_kdb_rows(
+      conn,
+      unique_kdb_rows(
+          compose_kdb_rows(args.arch, build_miopen_kdb(dbt, kernel_groups))))
+  conn.close()
+  return shard_name
+
+
+def read_kdb_shard(shard_name):
+  """ yield the kern_db rows of a shard in insert order """
+  conn = sqlite3.connect(shard_name)
+  try:
+    yield from conn.execute(
+        f"SELECT {', '.join(KDB_COLS)} FROM kern_db ORDER BY id;")
+  finally:
+    conn.close()
+
+
+def export_kdb_parallel(args):
+  """ export the kernel db with args.jobs worker processes
+
+  fdb keys are scanned per key hash shard, the kernel groups are then split in
+  contiguous slices so the merged kdb keeps the single process insert order
+  """
+  jobs = args.jobs
+  key_groups = run_shards(get_key_groups_shard, jobs,
+                          [(args, (idx, jobs)) for idx in range(jobs)])
+  kernel_groups = get_kernel_groups(merge(*key_groups, key=itemgetter(0)))
+
+  size = -(-len(kernel_groups) // jobs)
+  shard_names = run_shards(
+      export_kdb_shard, jobs,
+      [(args, kernel_groups[idx * size:(idx + 1) * size], idx)
+       for idx in range(jobs)])
+
+  file_name = get_filename(args.arch, args.num_cu, args.filename, None,
+                           DB_Type.KERN_DB)
+  conn = create_kdb_file(file_name)
+  start = time()
+  num_blobs, num_bytes = insert_kdb_rows(
+      conn,
+      unique_kdb_rows(chain.from_iterable(map(read_kdb_shard, shard_names))))
   conn.close()
+  for name in shard_names:
+    os.remove(name)
 
-  LOGGER.warning("Inserted blobs: %s", len(ins_list))
+  elapsed = max(time() - start, 1e-6)
+  LOGGER.warning("Merged blobs: %s, %.1f MB in %.1fs (%.1f MB/s)", num_blobs,
+                 num_bytes / 1e6, elapsed, num_bytes / 1e6 / elapsed)
   return file_name
 
 
@@ -364,12 +606,14 @@ def export_kdb(dbt, args):
   """
   Function to export the kernel cache
   """
-  query = get_fdb_query(dbt, args)
-  fdb_alg_lists = get_fdb_alg_lists(query)
-  miopen_fdb = build_miopen_fdb(fdb_alg_lists)
+  if getattr(args, 'jobs', 1) > 1:
+    return export_kdb_parallel(args)
+
+  fdb_groups = stream_miopen_fdb(get_fdb_rows(dbt, args))
+  kernel_groups = get_kernel_groups(get_fastest_groups(fdb_groups))
 
   LOGGER.info("Building kdb.")
-  kern_db = build_miopen_kdb(dbt, miopen_fdb)
+  kern_db = build_miopen_kdb(dbt, kernel_groups)
 
   LOGGER.info("write kdb to file.")
   return write_kdb(args.arch, args.num_cu, kern_db, args.filename)
@@ -429,11 +673,10 @@ def get_cfg_dict(cfg_entry, tensor_entry):
 
 def insert_perf_db_sqlite(cnx, perf_db_entry, ins_cfg_id):
   """insert perf_db entry into sqlite"""
-  perf_db_dict = perf_db_entry.to_dict()
-  perf_db_dict['config'] = ins_cfg_id
   perf_db_dict = {
-      k: v for k, v in perf_db_dict.items() if k in SQLITE_PERF_DB_COLS
+      col: getattr(perf_db_entry, col) for col in SQLITE_PERF_DB_COLS
   }
+  perf_db_dict['config'] = ins_cfg_id
   perf_db_dict['solver'] = ID_SOLVER_MAP[perf_db_dict['solver']]
 
   insert_solver_sqlite(cnx, perf_db_dict)
@@ -441,34 +684,148 @@ def insert_perf_db_sqlite(cnx, perf_db_entry, ins_cfg_id):
   return perf_db_dict
 
 
-def export_pdb(dbt, args):
-  """ export perf db from mysql to sqlite """
-  cnx, local_path = create_sqlite_tables(args.arch, args.num_cu, args.filename)
+def get_pdb_rows(dbt, args, shard=None):
+  """ stream the perf db columns needed for export, ordered by config """
+  src_table = get_src_table(dbt, args)
+  query = get_pdb_query(dbt, args).order_by(src_table.config, src_table.id)
+  query = filter_shard(query, src_table.config, shard)
+
+  return stream_query(query,
+                      [getattr(src_table, col) for col in SQLITE_PERF_DB_COLS])
+
+
+def chunk_pdb_rows(rows, size=PDB_CONFIG_CHUNK):
+  """ lists of (config, rows) pairs for up to size configs, the rows are
+  ordered by config """
+  chunk = []
+  for config, cfg_rows in groupby(rows, key=attrgetter('config')):
+    chunk.append((config, list(cfg_rows)))
+    if len(chunk) >= size:
+      yield chunk
+      chunk = []
+  if chunk:
+    yield chunk
+
+
+def get_cfg_dicts(session, dbt, cfg_ids):
+  """ config dicts of cfg_ids, the tensors are joined eagerly """
+  cfg_dicts = {
+      cfg_entry.id: get_cfg_dict(cfg_entry, cfg_entry.input_t)
+      for cfg_entry in session.query(dbt.config_table).filter(
+          dbt.config_table.id.in_(cfg_ids))
+  }
+  session.expunge_all()
+  return cfg_dicts
+
+
+def get_pdb_entries(dbt, rows):
+  """ yield (perf_db_entry, cfg_dict), cfg_dict is only set on the first row
+  of each mysql config. The configs of a chunk of rows are fetched with one
+  IN query """
+  #configs are looked up on a second connection, the first one is busy streaming
+  with DbSession() as session:
+    for chunk in chunk_pdb_rows(rows):
+      cfg_dicts = get_cfg_dicts(session, dbt, [config for config, _ in chunk])
+      for config, cfg_rows in chunk:
+        yield cfg_rows[0], cfg_dicts[config]
+        for perf_db_entry in cfg_rows[1:]:
+          yield perf_db_entry, None
+
+
+def write_pdb_entries(cnx, pdb_entries):
+  """ insert (perf_db_entry, cfg_dict) pairs into the sqlite perf db """
   num_perf = 0
-  query = get_pdb_query(dbt, args)
   cfg_map = {}
-  db_entries = query.all()
-  total_entries = len(db_entries)
-  for perf_db_entry, cfg_entry in db_entries:
-    if cfg_entry.id in cfg_map:
-      ins_cfg_id = cfg_map[cfg_entry.id]
-    else:
-      cfg_dict = get_cfg_dict(cfg_entry, cfg_entry.input_t)
+  for perf_db_entry, cfg_dict in pdb_entries:
+    if cfg_dict is not None:
       #filters cfg_dict by SQLITE_CONFIG_COLS, inserts cfg if missing
-      ins_cfg_id = get_config_sqlite(cnx, cfg_dict)
-      cfg_map[cfg_entry.id] = ins_cfg_id
+      cfg_map[perf_db_entry.config] = get_config_sqlite(cnx, cfg_dict)
 
-    pdb_dict = insert_perf_db_sqlite(cnx, perf_db_entry, ins_cfg_id)
+    pdb_dict = insert_perf_db_sqlite(cnx, perf_db_entry,
+                                     cfg_map[perf_db_entry.config])
     num_perf += 1
 
-    if num_perf % (total_entries // 10) == 0:
+    if num_perf % YIELD_PER == 0:
       cnx.commit()
       LOGGER.info("PDB count: %s, mysql cfg: %s, pdb: %s", num_perf,
-                  cfg_entry.id, pdb_dict)
+                  perf_db_entry.config, pdb_dict)
 
   cnx.commit()
   LOGGER.warning("Total number of entries in Perf DB: %s", num_perf)
 
+  return num_perf
+
+
+def export_pdb_shard(args, shard):
+  """ stage the perf db rows and configs of one shard in a sqlite file """
+  dbt = DBTables(session_id=args.session_id)
+  file_name = get_filename(args.arch, args.num_cu, args.filename, None,
+                           DB_Type.PERF_DB)
+  shard_name = get_shard_name(file_name, shard[0])
+  if os.path.isfile(shard_name):
+    os.remove(shard_name)
+
+  cnx = sqlite3.connect(shard_name)
+  cfg_cols = ', '.join(SQLITE_CONFIG_COLS)
+  cnx.execute(f"CREATE TABLE `shard_config` (`mysql_id` INTEGER PRIMARY KEY, "
+              f"{cfg_cols});")
+  cnx.execute("CREATE TABLE `shard_perf_db` (`id` INTEGER PRIMARY KEY ASC, "
+              "`config` INTEGER, `solver` INTEGER, `params` TEXT);")
+  cfg_query = f"INSERT INTO shard_config (mysql_id, {cfg_cols}) VALUES "\
+      f"({', '.join(['?'] * (len(SQLITE_CONFIG_COLS) + 1))});"
+  pdb_query = "INSERT INTO shard_perf_db (config, solver, params) "\
+      "VALUES (?, ?, ?);"
+
+  rows = get_pdb_rows(dbt, args, shard)
+  for perf_db_entry, cfg_dict in get_pdb_entries(dbt, rows):
+    if cfg_dict is not None:
+      cnx.execute(cfg_query, [perf_db_entry.config] +
+                  [cfg_dict[col] for col in SQLITE_CONFIG_COLS])
+    cnx.execute(pdb_query,
+                [getattr(perf_db_entry, col) for col in SQLITE_PERF_DB_COLS])
+
+  cnx.commit()
+  cnx.close()
+  return shard_name
+
+
+def read_pdb_shard(shard_name):
+  """ yield the (perf_db_entry, cfg_dict) pairs staged in a shard """
+  cnx = sqlite3.connect(shard_name)
+  try:
+    cfgs = {
+        row[0]: dict(zip(SQLITE_CONFIG_COLS, row[1:])) for row in cnx.execute(
+            f"SELECT mysql_id, {', '.join(SQLITE_CONFIG_COLS)} FROM shard_config;"
+        )
+    }
+    for row in cnx.execute(
+        f"SELECT {', '.join(SQLITE_PERF_DB_COLS)} FROM shard_perf_db ORDER BY id;"
+    ):
+      perf_db_entry = PdbRow(*row)
+      yield perf_db_entry, cfgs.pop(perf_db_entry.config, None)
+  finally:
+    cnx.close()
+
+
+def export_pdb(dbt, args):
+  """ export perf db from mysql to sqlite """
+  if getattr(args, 'jobs', 1) > 1:
+    shard_names = run_shards(
+        export_pdb_shard, args.jobs,
+        [(args, (idx, args.jobs)) for idx in range(args.jobs)])
+    #shards hold disjoint configs, each ordered by config
+    pdb_entries = merge(*map(read_pdb_shard, shard_names),
+                        key=lambda entry: entry[0].config)
+  else:
+    shard_names = []
+    pdb_entries = get_pdb_entries(dbt, get_pdb_rows(dbt, args))
+
+  cnx, local_path = create_sqlite_tables(args.arch, args.num_cu, args.filename)
+  write_pdb_entries(cnx, pdb_entries)
+  cnx.close()
+  for name in shard_names:
+    os.remove(name)
+
   return local_path
 
 
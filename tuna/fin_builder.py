@@ -26,7 +26,6 @@
 ###############################################################################
 """Builder class implements the worker interface. The purpose of this class is to run fin
 jobs in compile mode"""
-import json
 
 from sqlalchemy.exc import OperationalError, DataError, IntegrityError
 
@@ -41,23 +40,21 @@ class FinBuilder(WorkerInterface):
   new jobs and when completed, sets the state to compiled. """
 
   def get_fin_input(self):
-    """Create the input dict for fin, serialize to json and write to machine
-       Returns the filename on machine"""
-    # convert self.job and self.config to a json string
-    fjob = fin_job(self.fin_steps, self.dynamic_solvers_only, self.job,
-                   self.config, self.dbt)
+    """Create the input dict for fin and serialize it to json
+       Returns the json, or the filename on machine with file transport"""
+    # convert the jobs of the batch and their configs to a json string
+    fjob = [
+        fin_job(self.fin_steps, self.dynamic_solvers_only, job, config,
+                self.dbt) for job, config, _ in self.batch_jobs()
+    ]
 
-    fjob = [fjob]
-
-    fin_input = self.machine.write_file(json.dumps(fjob, indent=2).encode(),
-                                        is_temp=True)
-    return fin_input
+    return self.write_fin_input(fjob)
 
   def compose_job_cache_entrys(self, session, pdb_obj):
     """Compose new pdb kernel cache entry from fin input"""
     for kern_obj in pdb_obj['kernel_objects']:
       kernel_obj = self.dbt.fin_cache_table()
-      self.populate_kernels(kern_obj, kernel_obj)
+      self.populate_kernels(session, kern_obj, kernel_obj)
       kernel_obj.solver_id = self.solver_id_map[pdb_obj['solver_name']]
       kernel_obj.job_id = self.job.id
 
@@ -96,14 +93,23 @@ class FinBuilder(WorkerInterface):
       return False
     # pylint: enable=duplicate-code
 
-    if not self.get_job("new", "compile_start", True):
+    if not self.get_job_batch("new", "compile_start", True):
       return False
 
-    # JD: while fin can exec multiple jobs at a time, that makes error detection difficult
-    self.logger.info('Acquired new job: job_id=%s', self.job.id)
-    self.set_job_state('compiling')
+    self.logger.info('Acquired new jobs: job_ids=%s',
+                     [job.id for job, _, _ in self.job_batch])
+    self.set_batch_state('compiling')
     fin_json = self.run_fin_cmd()
 
+    # fin output is split per job so each job gets its own state and result
+    for job_item, job_json in self.demux_fin_output(fin_json):
+      self.use_job(job_item)
+      self.process_compile_result(job_json)
+
+    return True
+
+  def process_compile_result(self, fin_json):
+    """Update the db from the fin output of the current job and set its state"""
     failed_job = True
     result_str = ''
     if fin_json:
@@ -134,4 +140,3 @@ class FinBuilder(WorkerInterface):
       self.set_job_state('errored', result=result_str)
     else:
       self.set_job_state('compiled', result=result_str)
-    return True
@@ -115,7 +115,7 @@ class FinClass(WorkerInterface):
         self.logger.info("Fin: copying local fin input_file: %s to remote %s",
                          self.local_file, fin_ifile)
         # TODO: remove redundant file copies  # pylint: disable=fixme
-        self.cnx.ssh.open_sftp().put(self.local_file, fin_ifile)
+        self.cnx.put_file(self.local_file, fin_ifile)
         self.logger.info("Fin: Successfully copied to remote")
       except paramiko.ssh_exception.SSHException:
         self.logger.warning('unable to connect to remote %s', fin_ifile)
@@ -26,38 +26,82 @@
 ###############################################################################
 """Fin Evaluator class implements the worker interface. The purpose of this class
 is to run fin commands in benchmarking mode"""
-from time import sleep
-import functools
-import json
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep, time
 
-from sqlalchemy.exc import OperationalError
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 
 from tuna.worker_interface import WorkerInterface
 from tuna.fin_utils import fin_job
 from tuna.fin_utils import get_fin_slv_status, get_fin_result
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.utils.db_utility import session_retry
+from tuna.utils.blob_store import query_kernels, get_blob_text
 
 MAX_ERRORED_JOB_RETRIES = 3
+# interval between checks of the job event table for compiled jobs
+EVENT_POLL_INTERVAL = 5  # in seconds
+# interval between checks for jobs that are left to compile
+PENDING_CHECK_INTERVAL = 60  # in seconds
 
 
-class FinEvaluator(WorkerInterface):
+class FinEvaluator(WorkerInterface):  #pylint: disable=too-many-instance-attributes
   """ The Evaluator class implements the worker class. Its purpose is to run benchmarking jobs
   and when completed sets the state of the job to evaluated. """
 
   def __init__(self, **kwargs):
     super().__init__(**kwargs)
     self.envmt.append(f"HIP_VISIBLE_DEVICES={self.gpu_id}")
+    #(job batch, fin input file) ready for the next launch, False when no jobs are left
+    self.staged = None
+    #(job batch, fin future) of the launch in flight
+    self.running = None
+    self.fin_pool = None
+    #connection of the fin thread, a connection cannot be shared by threads
+    self.fin_cnx = None
+    self.fin_end = None
+    self.idle_stats = {'launches': 0, 'idle': 0.0, 'max_idle': 0.0}
+    #id of the last compiled job event seen
+    self.event_cursor = 0
 
   def get_job(self, find_state, set_state, imply_end):
-    """Polling to see if job available"""
+    """Polling to see if job available, while builders still have jobs to
+    compile wait for them to publish compiled jobs"""
     self.logger.info('find job: %s', find_state)
-    if not super().get_job(find_state, set_state, imply_end):
-      with self.bar_lock:
-        self.num_procs.value -= 1
-      return False
+    while not super().get_job(find_state, set_state, imply_end):
+      if self.running is not None:
+        # a fin launch is in flight, try again once it is ingested
+        return False
+      if find_state != 'compiled' or not self.wait_for_compiled():
+        self.release_proc()
+        return False
+      self.queue_end_reset()
     return True
 
+  def wait_for_compiled(self):
+    """Wait for a compiled job event after the cursor, False once no jobs
+    are left to compile"""
+    self.logger.info('Waiting for compiled jobs, event cursor: %s',
+                     self.event_cursor)
+    start = time()
+    last_check = start
+    if not self.compile_jobs_pending():
+      return False
+    while True:
+      cursor = self.get_job_event('compiled', self.event_cursor)
+      if cursor:
+        self.event_cursor = cursor
+        self.logger.info('Compiled jobs published, waited %.1fs, cursor: %s',
+                         time() - start, cursor)
+        return True
+      if self.chk_abort():
+        return False
+      if time() - last_check > PENDING_CHECK_INTERVAL:
+        if not self.compile_jobs_pending():
+          return False
+        last_check = time()
+      sleep(EVENT_POLL_INTERVAL)
+
   def check_gpu(self):
     """Function to check gpu heartbeat"""
     for _ in range(5):
@@ -96,9 +140,9 @@ class FinEvaluator(WorkerInterface):
 
       solvers = [x['solver_name'] for x in perf_compile_res]
 
-      query = session.query(self.dbt.fin_cache_table).filter(
+      query = query_kernels(session, self.dbt.fin_cache_table).filter(
           self.dbt.fin_cache_table.job_id == self.job.id)
-      for cache_entry in query.all():
+      for cache_entry, stored_blob in query.all():
         slv_name = self.id_solver_map[cache_entry.solver_id]
         #if job solver is defined limit entries to that solver
         if not self.job.solver or slv_name == self.job.solver:
@@ -106,7 +150,7 @@ class FinEvaluator(WorkerInterface):
           compile_entry['perf_compiled'] = True
 
           compile_entry['kernel_objects'].append({
-              'blob': cache_entry.kernel_blob.decode('utf-8'),
+              'blob': get_blob_text(cache_entry, stored_blob),
               'comp_options': cache_entry.kernel_args,
               'kernel_file': cache_entry.kernel_name,
               'md5_sum': cache_entry.kernel_hash,
@@ -115,7 +159,6 @@ class FinEvaluator(WorkerInterface):
 
       assert perf_compile_res
       fjob['miopen_perf_compile_result'] = perf_compile_res
-    fjob = [fjob]
     return fjob
 
   def fin_fdb_input(self, _fjob):
@@ -148,11 +191,11 @@ class FinEvaluator(WorkerInterface):
               'workspace': fdb_rec.workspace_sz
           }
           kernel_objects = []
-          blobs = session.query(self.dbt.kernel_cache).filter(
+          blobs = query_kernels(session, self.dbt.kernel_cache).filter(
               self.dbt.kernel_cache.kernel_group == fdb_rec.kernel_group)
-          for obj in blobs.all():
+          for obj, stored_blob in blobs.all():
             kernel_objects.append({
-                'blob': obj.kernel_blob.decode('utf-8'),
+                'blob': get_blob_text(obj, stored_blob),
                 'comp_options': obj.kernel_args,
                 'kernel_file': obj.kernel_name,
                 'md5_sum': obj.kernel_hash,
@@ -163,52 +206,86 @@ class FinEvaluator(WorkerInterface):
 
       assert find_compile_res
       fjob['miopen_find_compile_result'] = find_compile_res
-    fjob = [fjob]
     return fjob
 
-  def get_fin_input(self):
-    """ Populate the input for fin and write to a tempfile on machine
-    """
+  def get_job_fin_input(self):
+    """ Compose the fin input of the current job """
     steps = ['alloc_buf', self.fin_steps[0]]
     fjob = fin_job(steps, self.dynamic_solvers_only, self.job, self.config,
                    self.dbt)
 
-    try:
-      if self.fin_steps[0] == 'miopen_perf_eval':
-        fjob = self.fin_pdb_input(fjob)
-      elif self.fin_steps[0] == 'miopen_find_eval':
-        fjob = self.fin_fdb_input(fjob)
-    except AssertionError as err:
-      self.logger.error('Unable to get compiled objects for job %s : %s',
-                        self.job.id, err)
-      raise AssertionError from err
-
-    return self.machine.write_file(json.dumps(fjob, indent=2).encode(),
-                                   is_temp=True)
-
-  def update_fdb_eval_entry(self, session, fdb_obj):
-    """update fdb with individual fin json entry"""
-    if fdb_obj['evaluated']:
-      obj, _ = self.get_fdb_entry(session,
-                                  self.solver_id_map[fdb_obj['solver_name']])
-      if not obj:
-        self.logger.info(
-            'Unable to find fdb entry for config: %s, solver: %s, '\
-            'arch: %s, num_cu: %s, direction: %s',
-            self.config.id, self.solver_id_map[fdb_obj['solver_name']],
-            self.dbt.session.arch, self.dbt.session.num_cu, self.config.direction)
-        raise ValueError("Unable to query find db entry")
-      fdb_entry = obj
-      fdb_entry.alg_lib = fdb_obj['algorithm']
-      fdb_entry.kernel_time = fdb_obj['time']
-      fdb_entry.workspace_sz = fdb_obj['workspace']
-      fdb_entry.session = self.dbt.session.id
-      fdb_entry.params = fdb_obj['params']
-    else:
-      self.logger.warning("Not evaluated: job(%s), solver(%s), %s", self.job.id,
-                          fdb_obj['solver_name'], fdb_obj['reason'])
+    if self.fin_steps[0] == 'miopen_perf_eval':
+      fjob = self.fin_pdb_input(fjob)
+    elif self.fin_steps[0] == 'miopen_find_eval':
+      fjob = self.fin_fdb_input(fjob)
 
-    self.logger.info('Updating find db(Eval) for job_id=%s', self.job.id)
+    return fjob
+
+  def get_fin_input(self):
+    """ Populate the input for fin, written to a tempfile on machine with file
+    transport, jobs of the batch without compiled objects are errored and dropped
+    """
+    fjobs = []
+    batch = []
+    for job_item in self.batch_jobs():
+      self.use_job(job_item)
+      try:
+        fjobs.append(self.get_job_fin_input())
+        batch.append(job_item)
+      except AssertionError as err:
+        self.logger.error('Unable to get compiled objects for job %s : %s',
+                          self.job.id, err)
+        self.set_job_state('errored')
+
+    self.job_batch = batch
+    if not batch:
+      raise AssertionError('No compiled objects for any job of the batch')
+
+    return self.write_fin_input(fjobs)
+
+  def get_fdb_eval_rows(self, session):
+    """Load the find db rows of the current config with a single query,
+    keyed by solver id"""
+    fdb_table = self.dbt.find_db_table
+    fdb_entry = fdb_table()
+    fdb_entry.config = self.config.id
+    fdb_entry.session = self.dbt.session.id
+    fdb_entry.opencl = False
+    fdb_entry.logger = self.logger
+    query = fdb_entry.get_query(session, fdb_table, self.dbt.session.id)\
+        .with_entities(fdb_table.id, fdb_table.solver, fdb_table.fdb_key)
+
+    fdb_rows = {}
+    for row in query.all():
+      fdb_rows.setdefault(row.solver, row)
+
+    return fdb_rows
+
+  def compose_fdb_eval_values(self, fdb_row, fdb_obj):
+    """Compose the find db row values for an evaluated fin json entry"""
+    return {
+        'id': fdb_row.id,
+        'config': self.config.id,
+        'solver': fdb_row.solver,
+        'session': self.dbt.session.id,
+        'opencl': False,
+        'fdb_key': fdb_row.fdb_key,
+        'alg_lib': fdb_obj['algorithm'],
+        'kernel_time': fdb_obj['time'],
+        'workspace_sz': fdb_obj['workspace'],
+        'params': fdb_obj['params']
+    }
+
+  def upsert_fdb_eval(self, session, values):
+    """Write all evaluated find db entries of a job in one statement"""
+    # pylint: disable-next=no-member
+    stmt = mysql_insert(self.dbt.find_db_table.__table__).values(values)
+    stmt = stmt.on_duplicate_key_update(alg_lib=stmt.inserted.alg_lib,
+                                        kernel_time=stmt.inserted.kernel_time,
+                                        workspace_sz=stmt.inserted.workspace_sz,
+                                        session=stmt.inserted.session,
+                                        params=stmt.inserted.params)
+    session.execute(stmt)
     session.commit()
 
     return True
@@ -216,41 +293,49 @@ class FinEvaluator(WorkerInterface):
   def process_fdb_eval(self, fin_json, result_str='miopen_find_eval_result'):
     """process find db eval json results"""
     status = []
-    fdb_obj = None
+    values = []
+    updated = []
     with DbSession() as session:
-
-      def actuator(func, fdb_obj):
-        return func(session, fdb_obj)
+      fdb_rows = self.get_fdb_eval_rows(session)
 
       for fdb_obj in fin_json[result_str]:
         self.logger.info('Processing object: %s', fdb_obj)
         slv_stat = get_fin_slv_status(fdb_obj, 'evaluated')
+        status.append(slv_stat)
+        if not fdb_obj['evaluated']:
+          self.logger.warning("Not evaluated: job(%s), solver(%s), %s",
+                              self.job.id, fdb_obj['solver_name'],
+                              fdb_obj['reason'])
+          continue
+
+        solver = self.solver_id_map[fdb_obj['solver_name']]
+        if solver not in fdb_rows:
+          self.logger.info(
+              'Unable to find fdb entry for config: %s, solver: %s, '\
+              'arch: %s, num_cu: %s, direction: %s',
+              self.config.id, solver, self.dbt.session.arch,
+              self.dbt.session.num_cu, self.config.direction)
+          slv_stat['success'] = False
+          slv_stat['result'] = 'FinEval: Unable to query find db entry'
+          continue
+
+        values.append(self.compose_fdb_eval_values(fdb_rows[solver], fdb_obj))
+        updated.append(slv_stat)
+
+      if values:
+        self.logger.info('Updating find db(Eval) for job_id=%s, entries: %s',
+                         self.job.id, len(values))
         #retry returns false on failure, callback return on success
-        ret = session_retry(session, self.update_fdb_eval_entry,
-                            functools.partial(actuator, fdb_obj=fdb_obj),
-                            self.logger)
+        ret = session_retry(session, self.upsert_fdb_eval,
+                            lambda x: x(session, values), self.logger)
         if not ret:
           self.logger.warning('FinEval: Unable to update Database')
-          slv_stat['success'] = False
-          slv_stat['result'] = 'FinEval: Unable to update Database'
-
-        status.append(slv_stat)
+          for slv_stat in updated:
+            slv_stat['success'] = False
+            slv_stat['result'] = 'FinEval: Unable to update Database'
 
     return status
 
-  def clean_cache_table(self):
-    """Remove the fin cache kernel entries for this job"""
-    with DbSession() as session:
-      try:
-        old_cache = session.query(self.dbt.fin_cache_table)\
-            .filter(self.dbt.fin_cache_table.job_id == self.job.id)
-        old_cache.delete()
-        session.commit()
-      except OperationalError as err:
-        session.rollback()
-        self.logger.warning('FinEval: Unable to clean %s: %s',
-                            self.dbt.fin_cache_table.__tablename__, err)
-
   def step(self):
     """Function that defined the evaluator specific functionality which implies picking up jobs
     to benchmark and updating DB with evaluator specific state"""
@@ -263,19 +348,124 @@ class FinEvaluator(WorkerInterface):
       return False
     # pylint: enable=duplicate-code
 
-    if not self.get_job("compiled", "eval_start", True):
-      return False
+    if self.fin_pool is None:
+      self.fin_pool = ThreadPoolExecutor(max_workers=1)
+
+    if self.running is None:
+      while self.staged is None:
+        self.stage_batch()
+      if not self.staged:
+        self.stop_fin_thread()
+        return False
+      self.launch_staged()
+
+    if self.prefetch and self.staged is None:
+      # claim the next batch and write its input while the gpu is busy
+      self.stage_batch()
+
+    batch, fin_future = self.running
+    self.running = None
+    fin_json, self.fin_transport = fin_future.result()
+
+    # fin output is split per job so each job gets its own state and result,
+    # the gpu checks of failed jobs run before the next launch
+    last_reset = self.last_reset
+    self.job_batch = batch
+    for job_item, job_json in self.demux_fin_output(fin_json):
+      self.use_job(job_item)
+      self.process_eval_result(job_json)
+
+    if self.staged and self.last_reset != last_reset and not isinstance(
+        self.staged[1], bytes):
+      # the staged input file did not survive the reset of the machine
+      self.unstage()
+    if self.staged:
+      self.launch_staged()
 
-    orig_state = 'compiled'
-    self.logger.info('Acquired new job: job_id=%s', self.job.id)
-    self.set_job_state('evaluating')
+    return True
+
+  def stop_fin_thread(self):
+    """Stop the fin thread and close its connection"""
+    self.fin_pool.shutdown()
+    if self.fin_cnx is not None:
+      self.fin_cnx.close()
+      self.fin_cnx = None
+
+  def stage_batch(self):
+    """Claim the next batch and write its fin input to the machine, staged
+    stays None if no job of the batch could be staged"""
+    if not self.get_job_batch("compiled", "eval_start", True):
+      # with a launch in flight the evaluator looks again after ingesting it
+      self.staged = None if self.running else False
+      return
+
+    self.logger.info('Acquired new jobs: job_ids=%s',
+                     [job.id for job, _, _ in self.job_batch])
     try:
-      fin_json = self.run_fin_cmd()
+      self.staged = (self.job_batch, self.get_fin_input())
     except AssertionError as err:
-      self.set_job_state('errored')
-      self.logger.warning('Unable to launch job %s : %s', self.job.id, err)
-      return True
-
+      self.logger.warning('Unable to stage jobs: %s', err)
+      self.staged = None
+
+  def unstage(self):
+    """Hand the staged jobs back to the evaluators"""
+    batch, _ = self.staged
+    self.staged = None
+    self.logger.warning('Returning staged jobs: job_ids=%s',
+                        [job.id for job, _, _ in batch])
+    for job_item in batch:
+      self.use_job(job_item)
+      self.set_job_state('compiled')
+
+  def launch_staged(self):
+    """Start fin on the staged batch in the fin thread"""
+    self.job_batch, fin_input = self.staged
+    self.staged = None
+    self.set_batch_state('evaluating')
+
+    if self.fin_end is not None:
+      idle = time() - self.fin_end
+      self.idle_stats['launches'] += 1
+      self.idle_stats['idle'] += idle
+      self.idle_stats['max_idle'] = max(self.idle_stats['max_idle'], idle)
+      self.logger.info(
+          'GPU %s idle for %.3fs before %s jobs (avg %.3fs, max %.3fs, '
+          'launches %s)', self.gpu_id, idle, len(self.job_batch),
+          self.idle_stats['idle'] / self.idle_stats['launches'],
+          self.idle_stats['max_idle'], self.idle_stats['launches'])
+
+    self.running = (self.job_batch,
+                    self.fin_pool.submit(self.run_staged_fin, fin_input,
+                                         self.job_batch))
+
+  def run_staged_fin(self, fin_input, batch):
+    """Run fin on a staged input, runs in the fin thread on its own connection.
+    Returns the fin output and the transport to use from now on"""
+    if self.fin_cnx is None:
+      self.fin_cnx = self.machine.new_connection()
+    try:
+      return self.run_fin_input(fin_input, batch, self.fin_cnx)
+    finally:
+      self.fin_end = time()
+
+  def reset_job_state(self):
+    """Reset the jobs of the launch in flight and of a staged batch along
+    with the current ones"""
+    jobs = {
+        job.id: (job, config, solver) for job, config, solver in self.job_batch
+    }
+    for pending in (self.running, self.staged):
+      if pending:
+        jobs.update((job.id, (job, config, solver))
+                    for job, config, solver in pending[0])
+    self.running = None
+    self.staged = None
+    self.job_batch = list(jobs.values())
+    super().reset_job_state()
+
+  def process_eval_result(self, fin_json):
+    """Update the db from the fin output of the current job and set its state"""
+    orig_state = 'compiled'
     failed_job = True
     result_str = ''
     if fin_json:
@@ -306,6 +496,3 @@ class FinEvaluator(WorkerInterface):
                            result=result_str)
     else:
       self.set_job_state('evaluated', result=result_str)
-      self.clean_cache_table()
-
-    return True
@@ -85,6 +85,15 @@ def get_fin_result(status):
   return success, result_str
 
 
+def get_result_solvers(job_json):
+  """Names of the solvers in the step results of a fin job output"""
+  return {
+      obj['solver_name'] for key, val in job_json.items()
+      if key.endswith('_result') and isinstance(val, list) for obj in val
+      if isinstance(obj, dict) and 'solver_name' in obj
+  }
+
+
 def compose_config_obj(config, config_type=ConfigType.convolution):
   """Helper function to compose non-conv config obj"""
   return_config = {}
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Module to run commands concurrently on the machines of the fleet"""
+
+import sys
+from queue import Queue
+from threading import Lock
+from time import time, sleep
+from concurrent.futures import ThreadPoolExecutor
+
+from tuna.metadata import DOCKER_CMD
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('fleet')
+
+# max number of commands in flight across the fleet
+FANOUT_WORKERS = 32
+# max number of commands in flight on a single machine
+HOST_LIMIT = 4
+# time a task takes in a dry run
+DRY_RUN_TASK_TIME = 0.05  # in seconds
+
+
+class FleetTask():  #pylint: disable=too-many-instance-attributes, too-few-public-methods
+  """A command for one machine, or one gpu of a machine"""
+
+  def __init__(self, machine, name, func, gpu_id=None, use_cnx=True):
+    self.machine = machine
+    self.name = name
+    self.func = func
+    self.gpu_id = gpu_id
+    self.use_cnx = use_cnx
+    self.success = None
+    self.output = ''
+    self.elapsed = 0.0
+
+  def get_sort_key(self):
+    """report order, per host and then per gpu"""
+    gpu_id = -1 if self.gpu_id is None else self.gpu_id
+    return (self.machine.hostname or '', self.machine.port or
+            0, gpu_id, self.name)
+
+
+class FleetExecutor():  #pylint: disable=too-many-instance-attributes
+  """Bounded thread pool running FleetTasks, each machine has a pool of at
+  most host_limit connections which also bounds the tasks running on it"""
+
+  def __init__(self,
+               max_workers=FANOUT_WORKERS,
+               host_limit=HOST_LIMIT,
+               dry_run=False,
+               progress=sys.stderr):
+    self.max_workers = max_workers
+    self.host_limit = host_limit
+    self.dry_run = dry_run
+    self.progress = progress
+    self.tasks = []
+    self.cnx_pools = {}
+    self.lock = Lock()
+    self.done = 0
+    self.failed = 0
+    self.start = None
+    self.elapsed = 0.0
+
+  def add(self, machine, name, func, gpu_id=None, use_cnx=True):
+    """queue func(machine, cnx, gpu_id) which returns (success, output)"""
+    task = FleetTask(machine, name, func, gpu_id, use_cnx)
+    self.tasks.append(task)
+    return task
+
+  def get_cnx_pool(self, machine):
+    """pool of connections of a machine, created lazily by the tasks"""
+    key = (machine.hostname, machine.port)
+    with self.lock:
+      if key not in self.cnx_pools:
+        pool = Queue()
+        for _ in range(self.host_limit):
+          pool.put(None)
+        self.cnx_pools[key] = pool
+      return self.cnx_pools[key]
+
+  def run_task(self, task):
+    """run a task on a connection from its machine pool"""
+    pool = self.get_cnx_pool(task.machine)
+    cnx = pool.get()
+    start = time()
+    try:
+      if self.dry_run:
+        sleep(DRY_RUN_TASK_TIME)
+        task.success, task.output = True, 'dry run'
+      else:
+        if cnx is None and task.use_cnx:
+          cnx = task.machine.new_connection()
+        task.success, task.output = task.func(task.machine, cnx, task.gpu_id)
+    except Exception as err:  # pylint: disable=broad-except
+      LOGGER.warning('%s failed on %s: %s', task.name, task.machine.hostname,
+                     err)
+      task.success, task.output = False, str(err)
+    finally:
+      task.elapsed = time() - start
+      pool.put(cnx)
+    self.update_progress(task)
+    return task
+
+  def update_progress(self, task):
+    """count a finished task and refresh the progress line"""
+    with self.lock:
+      self.done += 1
+      if not task.success:
+        self.failed += 1
+      if self.progress is not None:
+        self.progress.write(
+            f'\r{self.done}/{len(self.tasks)} done, {self.failed} failed,'
+            f' {time() - self.start:.1f}s')
+        self.progress.flush()
+
+  def run(self):
+    """run all tasks, returns them in report order"""
+    self.start = time()
+    if self.tasks:
+      with ThreadPoolExecutor(
+          max_workers=min(self.max_workers, len(self.tasks))) as pool:
+        list(pool.map(self.run_task, self.tasks))
+    self.close_pools()
+    self.elapsed = time() - self.start
+    if self.progress is not None and self.tasks:
+      self.progress.write('\n')
+      self.progress.flush()
+    return sorted(self.tasks, key=FleetTask.get_sort_key)
+
+  def close_pools(self):
+    """close the connections the tasks opened, the pools are idle by now"""
+    for pool in self.cnx_pools.values():
+      for _ in range(pool.qsize()):
+        cnx = pool.get()
+        if cnx is not None:
+          cnx.close()
+        pool.put(None)
+
+  def report(self):
+    """log the results per host and gpu, returns False if any task failed"""
+    for task in sorted(self.tasks, key=FleetTask.get_sort_key):
+      gpu = '-' if task.gpu_id is None else task.gpu_id
+      LOGGER.info('Machine: (%s, %s) GPU_ID: %s %s %s (%.2fs) %s',
+                  task.machine.hostname, task.machine.port, gpu, task.name,
+                  'OK' if task.success else 'ERROR', task.elapsed, task.output)
+    serial = sum(task.elapsed for task in self.tasks)
+    LOGGER.info('%u tasks on %u machines, %u failed: %.2fs, serial %.2fs%s',
+                len(self.tasks), len(self.cnx_pools), self.failed, self.elapsed,
+                serial, ' (dry run)' if self.dry_run else '')
+    return self.failed == 0
+
+
+def read_output(out):
+  """last line of a command output"""
+  if out is None:
+    return ''
+  lines = [line.strip() for line in out.readlines() if line.strip()]
+  return lines[-1] if lines else ''
+
+
+def fleet_gpu_status(machine, cnx, gpu_id):
+  """can clinfo find the gpu"""
+  if machine.chk_gpu_status(gpu_id, cnx):
+    return True, ''
+  return False, 'clinfo failed'
+
+
+def fleet_docker_status(_machine, cnx, _gpu_id, docker_name='miopentuna'):
+  """is docker running and is the image present"""
+  prefix = ''
+  ret_code, _, _ = cnx.exec_command('docker info')
+  if ret_code != 0:
+    prefix = 'sudo '
+    ret_code, _, _ = cnx.exec_command('sudo docker info')
+    if ret_code != 0:
+      return False, 'docker not installed or failed to run with sudo'
+  _, out, _ = cnx.exec_command(f'{prefix}docker images | grep {docker_name}')
+  if out is None or docker_name not in out.read():
+    return False, f'{docker_name} docker image does not exist'
+  return True, f'{docker_name} docker image exists'
+
+
+def fleet_exec(machine, cnx, _gpu_id, cmd=None):
+  """execute cmd on the machine"""
+  machine.get_logger().info(cmd)
+  ret_code, out, _ = cnx.exec_command(cmd + ' 2>&1 ')
+  return ret_code == 0, read_output(out)
+
+
+def fleet_docker_exec(machine, cnx, _gpu_id, cmd=None, docker_name=None):
+  """execute cmd in the docker of the machine"""
+  if not machine.local_machine:
+    cmd = DOCKER_CMD.format(docker_name, cmd)
+  return fleet_exec(machine, cnx, _gpu_id, cmd=cmd)
+
+
+def fleet_restart(machine, _cnx, _gpu_id):
+  """restart the machine without waiting for it"""
+  return machine.restart_server(wait=False), ''
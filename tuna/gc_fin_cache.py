@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Delete the fin_job_cache rows no evaluator needs anymore in chunks of
+rows ordered by id, then the job events older than the ttl and the kernel
+blobs the rows were the last to reference"""
+from datetime import datetime, timedelta
+from time import sleep, time
+
+from sqlalchemy import exists, func as sqla_func
+
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.miopen_tables import ConvFinJobCache, ConvolutionJob
+from tuna.miopen_tables import BNFinJobCache, BNJob, KernelBlob
+from tuna.miopen_tables import ConvJobEvent, BNJobEvent
+from tuna.parse_args import TunaArgs, setup_arg_parser
+from tuna.utils.blob_store import collect_blobs
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('gc_fin_cache')
+
+# fin cache tables and the job tables they belong to
+FIN_CACHE_TABLES = [(ConvFinJobCache, ConvolutionJob), (BNFinJobCache, BNJob)]
+# job state change logs, evaluators only wait on the latest events
+JOB_EVENT_TABLES = [ConvJobEvent, BNJobEvent]
+# jobs in these states still have their compiled kernels evaluated
+ACTIVE_STATES = ['compiled', 'eval_start', 'evaluating']
+GC_CHUNK = 500  # rows scanned per transaction
+GC_TTL = 24  # in hours
+GC_TIME_BUDGET = 3600  # in seconds
+GC_PAUSE = 0.5  # in seconds, lets the purge catch up between chunks
+
+
+def parse_args():
+  """command line argument parsing"""
+  parser = setup_arg_parser(
+      'Delete the fin cache rows of completed, errored, reset and deleted jobs',
+      [TunaArgs.DRY_RUN])
+  parser.add_argument(
+      '--ttl',
+      dest='ttl',
+      type=float,
+      default=GC_TTL,
+      help=f'Only delete the rows not updated, and the job events older than,'
+      f' this many hours (default {GC_TTL})')
+  parser.add_argument('--chunk',
+                      dest='chunk',
+                      type=int,
+                      default=GC_CHUNK,
+                      help=f'Rows scanned per transaction (default {GC_CHUNK})')
+  parser.add_argument(
+      '--time_budget',
+      dest='time_budget',
+      type=float,
+      default=GC_TIME_BUDGET,
+      help=f'Stop after this many seconds, the log shows the table and id to'
+      f' resume from (default {GC_TIME_BUDGET})')
+  parser.add_argument(
+      '--pause',
+      dest='pause',
+      type=float,
+      default=GC_PAUSE,
+      help=f'Seconds to wait between chunks (default {GC_PAUSE})')
+  parser.add_argument(
+      '--start_table',
+      dest='start_table',
+      type=str,
+      default=FIN_CACHE_TABLES[0][0].__tablename__,
+      choices=[table.__tablename__ for table, _ in FIN_CACHE_TABLES] +
+      [KernelBlob.__tablename__],
+      help='Resume the scan in this table, the tables before it are skipped')
+  parser.add_argument('--start_id',
+                      dest='start_id',
+                      type=int,
+                      default=0,
+                      help='Resume the scan of --start_table after this row id')
+  args = parser.parse_args()
+  if args.chunk < 1:
+    parser.error('chunk must be at least 1')
+  return args
+
+
+def get_stale_rows(session, table, job_table, id_range, cutoff):
+  """Rows of id_range not updated since cutoff whose job is deleted or done
+  with evaluation"""
+  active = exists().where(job_table.id == table.job_id)\
+      .where(job_table.state.in_(ACTIVE_STATES))
+  return session.query(table).filter(*id_range, table.update_ts < cutoff,
+                                     ~active)
+
+
+def get_start_tables(start_table):
+  """Return the fin cache tables from start_table on, none if the scan stopped
+  in kernel_blob"""
+  names = [table.__tablename__ for table, _ in FIN_CACHE_TABLES]
+  if start_table not in names:
+    return []
+  return FIN_CACHE_TABLES[names.index(start_table):]
+
+
+def gc_table(table, job_table, args, deadline, start_id=0):
+  """Delete the stale rows of table after start_id, returns the number of
+  scanned rows, of deleted rows, their inline blob bytes and the last scanned
+  id, which is None if the scan is complete"""
+  # pylint: disable=too-many-locals
+  cutoff = datetime.now() - timedelta(hours=args.ttl)
+  last_id = start_id
+  scanned = num_rows = freed = 0
+  start = time()
+  while True:
+    if time() > deadline:
+      LOGGER.warning(
+          '%s: time budget spent, resume with --start_table %s --start_id %u',
+          table.__tablename__, table.__tablename__, last_id)
+      return scanned, num_rows, freed, last_id
+    with DbSession() as session:
+      # walks the primary key only, the bound caps the rows locked per chunk
+      bound = session.query(table.id).filter(table.id > last_id)\
+          .order_by(table.id).offset(args.chunk - 1).limit(1).scalar()
+      id_range = [table.id > last_id]
+      if bound is not None:
+        id_range.append(table.id <= bound)
+      stale = get_stale_rows(session, table, job_table, id_range, cutoff)
+      rows = stale.with_entities(
+          table.id, sqla_func.coalesce(sqla_func.length(table.kernel_blob),
+                                       0)).all()
+      if bound is None:
+        scanned += session.query(sqla_func.count(
+            table.id)).filter(*id_range).scalar()
+      else:
+        scanned += args.chunk
+      if rows and not args.dry_run:
+        session.query(table).filter(table.id.in_(
+            [row[0] for row in rows])).delete(synchronize_session=False)
+        session.commit()
+    num_rows += len(rows)
+    freed += sum(row[1] for row in rows)
+    LOGGER.info('%s: scanned %u rows, %s %u rows, %u inline bytes (%.1fs)',
+                table.__tablename__, scanned,
+                'found' if args.dry_run else 'deleted', num_rows, freed,
+                time() - start)
+    if bound is None:
+      return scanned, num_rows, freed, None
+    last_id = bound
+    if rows and not args.dry_run:
+      sleep(args.pause)
+
+
+def gc_job_events(args, deadline):
+  """Delete the job events older than the ttl in chunks ordered by id,
+  returns the number of deleted events. The events are appended in id order
+  and deleted from the oldest, a stopped run needs no resume point"""
+  cutoff = datetime.now() - timedelta(hours=args.ttl)
+  num_events = 0
+  for table in JOB_EVENT_TABLES:
+    last_id = 0
+    start_events = num_events
+    while time() <= deadline:
+      with DbSession() as session:
+        ids = [
+            row[0] for row in session.query(table.id).filter(
+                table.id > last_id, table.insert_ts < cutoff).order_by(
+                    table.id).limit(args.chunk).all()
+        ]
+        if ids and not args.dry_run:
+          session.query(table).filter(
+              table.id.in_(ids)).delete(synchronize_session=False)
+          session.commit()
+      num_events += len(ids)
+      if len(ids) < args.chunk:
+        break
+      last_id = ids[-1]
+    LOGGER.info('%s: %s %u events', table.__tablename__,
+                'found' if args.dry_run else 'deleted',
+                num_events - start_events)
+  return num_events
+
+
+def main():
+  """main"""
+  args = parse_args()
+  deadline = time() + args.time_budget
+  action = 'Would delete' if args.dry_run else 'Deleted'
+  total_rows = total_freed = 0
+  # start_id only applies to the table the previous run stopped in
+  start_id = args.start_id
+  last_id = None
+  for table, job_table in get_start_tables(args.start_table):
+    scanned, num_rows, freed, last_id = gc_table(table, job_table, args,
+                                                 deadline, start_id)
+    start_id = 0
+    LOGGER.warning('%s: %s %u of %u scanned rows, %u bytes of inline blobs',
+                   table.__tablename__, action, num_rows, scanned, freed)
+    total_rows += num_rows
+    total_freed += freed
+    if last_id is not None:
+      break
+  num_blobs = size = num_events = 0
+  if last_id is None:
+    num_events = gc_job_events(args, deadline)
+    num_blobs, size, last_id = collect_blobs(args.chunk, deadline, args.dry_run,
+                                             start_id)
+    if last_id is not None:
+      LOGGER.warning(
+          '%s: time budget spent, resume with --start_table %s --start_id %u',
+          KernelBlob.__tablename__, KernelBlob.__tablename__, last_id)
+  LOGGER.warning('%s %u job events older than %s hours', action, num_events,
+                 args.ttl)
+  if args.dry_run:
+    LOGGER.warning(
+        'Would delete %u rows, %u bytes of inline blobs. %u kernel blobs, %u'
+        ' bytes, are unreferenced now, more may be once the rows are deleted',
+        total_rows, total_freed, num_blobs, size)
+  else:
+    LOGGER.warning(
+        'Deleted %u rows, %u bytes of inline blobs, and %u kernel blobs, %u'
+        ' bytes: %u bytes reclaimed', total_rows, total_freed, num_blobs, size,
+        total_freed + size)
+
+
+if __name__ == '__main__':
+  main()
@@ -26,7 +26,8 @@
 ###############################################################################
 """! @brief Script to launch tuning jobs, or execute commands on available machines"""
 import sys
-from multiprocessing import Value, Lock, Queue as mpQueue
+from functools import partial
+from multiprocessing import Value, Lock, Condition, Queue as mpQueue
 from subprocess import Popen, PIPE
 from sqlalchemy.exc import InterfaceError
 
@@ -35,8 +36,10 @@ from tuna.utils.logger import setup_logger
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.parse_args import TunaArgs, setup_arg_parser
 from tuna.tables import ConfigType
-from tuna.metadata import MIOPEN_ALG_LIST
+from tuna.metadata import MIOPEN_ALG_LIST, FIN_TRANSPORTS
 from tuna.helper import print_solvers
+from tuna.utils.fin_codec import FIN_CODECS
+from tuna.node_blob_cache import BLOB_CACHE_SIZE
 from tuna.miopen_tables import FinStep
 
 from tuna.fin_class import FinClass
@@ -45,6 +48,12 @@ from tuna.fin_builder import FinBuilder
 from tuna.fin_eval import FinEvaluator
 from tuna.worker_interface import WorkerInterface
 from tuna.session import Session
+from tuna.abort import ABORT_WATCHER
+from tuna.machine_inventory import MachineInventory
+from tuna.fleet import FleetExecutor, FANOUT_WORKERS, HOST_LIMIT
+from tuna.fleet import fleet_docker_status, fleet_gpu_status, fleet_exec
+from tuna.fleet import fleet_docker_exec, fleet_restart
+from tuna.machine_health import MachineHealth, stop_health_monitors
 
 # Setup logging
 LOGGER = setup_logger('go_fish')
@@ -56,7 +65,7 @@ def parse_args():
   parser = setup_arg_parser(
       'Run Performance Tuning on a certain architecture', [
           TunaArgs.ARCH, TunaArgs.NUM_CU, TunaArgs.VERSION,
-          TunaArgs.CONFIG_TYPE, TunaArgs.SESSION_ID
+          TunaArgs.CONFIG_TYPE, TunaArgs.SESSION_ID, TunaArgs.DRY_RUN
       ])
 
   parser.add_argument(
@@ -112,6 +121,57 @@ def parse_args():
                       default=None,
                       required=False,
                       help='Specify machine ids to use, comma separated')
+  parser.add_argument(
+      '--fin_batch',
+      dest='fin_batch',
+      type=int,
+      default=1,
+      help='Number of jobs each worker runs in a single fin launch (default 1)')
+  parser.add_argument(
+      '--prefetch',
+      dest='prefetch',
+      action='store_true',
+      default=False,
+      help='Evaluators claim and stage the next fin input while fin runs')
+  parser.add_argument(
+      '--fin_transport',
+      dest='fin_transport',
+      type=str,
+      default=FIN_TRANSPORTS[0],
+      choices=FIN_TRANSPORTS,
+      help='Pass fin input/output through temp files on the machine (file,'
+      ' default) or over the exec channel (stream). Stream falls back to file'
+      ' if the input or output cannot be streamed')
+  parser.add_argument(
+      '--fin_codec',
+      dest='fin_codec',
+      type=str,
+      default=FIN_CODECS[0],
+      choices=FIN_CODECS,
+      help='Compression of the streamed fin payloads of remote machines, auto'
+      ' picks the best codec installed in the docker (default auto)')
+  parser.add_argument(
+      '--blob_cache_size',
+      dest='blob_cache_size',
+      type=int,
+      default=BLOB_CACHE_SIZE,
+      help='Size in MB of the kernel blob cache on each remote machine, fin'
+      ' inputs only send the blobs missing from it, 0 disables the cache'
+      f' (default {BLOB_CACHE_SIZE})')
+  parser.add_argument(
+      '--fanout',
+      dest='fanout',
+      type=int,
+      default=FANOUT_WORKERS,
+      help=f'Max commands in flight across machines for -e/-d/-s/-r'
+      f' (default {FANOUT_WORKERS})')
+  parser.add_argument(
+      '--host_limit',
+      dest='host_limit',
+      type=int,
+      default=HOST_LIMIT,
+      help=f'Max commands in flight on a single machine for -e/-d/-s/-r'
+      f' (default {HOST_LIMIT})')
   parser.add_argument('-i',
                       '--reset_interval',
                       type=int,
@@ -182,6 +242,12 @@ def parse_args():
   if args.blacklist:
     check_blacklist(args, parser)
 
+  if args.fin_batch < 1:
+    parser.error('fin_batch must be at least 1')
+
+  if args.fanout < 1 or args.host_limit < 1:
+    parser.error('fanout and host_limit must be at least 1')
+
   if args.machines is not None:
     args.machines = [int(x) for x in args.machines.split(',')
                     ] if ',' in args.machines else [int(args.machines)]
@@ -295,83 +361,35 @@ def get_envmt(args):
   return envmt
 
 
-def check_docker(worker, dockername="miopentuna"):
-  """! Checking for docker
-    @param worker The worker interface instance
-    @param dockername The name of the docker
-  """
-  LOGGER.warning("docker not installed or requires sudo .... ")
-  _, out2, _ = worker.exec_command("sudo docker info")
-  while not out2.channel.exit_status_ready():
-    LOGGER.warning(out2.readline())
-  if out2.channel.exit_status > 0:
-    LOGGER.warning("docker not installed or failed to run with sudo .... ")
-  else:
-    _, out, _ = worker.exec_command(f"sudo docker images | grep {dockername}")
-    line = None
-    for line in out.readlines():
-      if line.find(dockername) != -1:
-        LOGGER.warning('%s docker image exists', dockername)
-        break
-    if line is None:
-      LOGGER.warning('%s docker image does not exist', dockername)
-
-
-def check_status(worker, b_first, gpu_idx, machine, dockername="miopentuna"):
-  """! Function to check gpu_status
-    @param worker The worker interface instance
-    @param b_first Flag to keep track of visited GPU
-    @param gpu_idx Unique ID of the GPU
-    @param machine The machine instance
-    @param dockername The name of the docker
-  """
-
-  if machine.chk_gpu_status(worker.gpu_id):
-    LOGGER.info('Machine: (%s, %u) GPU_ID: %u OK', machine.hostname,
-                machine.port, gpu_idx)
-  else:
-    LOGGER.info('Machine: (%s, %u) GPU_ID: %u ERROR', machine.hostname,
-                machine.port, gpu_idx)
-
-  if not b_first:
-    return False
-  b_first = False
-  _, out, _ = worker.exec_command("docker info")
-  while not out.channel.exit_status_ready():
-    pass
-
-  if out.channel.exit_status > 0:
-    check_docker(worker, dockername)
-  else:
-    _, out, _ = worker.exec_command(f"docker images | grep {dockername}")
-    line = None
-    for line in out.readlines():
-      if line.find(dockername) != -1:
-        LOGGER.warning('%s docker image exists', dockername)
-        break
-    if line is None:
-      LOGGER.warning('%s docker image does not exist', dockername)
-
-  return True
-
-
-def execute_docker(worker, docker_cmd, machine):
-  """! Function to executed docker cmd
-    @param worker The worker interface instance
-    @param docker_cmd The command to be executed in the docker
-    @param machine The machine instance
+def fan_out(res, args):
+  """! Run the -e/-d/-s/-r commands concurrently on the machines
+    @param res DB query return item containg available machines
+    @param args The command line arguments
   """
-  LOGGER.info('Running on host: %s port: %u', machine.hostname, machine.port)
-  _, _, _ = worker.exec_docker_cmd(docker_cmd + " 2>&1")
-  #logger output already printed by exec_docker_cmd
-  #LOGGER.info(docker_cmd)
-  #while not out.channel.exit_status_ready():
-  #  lines = out.readline()
-  #  LOGGER.info(lines.rstrip())
-  #for line in out.readlines():
-  #  LOGGER.info(line.rstrip())
-
-  return True
+  fleet = FleetExecutor(max_workers=args.fanout,
+                        host_limit=args.host_limit,
+                        dry_run=args.dry_run)
+  if args.check_status:
+    MachineInventory().probe_all(res)
+  for machine in res:
+    if args.restart_machine:
+      fleet.add(machine, 'restart', fleet_restart, use_cnx=False)
+    elif args.check_status:
+      fleet.add(machine, 'docker',
+                partial(fleet_docker_status, docker_name=args.docker_name))
+      for gpu_idx in machine.get_avail_gpus():
+        fleet.add(machine, 'gpu', fleet_gpu_status, gpu_idx)
+    elif args.execute_cmd:
+      fleet.add(machine, 'exec', partial(fleet_exec, cmd=args.execute_cmd))
+    elif args.execute_docker_cmd:
+      fleet.add(
+          machine, 'docker_exec',
+          partial(fleet_docker_exec,
+                  cmd=args.execute_docker_cmd,
+                  docker_name=args.docker_name))
+
+  fleet.run()
+  return fleet.report()
 
 
 def get_kwargs(gpu_idx, f_vals, args):
@@ -390,6 +408,9 @@ def get_kwargs(gpu_idx, f_vals, args):
       'num_procs': f_vals["num_procs"],
       'barred': f_vals["barred"],
       'bar_lock': f_vals["bar_lock"],
+      'bar_cond': f_vals["bar_cond"],
+      'abort_flag': f_vals["abort_flag"],
+      'health': f_vals["health"],
       'envmt': envmt,
       'reset_interval': args.reset_interval,
       'fin_steps': args.fin_steps,
@@ -400,7 +421,12 @@ def get_kwargs(gpu_idx, f_vals, args):
       'docker_name': args.docker_name,
       'end_jobs': f_vals['end_jobs'],
       'config_type': args.config_type,
-      'session_id': args.session_id
+      'session_id': args.session_id,
+      'fin_batch': args.fin_batch,
+      'prefetch': args.prefetch,
+      'fin_transport': args.fin_transport,
+      'fin_codec': args.fin_codec,
+      'blob_cache_size': args.blob_cache_size
   }
 
   return kwargs
@@ -427,33 +453,23 @@ def launch_worker(gpu_idx, f_vals, worker_lst, args):
       worker = FinEvaluator(**kwargs)
     else:
       raise ValueError('Unsupported fin step')
+    f_vals["health"].start()
     worker.start()
     worker_lst.append(worker)
     return True
   if args.update_applicability:
     kwargs['fin_steps'] = ['applicability']
     worker = FinClass(**kwargs)
+    f_vals["health"].start()
     worker.start()
     worker_lst.append(worker)
     return True
 
   worker = WorkerInterface(**kwargs)
-  ret = False
-  if args.check_status:
-    if not check_status(worker, f_vals["b_first"], gpu_idx, f_vals["machine"],
-                        args.docker_name):
-      ret = True
-  elif args.init_session:
+  if args.init_session:
     Session().add_new_session(args, worker)
-  elif args.execute_cmd:
-    # JD: Move the worker.exec_command to machine
-    LOGGER.info(args.execute_cmd)
-    _, _, _ = worker.exec_command(args.execute_cmd + " 2>&1 ")
-    #log printed by exec_command
-  elif args.execute_docker_cmd:
-    execute_docker(worker, args.execute_docker_cmd, f_vals["machine"])
 
-  return ret
+  return False
 
 
 def do_fin_work(args, gpu, f_vals):
@@ -480,13 +496,19 @@ def compose_f_vals(args, machine):
   f_vals = {}
   f_vals["barred"] = Value('i', 0)
   f_vals["bar_lock"] = Lock()
+  #wakes the processes waiting at the barrier, shares the barrier lock
+  f_vals["bar_cond"] = Condition(f_vals["bar_lock"])
   f_vals["queue_lock"] = Lock()
   #multiprocess queue for jobs, shared on machine
   f_vals["job_queue"] = mpQueue()
   f_vals["machine"] = machine
   f_vals["envmt"] = get_envmt(args)
-  f_vals["b_first"] = True
   f_vals["end_jobs"] = Value('i', 0)
+  #abort files are checked once per node, workers read the flag
+  f_vals["abort_flag"] = ABORT_WATCHER.watch(machine.id, machine.arch)
+  #disk usage and docker versions are sampled once per machine, not per job,
+  #sampling starts with the first worker process
+  f_vals["health"] = MachineHealth(machine, args.docker_name)
 
   return f_vals
 
@@ -499,11 +521,8 @@ def compose_worker_list(res, args):
   """
   worker_lst = []
   fin_work_done = False
+  MachineInventory().probe_all(res)
   for machine in res:
-    if args.restart_machine:
-      machine.restart_server(wait=False)
-      continue
-
     #fin_steps should only contain one step
     if args.fin_steps and 'eval' in args.fin_steps[0]:
       worker_ids = machine.get_avail_gpus()
@@ -550,6 +569,11 @@ def main():
   try:
     res = load_machines(args)
 
+    if args.check_status or args.restart_machine or args.execute_cmd or \
+        args.execute_docker_cmd:
+      # a failed task on any machine fails the run for scripts and ci
+      sys.exit(0 if fan_out(res, args) else 1)
+
     worker_lst = compose_worker_list(res, args)
     if worker_lst is None:
       return
@@ -559,6 +583,9 @@ def main():
       LOGGER.warning('Process finished')
   except KeyboardInterrupt:
     LOGGER.warning('Interrupt signal caught')
+  finally:
+    ABORT_WATCHER.stop()
+    stop_health_monitors()
 
 
 if __name__ == '__main__':
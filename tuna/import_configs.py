@@ -26,7 +26,10 @@
 ###############################################################################
 """ Module for tagging and importing configs """
 import os
+import functools
+from hashlib import md5
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.parse_args import TunaArgs, setup_arg_parser
@@ -36,9 +39,19 @@ from tuna.tables import ConfigType
 from tuna.driver_conv import DriverConvolution
 from tuna.driver_bn import DriverBatchNorm
 from tuna.tables import DBTables
+from tuna.miopen_tables import TensorTable
+from tuna.metadata import CONV_CONFIG_COLS, CONV_CONFIG_MD5_COLS, BN_CONFIG_COLS
+from tuna.utils.db_utility import session_retry
 
 LOGGER = setup_logger('import_configs')
 
+#rows per multi row INSERT in bulk mode
+BULK_CHUNK = 1000
+#tensor table unique index
+TENSOR_KEY_COLS = [
+    'dim0', 'dim1', 'dim2', 'dim3', 'dim4', 'layout', 'num_dims', 'data_type'
+]
+
 
 def parse_args():
   """Parsing arguments"""
@@ -85,6 +98,12 @@ def parse_args():
       'Tag to mark the origin of this config but skips the insert new config \
                       step in case the config does not exist in the table. Wildcard columns \
                       allowed for tagging')
+  parser.add_argument(
+      '--bulk',
+      action='store_true',
+      dest='bulk',
+      help='Parse the whole file first, then insert tensors, configs and tags \
+                      with multi row statements')
 
   args = parser.parse_args()
   if args.batches is not None:
@@ -186,12 +205,16 @@ def process_config_line_v2(driver, args, counts, dbt):
   return True
 
 
+def get_driver(args, line):
+  """driver object for a driver line or fdb line"""
+  if args.config_type == ConfigType.batch_norm:
+    return DriverBatchNorm(line, args.command)
+  return DriverConvolution(line, args.command)
+
+
 def parse_line(args, line, counts, dbt):
   """parse a driver line or fdb line from an input file and insert the config"""
-  if args.config_type == ConfigType.batch_norm:
-    driver = DriverBatchNorm(line, args.command)
-  else:
-    driver = DriverConvolution(line, args.command)
+  driver = get_driver(args, line)
 
   if not args.batch_list:
     process_config_line_v2(driver, args, counts, dbt)
@@ -222,6 +245,183 @@ def import_cfgs(args, dbt):
   return counts
 
 
+def normalize_val(table, col, val):
+  """value as stored by the db, None falls back to the column default"""
+  column = table.__table__.columns[col]
+  if val is None and column.server_default is not None:
+    val = column.server_default.arg
+  if val is None:
+    return None
+  if column.type.python_type is int:
+    return round(float(val))
+  return str(val)
+
+
+def get_tensor_key(t_dict):
+  """hashable tensor key in the order of the tensor unique index"""
+  return tuple(
+      normalize_val(TensorTable, col, t_dict.get(col))
+      for col in TENSOR_KEY_COLS)
+
+
+def get_config_layout(args):
+  """config columns, (tensor column, compose function) pairs and md5 columns
+  for the config type"""
+  if args.config_type == ConfigType.batch_norm:
+    cfg_cols = list(dict.fromkeys(BN_CONFIG_COLS))
+    tensor_cols = [('input_tensor', DriverBatchNorm.compose_input_t)]
+    return cfg_cols, tensor_cols, cfg_cols + ['input_tensor']
+
+  tensor_cols = [('input_tensor', DriverConvolution.compose_input_t),
+                 ('weight_tensor', DriverConvolution.compose_weight_t)]
+  return CONV_CONFIG_COLS, tensor_cols, CONV_CONFIG_MD5_COLS
+
+
+def get_config_md5(cfg, md5_cols):
+  """md5 of a config, for conv_config the same value the md5 trigger sets"""
+  return md5(''.join(str(cfg[col]) for col in md5_cols).encode()).hexdigest()
+
+
+def parse_bulk_lines(args):
+  """parse all lines of the input file into unique (config, tensor keys) pairs"""
+  cfg_cols, tensor_cols, _ = get_config_layout(args)
+  entries = {}
+  num_lines = 0
+  with open(os.path.expanduser(args.file_name), "r") as infile:  # pylint: disable=unspecified-encoding
+    for line in infile:
+      try:
+        driver = get_driver(args, line)
+      except ValueError as err:
+        LOGGER.warning(err)
+        continue
+      num_lines += 1
+      for bsz in args.batch_list or [None]:
+        if bsz is not None:
+          driver.batchsize = bsz
+        cfg = tuple(getattr(driver, col, None) for col in cfg_cols)
+        tensors = tuple(
+            get_tensor_key(compose(driver)) for _, compose in tensor_cols)
+        entries[(cfg, tensors)] = True
+
+  LOGGER.info('Parsed %s lines, %s unique configs', num_lines, len(entries))
+  return list(entries)
+
+
+def chunks(lst, size=BULK_CHUNK):
+  """split a list in lists of at most size elements"""
+  return [lst[idx:idx + size] for idx in range(0, len(lst), size)]
+
+
+def execute_chunks(session, stmt, rows):
+  """execute a multi row statement for chunks of rows, one commit per chunk"""
+
+  def actuator(func, chunk):
+    return func(stmt.values(chunk))
+
+  def execute(query):
+    session.execute(query)
+    session.commit()
+    return True
+
+  for chunk in chunks(rows):
+    if not session_retry(session, execute,
+                         functools.partial(actuator, chunk=chunk), LOGGER):
+      raise ValueError('Bulk insert failed')
+
+
+def get_tensor_ids(session, tensor_keys, insert=True):
+  """map tensor keys to ids, missing tensors are bulk inserted"""
+  cols = [getattr(TensorTable, col) for col in TENSOR_KEY_COLS]
+  tensor_ids = {
+      get_tensor_key(row._asdict()): row.id
+      for row in session.query(TensorTable.id, *cols).all()
+  }
+  missing = [key for key in tensor_keys if key not in tensor_ids]
+  if missing and insert:
+    LOGGER.info('Inserting %s tensors', len(missing))
+    execute_chunks(
+        session,
+        mysql_insert(TensorTable.__table__).prefix_with('IGNORE'),  #pylint: disable=no-member
+        [dict(zip(TENSOR_KEY_COLS, key)) for key in missing])
+    return get_tensor_ids(session, tensor_keys, insert=False)
+
+  return tensor_ids
+
+
+def get_config_ids(session, table, md5_cols, input_tensors):
+  """map the md5 of existing configs using input_tensors to their id"""
+  cols = [getattr(table, col) for col in md5_cols]
+  config_ids = {}
+  for chunk in chunks(sorted(input_tensors)):
+    query = session.query(table.id, *cols).filter(table.input_tensor.in_(chunk))
+    for row in query.all():
+      config_ids[get_config_md5(row._asdict(), md5_cols)] = row.id
+
+  return config_ids
+
+
+def import_cfgs_bulk(args, dbt):  #pylint: disable=too-many-locals
+  """import configs from file with driver invocations, all lines are parsed
+  first, tensors, configs and tags are then written with multi row inserts"""
+  connect_db()
+
+  counts = {}
+  counts['cnt_configs'] = 0
+  counts['cnt_tagged_configs'] = set()
+
+  cfg_cols, tensor_cols, md5_cols = get_config_layout(args)
+  table = dbt.config_table
+  entries = parse_bulk_lines(args)
+  with DbSession() as session:
+    tensor_ids = get_tensor_ids(
+        session, {key for _, tensors in entries for key in tensors},
+        insert=not args.tag_only)
+
+    configs = {}
+    for cfg, tensors in entries:
+      if not all(key in tensor_ids for key in tensors):
+        continue
+      row = {
+          col: normalize_val(table, col, val)
+          for col, val in zip(cfg_cols, cfg)
+      }
+      for (col, _), key in zip(tensor_cols, tensors):
+        row[col] = tensor_ids[key]
+      configs[get_config_md5(row, md5_cols)] = row
+
+    input_tensors = {row['input_tensor'] for row in configs.values()}
+    config_ids = get_config_ids(session, table, md5_cols, input_tensors)
+    missing = [key for key in configs if key not in config_ids]
+    if missing and not args.tag_only:
+      LOGGER.info('Inserting %s configs', len(missing))
+      rows = [configs[key] for key in missing]
+      if 'md5' in table.__table__.columns.keys():
+        for key, row in zip(missing, rows):
+          row['md5'] = key
+      execute_chunks(session,
+                     mysql_insert(table.__table__).prefix_with('IGNORE'), rows)
+      new_ids = get_config_ids(session, table, md5_cols, input_tensors)
+      counts['cnt_configs'] = len(set(new_ids) - set(config_ids))
+      config_ids = new_ids
+    elif missing:
+      LOGGER.warning('Skipped %s configs missing from %s', len(missing),
+                     table.__tablename__)
+
+    tag_ids = sorted({config_ids[key] for key in configs if key in config_ids})
+    if args.tag or args.mark_recurrent:
+      stmt = mysql_insert(dbt.config_tags_table.__table__)
+      if args.mark_recurrent:
+        stmt = stmt.on_duplicate_key_update(recurrent=1)
+      else:
+        stmt = stmt.prefix_with('IGNORE')
+      execute_chunks(
+          session, stmt,
+          [create_query(args.tag, args.mark_recurrent, cid) for cid in tag_ids])
+      counts['cnt_tagged_configs'].update(tag_ids)
+
+  return counts
+
+
 def main():
   """Main function"""
   args = parse_args()
@@ -229,7 +429,10 @@ def main():
 
   dbt = DBTables(session_id=None, config_type=args.config_type)
 
-  counts = import_cfgs(args, dbt)
+  if args.bulk:
+    counts = import_cfgs_bulk(args, dbt)
+  else:
+    counts = import_cfgs(args, dbt)
 
   LOGGER.info('New configs added: %u', counts['cnt_configs'])
   if args.tag or args.tag_only:
@@ -28,7 +28,10 @@
 Script for adding jobs to the MySQL database
 """
 
-from sqlalchemy.exc import IntegrityError  #pylint: disable=wrong-import-order
+import functools
+from time import time
+from sqlalchemy import func as sqlfunc, literal
+from sqlalchemy.dialects.mysql import insert as mysql_insert
 from sqlalchemy.sql.expression import true
 
 from tuna.metadata import ALG_SLV_MAP, get_solver_ids, TENSOR_PRECISION
@@ -39,9 +42,13 @@ from tuna.miopen_tables import Solver
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.config_type import ConfigType
 from tuna.tables import DBTables
+from tuna.utils.db_utility import session_retry
 
 LOGGER = setup_logger('load_jobs')
 
+#solver_applicability rows per INSERT ... SELECT
+JOB_CHUNK = 50000
+
 
 def parse_args():
   """ Argument input for the module """
@@ -192,54 +199,79 @@ def compose_query(args, session, dbt, cfg_query):
   if args.only_dynamic:
     query = query.filter(Solver.is_dynamic == true())
 
-  cfg_ids = [config.id for config in cfg_query.all()]
+  cfg_ids = cfg_query.with_entities(dbt.config_table.id).subquery()
   query = query.filter(dbt.solver_app.config.in_(cfg_ids))
 
   return query
 
 
+def get_job_select(args, dbt, query):
+  """ job table columns and the select producing one job row per applicable
+  solver """
+  names = ['config', 'state', 'valid', 'reason', 'solver', 'session']
+  cols = [
+      dbt.solver_app.config,
+      literal('new'),
+      literal(1),
+      literal(args.label), Solver.solver,
+      literal(args.session_id)
+  ]
+  if args.fin_steps:
+    names.append('fin_step')
+    cols.append(literal(','.join(sorted(args.fin_steps))))
+
+  return names, query.with_entities(*cols)
+
+
+def insert_job_chunk(session, dbt, names, query):
+  """ insert the jobs of one chunk with a single INSERT IGNORE ... SELECT,
+  returns the candidate and inserted row counts """
+  num_rows = query.count()
+  stmt = mysql_insert(dbt.job_table.__table__).from_select(
+      names, query.statement).prefix_with('IGNORE')
+  res = session.execute(stmt)
+  session.commit()
+
+  return num_rows, res.rowcount
+
+
 def add_jobs(args, dbt):
   """ Add jobs based on solver or defer to all jobs function if no solver
-      query specified"""
-  counts = 0
+      query specified, existing jobs are skipped"""
+  counts = {'rows': 0, 'inserted': 0}
+  start = time()
   with DbSession() as session:
+
+    def actuator(func, chunk_query):
+      return func(session, dbt, names, chunk_query)
+
     cfg_query = config_query(args, session, dbt)
     query = compose_query(args, session, dbt, cfg_query)
-    res = query.all()
-    if not res:
+    names, query = get_job_select(args, dbt, query)
+
+    min_id, max_id = query.with_entities(sqlfunc.min(dbt.solver_app.id),
+                                         sqlfunc.max(dbt.solver_app.id)).one()
+    if min_id is None:
       LOGGER.error('No applicable solvers found for args %s', args.__dict__)
-    do_commit = False
-    while True:
-      for solv_app, slv in res:
-        try:
-          job = dbt.job_table()
-          job.config = solv_app.config
-          job.state = 'new'
-          job.valid = 1
-          job.reason = args.label
-          job.solver = slv.solver
-          job.fin_step = args.fin_steps
-          job.session = args.session_id
-          session.add(job)
-          if do_commit:
-            session.commit()
-          counts += 1
-        except IntegrityError as err:
-          session.rollback()
-          LOGGER.warning('Integrity Error: %s', err)
-      if not do_commit:
-        try:
-          session.commit()
-        except IntegrityError as err:
-          session.rollback()
-          counts = 0
-          do_commit = True
-          LOGGER.warning(
-              'Quick update failed, rolling back to add one by one : %s', err)
-          continue
-      break
-
-  return counts
+      return 0
+
+    for low in range(min_id - 1, max_id, JOB_CHUNK):
+      chunk_query = query.filter(dbt.solver_app.id > low,
+                                 dbt.solver_app.id <= low + JOB_CHUNK)
+      res = session_retry(session, insert_job_chunk,
+                          functools.partial(actuator, chunk_query=chunk_query),
+                          LOGGER)
+      if res is False:
+        LOGGER.error('Failed to add jobs for solver_applicability id > %s', low)
+        break
+      counts['rows'] += res[0]
+      counts['inserted'] += res[1]
+
+  LOGGER.info('Jobs inserted: %s, skipped (already present): %s, %.1fs',
+              counts['inserted'], counts['rows'] - counts['inserted'],
+              time() - start)
+
+  return counts['inserted']
 
 
 def main():
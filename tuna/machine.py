@@ -29,7 +29,6 @@
 import os
 import socket
 from time import sleep
-from io import BytesIO
 import tempfile
 from subprocess import Popen, PIPE
 from sqlalchemy import Text, Column, orm
@@ -41,14 +40,15 @@ from tuna.connection import Connection
 from tuna.dbBase.base_class import BASE
 from tuna.abort import chk_abort_file
 from tuna.utils.utility import check_qts
-from tuna.metadata import DOCKER_CMD, LOG_TIMEOUT
+from tuna.metadata import DOCKER_CMD, DOCKER_STDIN_CMD, LOG_TIMEOUT
 
 ROCMINFO = '/opt/rocm/bin/rocminfo'
 ROCMSMI = '/opt/rocm/bin/rocm-smi'
 CLINFO = '/opt/rocm/opencl/bin/clinfo'
+BOOT_ID = '/proc/sys/kernel/random/boot_id'
 
 
-class Machine(BASE):  #pylint: disable=too-many-instance-attributes
+class Machine(BASE):  #pylint: disable=too-many-instance-attributes, too-many-public-methods
   """class for maintaining machine characteristics and interactions """
   __tablename__ = "machine"
   hostname = Column(Text, nullable=False)
@@ -86,6 +86,7 @@ class Machine(BASE):  #pylint: disable=too-many-instance-attributes
     self.cnx_list = {}
     self.log_list = {}
     self.num_cpus = 0
+    self.inventory = None
     if self.local_machine:  # pylint: disable=no-member ; false alarm
       self.logger = setup_logger(f'Machine_{self.hostname}')
       self.connect()
@@ -144,6 +145,14 @@ class Machine(BASE):  #pylint: disable=too-many-instance-attributes
       return self.cnx_list[pid]
 
     logger.info('No connection for process %u, creating now', pid)
+    connection = self.new_connection(abort)
+    self.cnx_list[pid] = connection
+
+    return connection
+
+  def new_connection(self, abort=None):
+    """create a connection to this machine that is not shared"""
+    logger = self.get_logger()
     # JD: Create a local connection wrapping local process shell
     keys = {
         'id': self.id,
@@ -156,13 +165,12 @@ class Machine(BASE):  #pylint: disable=too-many-instance-attributes
     }
     keys['logger'] = logger
     keys['chk_abort_file'] = abort
-    connection = Connection(**keys)
-    self.cnx_list[pid] = connection
-
-    return connection
+    return Connection(**keys)
 
   def get_num_cpus(self):
     """return number of available cpus"""
+    if self.inventory is not None:
+      return self.num_cpus
     _, stdout, _ = self.connect().exec_command('nproc')
     self.num_cpus = int(stdout.readline())
 
@@ -283,9 +291,41 @@ class Machine(BASE):  #pylint: disable=too-many-instance-attributes
 
     return self.cpus, self.gpus
 
-  def write_file(self, contents, filename=None, is_temp=False):
+  def get_boot_id(self):
+    """return the boot id of the machine, None if it cannot be read"""
+    _, stdout, _ = self.connect().exec_command(f'cat {BOOT_ID}')
+    if stdout is None:
+      return None
+    boot_id = stdout.readline().strip()
+    return boot_id if boot_id else None
+
+  def get_inventory(self):
+    """return the probed cpu and gpu details as a serializable dict"""
+    return {
+        'num_cpus':
+            self.num_cpus,
+        'cpus': [cpu['num_cu'] for cpu in self.cpus],
+        'gpus': [{
+            'arch': gpu['arch'],
+            'num_cu': gpu['num_cu']
+        } for gpu in self.gpus]
+    }
+
+  def set_inventory(self, inventory):
+    """populate cpu and gpu details from an inventory entry"""
+    self.inventory = inventory
+    self.num_cpus = inventory['num_cpus']
+    self.cpus = [{'num_cu': num_cu} for num_cu in inventory['cpus']]
+    self.gpus = [dict(gpu) for gpu in inventory['gpus']]
+    if self.avail_gpus is None:
+      self.num_gpus = len(self.gpus)
+    else:
+      # only the gpus listed in the db are used, as set in __init__
+      self.num_gpus = len(self.avail_gpus)
+
+  def write_file(self, contents, filename=None, is_temp=False, cnx=None):
     """
-    Write a file to this machine containing contents
+    Write a file to this machine containing contents, on cnx if given
     """
     if is_temp:
       assert filename is None
@@ -297,42 +337,46 @@ class Machine(BASE):  #pylint: disable=too-many-instance-attributes
         fout.write(contents)
         fout.flush()
     else:
-      cnx = self.connect()
-      ftp = cnx.ssh.open_sftp()
-      with ftp.open(filename, 'wb') as fout:
-        fout.write(contents)
-        fout.flush()
+      (cnx or self.connect()).write_file(contents, filename)
     return filename
 
-  def read_file(self, filename, byteread=False):
+  def read_file(self, filename, byteread=False, cnx=None):
     """
-    Read a file from this machine and return the contents
+    Read a file from this machine and return the contents, on cnx if given
     """
     if self.local_machine:  # pylint: disable=no-member ; false alarm
       # pylint: disable-next=unspecified-encoding
       with open(filename, 'rb' if byteread else 'r') as rfile:
         return rfile.read()
     else:
-      cnx = self.connect()
-      ftp = cnx.ssh.open_sftp()
-      content_io = BytesIO()
-      ftp.getfo(filename, content_io)
-      ret = content_io.getvalue()
+      ret = (cnx or self.connect()).read_file(filename)
       if not byteread:
         ret = ret.decode()
       return ret
 
-  def make_temp_file(self):
+  def get_xfer_stats(self, cnx=None):
+    """file transfer counters of cnx, or of the connection of the current
+    process"""
+    if self.local_machine:  # pylint: disable=no-member ; false alarm
+      return None
+    return (cnx or self.connect()).get_xfer_stats()
+
+  def make_temp_file(self, cnx=None):
     """
     Make an empty temp file on this machine
     """
-    return self.write_file(b'', is_temp=True)
+    return self.write_file(b'', is_temp=True, cnx=cnx)
 
-  def exec_command(self, command, docker_name=None, timeout=LOG_TIMEOUT):
+  def exec_command(self,
+                   command,
+                   docker_name=None,
+                   timeout=LOG_TIMEOUT,
+                   cnx=None):
     """
     Execute a command on this machine
     - through docker if on a remote machine
     - no docker on local machine
+    - on cnx if given, else on the connection of the current process
     """
     logger = self.get_logger()
     if isinstance(command, list):
@@ -341,13 +385,38 @@ class Machine(BASE):  #pylint: disable=too-many-instance-attributes
       assert docker_name
       command = DOCKER_CMD.format(docker_name, command)
     logger.info('Running command: %s', command)
-    cnx = self.connect()
+    if cnx is None:
+      cnx = self.connect()
     ret_code, out, err = cnx.exec_command(command, timeout=timeout)
     if err is not None and hasattr(err, 'channel'):
       err.channel.settimeout(LOG_TIMEOUT)
 
     return ret_code, out, err
 
+  def exec_stream(self,
+                  command,
+                  stdin_data,
+                  docker_name=None,
+                  timeout=LOG_TIMEOUT,
+                  cnx=None):
+    """
+    Execute a command on this machine with stdin_data streamed to its stdin
+    - through docker if on a remote machine
+    - no docker on local machine
+    - on cnx if given, else on the connection of the current process
+    returns the exit code, stdout as bytes and stderr as text
+    """
+    logger = self.get_logger()
+    if isinstance(command, list):
+      command = ' '.join(command)
+    if not self.local_machine:  # pylint: disable=no-member ; false alarm
+      assert docker_name
+      command = DOCKER_STDIN_CMD.format(docker_name, command)
+    logger.info('Running command: %s', command)
+    if cnx is None:
+      cnx = self.connect()
+    return cnx.exec_stream(command, stdin_data, timeout=timeout)
+
   def get_gpu_clock(self, gpu_num=0):
     """query gpu clock levels with rocm-smi"""
 
@@ -409,10 +478,11 @@ class Machine(BASE):  #pylint: disable=too-many-instance-attributes
       return True
     return False
 
-  def chk_gpu_status(self, gpu_id):
+  def chk_gpu_status(self, gpu_id, cnx=None):
     """check gpu status, can clinfo find the device"""
     logger = self.get_logger()
-    cnx = self.connect()
+    if cnx is None:
+      cnx = self.connect()
 
     if gpu_id not in self.avail_gpus:
       logger.info('GPU index %u out of bounds', gpu_id)
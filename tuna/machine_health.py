@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Module with the shared health monitor of a machine"""
+
+from multiprocessing import Value, Array
+from threading import Thread, Event
+from time import time
+
+from tuna.metadata import LOG_TIMEOUT, ROCM_V_CMD, MIOPEN_V_CMD
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('machine_health')
+
+# interval at which the monitor samples the machine
+HEALTH_INTERVAL = 60.0  # in seconds
+# samples older than this are not used, workers check the machine themselves
+HEALTH_TTL = 5 * 60.0  # in seconds
+VERSION_LEN = 128
+
+HEALTH_MONITORS = []
+
+
+class MachineHealth():
+  """Disk usage and ROCm/MIOpen versions of a machine, sampled by a thread of
+  the go_fish process and shared with the worker processes of the machine"""
+
+  # pylint: disable=too-many-instance-attributes
+
+  def __init__(self,
+               machine,
+               docker_name,
+               interval=HEALTH_INTERVAL,
+               ttl=HEALTH_TTL):
+    self.machine = machine
+    self.docker_name = docker_name
+    self.interval = interval
+    self.ttl = ttl
+    self.used_space = Value('d', -1.0, lock=False)
+    self.rocm_v = Array('c', VERSION_LEN, lock=False)
+    self.miopen_v = Array('c', VERSION_LEN, lock=False)
+    self.sampled_at = Value('d', 0.0, lock=False)
+    self.stop_event = Event()
+    self.thread = None
+
+  def exec_docker_cmd(self, cmd):
+    """Run cmd in the docker of the machine, returns the stripped output"""
+    ret = self.machine.exec_command(cmd,
+                                    docker_name=self.docker_name,
+                                    timeout=LOG_TIMEOUT)
+    # None if the command could not be run at all
+    if not ret or not ret[1]:
+      return ''
+    out = ret[1]
+    out = out.read().strip()
+    if isinstance(out, bytes):
+      out = out.decode()
+    return out
+
+  def sample(self):
+    """Sample the machine, leaves the previous sample in place on failure"""
+    try:
+      used_space = self.machine.getusedspace()
+      rocm_v = self.exec_docker_cmd(ROCM_V_CMD)
+      miopen_v = self.exec_docker_cmd(MIOPEN_V_CMD)
+      used_space = -1.0 if used_space is None else float(used_space)
+    except Exception as err:  # pylint: disable=broad-except
+      # any failure leaves the previous sample, the thread keeps sampling
+      LOGGER.warning('Health sample of %s failed: %s', self.machine.hostname,
+                     err)
+      return False
+
+    self.used_space.value = used_space
+    self.rocm_v.value = rocm_v.encode()[:VERSION_LEN - 1]
+    self.miopen_v.value = miopen_v.encode()[:VERSION_LEN - 1]
+    self.sampled_at.value = time()
+    return True
+
+  def start(self):
+    """Take the first sample and start sampling in the background, once"""
+    if self.thread is not None:
+      return
+    self.sample()
+    self.thread = Thread(target=self.run, daemon=True)
+    self.thread.start()
+    HEALTH_MONITORS.append(self)
+
+  def run(self):
+    """Sample until stopped"""
+    while not self.stop_event.wait(self.interval):
+      self.sample()
+
+  def stop(self):
+    """Stop the sampling thread"""
+    self.stop_event.set()
+    if self.thread is not None:
+      self.thread.join()
+      self.thread = None
+
+  def invalidate(self):
+    """Drop the current sample, e.g. after the machine was reset"""
+    self.sampled_at.value = 0.0
+
+  def is_fresh(self):
+    """True if the current sample is within its ttl"""
+    return time() - self.sampled_at.value < self.ttl
+
+  def get_used_space(self):
+    """Used disk space in percent, None if the last sample failed"""
+    return None if self.used_space.value < 0 else self.used_space.value
+
+  def get_rocm_v(self):
+    """ROCm version in the docker"""
+    return self.rocm_v.value.decode()
+
+  def get_miopen_v(self):
+    """MIOpen version in the docker"""
+    return self.miopen_v.value.decode()
+
+
+def stop_health_monitors():
+  """Stop all health monitors of this process"""
+  while HEALTH_MONITORS:
+    HEALTH_MONITORS.pop().stop()
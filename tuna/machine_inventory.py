@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Module with the persistent inventory cache of the machines"""
+
+import os
+import json
+import tempfile
+from threading import Lock
+from time import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('machine_inventory')
+
+INVENTORY_FILE = os.path.join(os.path.expanduser('~'), '.cache', 'tuna',
+                              'machine_inventory.json')
+# inventory entries older than this are probed again
+INVENTORY_TTL = 24 * 60 * 60  # in seconds
+# max number of machines probed at the same time
+PROBE_WORKERS = 32
+
+
+class MachineInventory():
+  """GPU list, arch, num_cu and cpu count of the machines, cached on disk and
+  keyed by machine id and boot id so that a rebooted machine is probed again"""
+
+  def __init__(self, filename=INVENTORY_FILE, ttl=INVENTORY_TTL):
+    self.filename = filename
+    self.ttl = ttl
+    self.entries = {}
+    self.lock = Lock()
+    self.hits = 0
+    self.misses = 0
+
+  @staticmethod
+  def get_key(machine, boot_id):
+    """key of the inventory entry of a machine"""
+    return f'{machine.id}:{boot_id}'
+
+  def load(self):
+    """read the inventory file, a missing or corrupt file is an empty cache"""
+    try:
+      with open(self.filename, 'r', encoding='utf-8') as fin:
+        self.entries = json.load(fin)
+    except (OSError, ValueError) as err:
+      LOGGER.info('No machine inventory loaded from %s: %s', self.filename, err)
+      self.entries = {}
+    return self.entries
+
+  def save(self):
+    """merge the entries into the inventory file and replace it atomically"""
+    now = time()
+    current = MachineInventory(self.filename, self.ttl).load()
+    current.update(self.entries)
+    entries = {
+        key: entry
+        for key, entry in current.items()
+        if now - entry['probed_at'] < self.ttl
+    }
+    dirname = os.path.dirname(self.filename)
+    try:
+      os.makedirs(dirname, exist_ok=True)
+      fd, tmp_name = tempfile.mkstemp(dir=dirname)
+      with os.fdopen(fd, 'w', encoding='utf-8') as fout:
+        json.dump(entries, fout)
+      os.replace(tmp_name, self.filename)
+    except OSError as err:
+      LOGGER.warning('Failed to save machine inventory %s: %s', self.filename,
+                     err)
+      return False
+    return True
+
+  def lookup(self, machine, boot_id):
+    """return the cached entry of a machine, None if missing or stale"""
+    if boot_id is None:
+      return None
+    with self.lock:
+      entry = self.entries.get(self.get_key(machine, boot_id))
+    if entry is None or time() - entry['probed_at'] >= self.ttl:
+      return None
+    return entry
+
+  def probe(self, machine):
+    """load the inventory of a machine from the cache or probe it fresh"""
+    boot_id = machine.get_boot_id()
+    entry = self.lookup(machine, boot_id)
+    if entry is not None:
+      machine.set_inventory(entry)
+      with self.lock:
+        self.hits += 1
+      return entry
+
+    machine.get_properties()
+    machine.get_num_cpus()
+    entry = machine.get_inventory()
+    entry['probed_at'] = time()
+    machine.set_inventory(entry)
+    with self.lock:
+      self.misses += 1
+      if boot_id is not None:
+        self.entries[self.get_key(machine, boot_id)] = entry
+    return entry
+
+  def probe_all(self, machines, max_workers=PROBE_WORKERS):
+    """probe all machines concurrently and persist the fresh entries"""
+    if not machines:
+      return []
+    self.load()
+    start = time()
+    with ThreadPoolExecutor(
+        max_workers=min(max_workers, len(machines))) as pool:
+      entries = list(pool.map(self.probe, machines))
+    if self.misses:
+      self.save()
+    LOGGER.info(
+        'Machine inventory of %u machines in %.2fs: %u cached, %u probed',
+        len(machines),
+        time() - start, self.hits, self.misses)
+    return entries
@@ -36,6 +36,15 @@ DOCKER_CMD = "sudo docker run --device='/dev/kfd' --device='/dev/dri' -w /tmp/mi
              -v /tmp/miopenpdb:/tmp/miopenpdb --user=root --group-add video --privileged=true \
              --rm {} bash  -c \"{}\""
 
+# keeps stdin open so that input can be streamed to the command
+DOCKER_STDIN_CMD = "sudo docker run -i --device='/dev/kfd' --device='/dev/dri' -w /tmp/miopenpdb \
+             -v /tmp/miopenpdb:/tmp/miopenpdb --user=root --group-add video --privileged=true \
+             --rm {} bash  -c \"{}\""
+
+# fin input on stdin and the result json on fd 3, fin logs go to stderr
+FIN_STREAM_CMD = "/opt/rocm/bin/fin -i /dev/stdin -o /dev/fd/3 3>&1 1>&2"
+FIN_TRANSPORTS = ('file', 'stream')
+
 MIOPEN_DB_VERSION = "1.0.0"
 MIOPEN_USER_DB_PATH = "/tmp/miopenpdb/config/miopen"
 MIOPEN_CACHE_DIR = "/tmp/miopenpdb/cache"
@@ -53,6 +62,9 @@ if 'FIN_CACHE' in os.environ:
   FIN_CACHE = os.environ['FIN_CACHE']
 
 LOG_TIMEOUT = 10 * 60.0  # seconds
+ROCM_V_CMD = "cat /opt/rocm/.info/version"
+MIOPEN_V_CMD = "cat /opt/rocm/miopen/include/miopen/version.h " \
+               "| grep MIOPEN_VERSION_TWEAK | cut -d ' ' -f 3"
 MYSQL_LOCK_WAIT_TIMEOUT = 1205
 NUM_SQL_RETRIES = 10
 
@@ -234,6 +246,15 @@ CONV_CONFIG_COLS = [
     'trans_output_pad_w', 'trans_output_pad_d', 'out_layout', 'direction'
 ]
 
+#column order of the conv_config md5 trigger
+CONV_CONFIG_MD5_COLS = [
+    'batchsize', 'spatial_dim', 'pad_h', 'pad_w', 'pad_d', 'conv_stride_h',
+    'conv_stride_w', 'conv_stride_d', 'dilation_h', 'dilation_w', 'dilation_d',
+    'group_count', 'conv_mode', 'pad_mode', 'trans_output_pad_h',
+    'trans_output_pad_w', 'trans_output_pad_d', 'direction', 'input_tensor',
+    'weight_tensor', 'out_layout'
+]
+
 TENSOR_COLS = [
     'in_channels', 'out_channels', 'in_d', 'in_h', 'in_w', 'fil_d', 'fil_h',
     'fil_w'
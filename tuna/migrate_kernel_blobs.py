@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Move the base64 kernel blobs of the kernel cache tables into the content
+addressed kernel_blob table, and delete the blobs no longer referenced"""
+import argparse
+from time import time
+
+from sqlalchemy import inspect
+
+from tuna.db_engine import ENGINE
+from tuna.db_tables import connect_db
+from tuna.dbBase.sql_alchemy import DbSession
+from tuna.miopen_tables import KernelBlob
+from tuna.utils.blob_store import KERNEL_CACHE_TABLES, store_blob, collect_blobs
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('migrate_kernel_blobs')
+
+#kernel cache rows moved per transaction
+MIGRATE_CHUNK = 1000
+
+
+def parse_args():
+  """command line argument parsing"""
+  parser = argparse.ArgumentParser(
+      description='Move kernel binaries to the kernel_blob table')
+  parser.add_argument('--chunk',
+                      dest='chunk',
+                      type=int,
+                      default=MIGRATE_CHUNK,
+                      help=f'Rows moved or blobs collected per transaction'
+                      f' (default {MIGRATE_CHUNK})')
+  parser.add_argument('--gc_only',
+                      dest='gc_only',
+                      action='store_true',
+                      default=False,
+                      help='Only delete the unreferenced blobs')
+  parser.add_argument('--no_gc',
+                      dest='no_gc',
+                      action='store_true',
+                      default=False,
+                      help='Do not delete the unreferenced blobs')
+  args = parser.parse_args()
+  if args.chunk < 1:
+    parser.error('chunk must be at least 1')
+  return args
+
+
+def get_upgraded_tables():
+  """The kernel_blob table and the blob_id references are added by the alembic
+  revision 7b2e4c9d1a05. Returns the kernel cache tables of the database, None
+  if it was not upgraded"""
+  inspector = inspect(ENGINE)
+  names = inspector.get_table_names()
+  if KernelBlob.__tablename__ not in names:
+    LOGGER.error('No %s table, run: alembic upgrade head',
+                 KernelBlob.__tablename__)
+    return None
+  tables = []
+  for table in KERNEL_CACHE_TABLES:
+    name = table.__tablename__
+    if name not in names:
+      continue
+    if 'blob_id' not in [col['name'] for col in inspector.get_columns(name)]:
+      LOGGER.error('No blob_id in %s, run: alembic upgrade head', name)
+      return None
+    tables.append(table)
+  return tables
+
+
+def migrate_table(table, chunk=MIGRATE_CHUNK):
+  """Move the inline blobs of table to the store in chunks of rows ordered by
+  id, returns the number of moved rows and the bytes freed in table"""
+  last_id = 0
+  num_rows = 0
+  freed = 0
+  start = time()
+  while True:
+    with DbSession() as session:
+      rows = session.query(table.id, table.kernel_blob)\
+          .filter(table.id > last_id, table.blob_id.is_(None),
+                  table.kernel_blob.isnot(None))\
+          .order_by(table.id).limit(chunk).all()
+      if not rows:
+        break
+      for row in rows:
+        blob_id = store_blob(session, row.kernel_blob)
+        session.query(table).filter(table.id == row.id)\
+            .update({table.blob_id: blob_id, table.kernel_blob: None},
+                    synchronize_session=False)
+        freed += len(row.kernel_blob)
+      session.commit()
+    last_id = rows[-1].id
+    num_rows += len(rows)
+    LOGGER.info('%s: moved %u rows, %u bytes (%.1fs)', table.__tablename__,
+                num_rows, freed,
+                time() - start)
+  return num_rows, freed
+
+
+def main():
+  """main"""
+  args = parse_args()
+  connect_db()
+  tables = get_upgraded_tables()
+  if tables is None:
+    return
+  if not args.gc_only:
+    for table in tables:
+      num_rows, freed = migrate_table(table, args.chunk)
+      LOGGER.warning('%s: %u rows moved to kernel_blob, %u bytes of base64',
+                     table.__tablename__, num_rows, freed)
+  if not args.no_gc:
+    num_blobs, size, _ = collect_blobs(args.chunk)
+    LOGGER.warning('Deleted %u unreferenced kernel blobs, %u bytes', num_blobs,
+                   size)
+
+
+if __name__ == '__main__':
+  main()
@@ -53,15 +53,35 @@ class CacheMixin():
   cache_name = Column(String(length=45), nullable=False)
 
 
+class KernelBlob(BASE):
+  """Represents kernel_blob table, every kernel binary is stored once and
+  referenced by the kernel cache tables"""
+  __tablename__ = "kernel_blob"
+  __table_args__ = (UniqueConstraint("md5", name="uq_idx"),)
+
+  md5 = Column(String(length=32), nullable=False)
+  blob = Column(MEDIUMBLOB, nullable=False)
+  ref_count = Column(Integer, nullable=False, server_default="0")
+
+
 class KernelCacheMixin():
   """Represents Mixin for KernelCache table"""
 
   kernel_name = Column(String(length=4000), nullable=False)
   kernel_args = Column(String(length=9000), nullable=False)
-  kernel_blob = Column(MEDIUMBLOB, nullable=False)
+  # base64 text of rows not yet moved to the kernel_blob table
+  kernel_blob = Column(MEDIUMBLOB, nullable=True)
   kernel_hash = Column(String(length=128), nullable=False)
   uncompressed_size = Column(Integer, nullable=False)
 
+  @declared_attr
+  def blob_id(self):
+    """kernel_blob key"""
+    return Column(Integer,
+                  ForeignKey("kernel_blob.id"),
+                  nullable=True,
+                  index=True)
+
 
 class JobCache(BASE, CacheMixin):
   """Represents job_cache table"""
@@ -410,6 +430,41 @@ class FusionJob(BASE, JobMixin):
   config = Column(Integer, ForeignKey("fusion_config.id"), nullable=False)
 
 
+class JobEventMixin():
+  """Represents Mixin class for job state change logs, the id is the cursor"""
+
+  @declared_attr
+  def session(self):
+    """session key"""
+    return Column(Integer, ForeignKey("session.id"), nullable=False)
+
+  state = Column(Enum(JobEnum), nullable=False)
+
+
+class ConvJobEvent(BASE, JobEventMixin):
+  """Represents conv_job_event table"""
+  __tablename__ = "conv_job_event"
+
+  job_id = Column(Integer,
+                  ForeignKey("conv_job.id",
+                             onupdate="CASCADE",
+                             ondelete="CASCADE"),
+                  nullable=False)
+  event_idx = Index('conv_job_event_idx', 'session', 'state', 'id')
+
+
+class BNJobEvent(BASE, JobEventMixin):
+  """Represents bn_job_event table"""
+  __tablename__ = "bn_job_event"
+
+  job_id = Column(Integer,
+                  ForeignKey("bn_job.id",
+                             onupdate="CASCADE",
+                             ondelete="CASCADE"),
+                  nullable=False)
+  event_idx = Index('bn_job_event_idx', 'session', 'state', 'id')
+
+
 class SolverApplicabilityMixin():
   """Represents Mixin class for solver_applicability tables"""
 
@@ -527,6 +582,7 @@ def add_conv_tables(miopen_tables):
   miopen_tables.append(ConvFinJobCache())
   miopen_tables.append(ConvolutionFindDB)
   miopen_tables.append(ConvolutionGolden())
+  miopen_tables.append(ConvJobEvent())
   return miopen_tables
 
 
@@ -550,6 +606,7 @@ def add_bn_tables(miopen_tables):
   miopen_tables.append(BNFinJobCache())
   miopen_tables.append(BNFindDB())
   miopen_tables.append(BNGolden())
+  miopen_tables.append(BNJobEvent())
   return miopen_tables
 
 
@@ -560,6 +617,7 @@ def get_miopen_tables():
   miopen_tables.append(Session())
   miopen_tables.append(Machine(local_machine=True))
   miopen_tables.append(TensorTable())
+  miopen_tables.append(KernelBlob())
 
   miopen_tables = add_conv_tables(miopen_tables)
   miopen_tables = add_fusion_tables(miopen_tables)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Node local on-disk cache of the kernel blobs sent to fin. Streamed fin
+inputs reference cached blobs by md5 and an awk filter on the node splices
+them back in before fin reads the input"""
+
+import os
+import re
+from threading import Lock
+from time import time
+
+from tuna.metadata import FIN_CACHE
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('node_blob_cache')
+
+BLOB_CACHE_DIR = f'{FIN_CACHE}/kernel_blobs'
+BLOB_CACHE_SIZE = 4096  # in MB
+# blobs used within this time are never evicted
+BLOB_GRACE = 30 * 60  # in seconds
+# a blob this process has not used for this long may have been evicted
+BLOB_TRUST = BLOB_GRACE / 2
+# blobs are stored in lines of this many base64 characters
+BLOB_LINE_LEN = 65536
+
+BLOB_REF = '@blob:{}@'
+BLOB_REF_RE = re.compile(rb'@blob:([0-9a-fA-F]+)@')
+BLOB_MD5_RE = re.compile(r'[0-9a-fA-F]+')
+# printed by the expand filter when a referenced blob is not in the cache
+BLOB_MISSING = 'missing kernel blob'
+
+EXPAND_AWK = r'''{
+  rest = $0
+  while (match(rest, /@blob:[0-9a-fA-F]+@/)) {
+    file = dir "/" substr(rest, RSTART + 6, RLENGTH - 7)
+    printf "%s", substr(rest, 1, RSTART - 1)
+    found = 0
+    while ((getline line < file) > 0) {
+      printf "%s", line
+      found = 1
+    }
+    close(file)
+    if (!found) {
+      print "missing kernel blob " file > "/dev/stderr"
+      exit 2
+    }
+    rest = substr(rest, RSTART + RLENGTH)
+  }
+  print rest
+}
+'''
+
+
+class FinInput(bytes):
+  """Serialized fin input along with the cached blobs it references"""
+
+  def __new__(cls, data, blobs=None):
+    fin_input = super().__new__(cls, data)
+    fin_input.blobs = {} if blobs is None else blobs
+    return fin_input
+
+
+class NodeBlobCache():
+  """Kernel blobs cached on a machine, keyed by md5_sum. Blobs are evicted
+  least recently used first once the cache exceeds its size"""
+
+  def __init__(self, machine, size=BLOB_CACHE_SIZE, cache_dir=BLOB_CACHE_DIR):
+    self.machine = machine
+    self.size = size * 1024 * 1024
+    self.cache_dir = cache_dir
+    # md5 -> time this process last used the blob on the machine, the fin
+    # thread of an evaluator forgets blobs while the next input is prepared
+    self.known = {}
+    self.lock = Lock()
+    self.ready = False
+    self.stats = {'hits': 0, 'misses': 0, 'uploaded': 0, 'evictions': 0}
+
+  def setup(self):
+    """Create the cache directory and the expand filter, load the blobs
+    recently used on the machine"""
+    cnx = self.machine.connect()
+    _, out, _ = cnx.exec_command(
+        f'mkdir -p {self.cache_dir} && date +%s && find {self.cache_dir}'
+        f" -maxdepth 1 -type f -name '[0-9a-fA-F]*' -printf '%f %T@\\n'")
+    lines = out.readlines() if out else []
+    if lines:
+      now = time()
+      remote_now = float(lines[0])
+      for line in lines[1:]:
+        name, mtime = line.split()
+        if BLOB_MD5_RE.fullmatch(name):
+          self.known[name] = now - (remote_now - float(mtime))
+    self.upload(EXPAND_AWK.encode(), 'expand.awk')
+    self.ready = True
+    LOGGER.info('Blob cache on %s: %u blobs', self.machine.hostname,
+                len(self.known))
+
+  def upload(self, data, name):
+    """Write a file to the cache directory, renamed into place so that readers
+    never see a partial file"""
+    cnx = self.machine.connect()
+    tmp_name = f'{self.cache_dir}/.{name}.{os.getpid()}'
+    cnx.write_file(data, tmp_name)
+    cnx.rename_file(tmp_name, f'{self.cache_dir}/{name}')
+
+  def is_cached(self, md5):
+    """Is the blob on the machine and safe from eviction"""
+    with self.lock:
+      return md5 in self.known and time() - self.known[md5] < BLOB_TRUST
+
+  def prepare(self, fjob, blobs):
+    """Replace the blobs of a fin job by references to the cache, uploading
+    the missing ones. blobs collects md5 -> blob, returns hits and misses"""
+    if not self.ready:
+      self.setup()
+    hits = misses = 0
+    for key, results in fjob.items():
+      if not key.endswith('_compile_result') or not isinstance(results, list):
+        continue
+      for result in results:
+        for kern_obj in result.get('kernel_objects', []):
+          md5 = kern_obj.get('md5_sum')
+          if not md5 or not BLOB_MD5_RE.fullmatch(md5):
+            continue
+          if md5 not in blobs:
+            if self.is_cached(md5):
+              hits += 1
+            else:
+              lines = [
+                  kern_obj['blob'][idx:idx + BLOB_LINE_LEN]
+                  for idx in range(0, len(kern_obj['blob']), BLOB_LINE_LEN)
+              ]
+              self.upload('\n'.join(lines).encode(), md5)
+              self.stats['uploaded'] += len(kern_obj['blob'])
+              misses += 1
+            with self.lock:
+              self.known[md5] = time()
+            blobs[md5] = kern_obj['blob']
+          else:
+            hits += 1
+          kern_obj['blob'] = BLOB_REF.format(md5)
+    self.stats['hits'] += hits
+    self.stats['misses'] += misses
+    if misses:
+      self.evict()
+    return hits, misses
+
+  def evict(self):
+    """Remove the least recently used blobs beyond the cache size, sparing the
+    blobs used within the grace period"""
+    cnx = self.machine.connect()
+    _, out, _ = cnx.exec_command(
+        f"find {self.cache_dir} -maxdepth 1 -type f -name '[0-9a-fA-F]*'"
+        f" -printf '%T@ %s %p\\n' | sort -rn | awk -v cap={self.size}"
+        f' -v old=$(($(date +%s) - {BLOB_GRACE}))'
+        " '{ total += $2; if (total > cap && $1 < old) print $3 }'"
+        ' | while read -r blob; do rm -f $blob && basename $blob; done')
+    evicted = [line.strip() for line in out.readlines()] if out else []
+    with self.lock:
+      for md5 in evicted:
+        self.known.pop(md5, None)
+    self.stats['evictions'] += len(evicted)
+
+  def forget(self, blobs):
+    """Blobs that may be missing on the machine, they are uploaded again"""
+    with self.lock:
+      for md5 in blobs:
+        self.known.pop(md5, None)
+
+  def get_touch_cmd(self, blobs):
+    """Mark the blobs of a fin input as used so they are not evicted"""
+    return f'touch -c {" ".join(f"{self.cache_dir}/{md5}" for md5 in blobs)}'
+
+  def get_expand_cmd(self):
+    """Filter splicing the cached blobs into the fin input"""
+    return f'awk -v dir={self.cache_dir} -f {self.cache_dir}/expand.awk'
+
+
+def expand_blobs(fin_input):
+  """Splice the blobs back into a fin input holding cache references"""
+  return BLOB_REF_RE.sub(
+      lambda match: fin_input.blobs[match.group(1).decode()].encode(),
+      fin_input)
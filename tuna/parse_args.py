@@ -39,6 +39,7 @@ class TunaArgs(Enum):
   VERSION = 3
   CONFIG_TYPE = 4
   SESSION_ID = 5
+  DRY_RUN = 6
 
 
 def setup_arg_parser(desc: str, arg_list: List[TunaArgs]):
@@ -90,5 +91,12 @@ def setup_arg_parser(desc: str, arg_list: List[TunaArgs]):
         help=
         'Session ID to be used as tuning tracker. Allows to correlate DB results to tuning sessions'
     )
+  if TunaArgs.DRY_RUN in arg_list:
+    parser.add_argument(
+        '--dry_run',
+        dest='dry_run',
+        action='store_true',
+        default=False,
+        help='Only report what would be done, nothing is changed or run')
 
   return parser
@@ -32,6 +32,7 @@ from tuna.miopen_tables import BNJob, BNConfig, BNJobCache, BNFinJobCache, BNCon
 from tuna.miopen_tables import ConvSolverApplicability, BNSolverApplicability
 from tuna.miopen_tables import ConvFinJobCache, BNKernelCache, ConvolutionKernelCache
 from tuna.miopen_tables import TensorTable, ConvolutionGolden
+from tuna.miopen_tables import ConvJobEvent, BNJobEvent
 from tuna.config_type import ConfigType
 from tuna.dbBase.sql_alchemy import DbSession
 from tuna.session import Session
@@ -60,6 +61,7 @@ class DBTables():
     self.kernel_cache = None
     self.tensor_table = TensorTable
     self.golden_table = None
+    self.job_event_table = None
 
     self.config_type = None
     self.session_id = None
@@ -88,6 +90,7 @@ class DBTables():
       self.cache_table = BNJobCache
       self.fin_cache_table = BNFinJobCache
       self.kernel_cache = BNKernelCache
+      self.job_event_table = BNJobEvent
     else:
       self.job_table = ConvolutionJob
       self.config_table = ConvolutionConfig
@@ -98,3 +101,4 @@ class DBTables():
       self.fin_cache_table = ConvFinJobCache
       self.kernel_cache = ConvolutionKernelCache
       self.golden_table = ConvolutionGolden
+      self.job_event_table = ConvJobEvent
@@ -26,6 +26,10 @@
 ###############################################################################
 """! @brief Script to populate the golden table based on session_id"""
 import functools
+from time import time
+from sqlalchemy import and_, or_, case, literal
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.orm import aliased
 from sqlalchemy.sql.expression import func as sqlfunc
 
 from tuna.parse_args import TunaArgs, setup_arg_parser
@@ -38,11 +42,19 @@ from tuna.session import Session
 # Setup logging
 LOGGER = setup_logger('update_golden')
 
+#source rows per INSERT ... SELECT statement
+MERGE_CHUNK = 50000
+#golden columns copied from the source entry, if both tables have them
+GOLD_DATA_COLS = [
+    'session', 'fdb_key', 'params', 'kernel_time', 'workspace_sz', 'alg_lib',
+    'opencl', 'kernel_group'
+]
+
 
 def parse_args():
   """! Function to parse arguments"""
   parser = setup_arg_parser('Populate golden table based on session_id',
-                            [TunaArgs.CONFIG_TYPE])
+                            [TunaArgs.CONFIG_TYPE, TunaArgs.DRY_RUN])
   parser.add_argument(
       '--session_id',
       dest='session_id',
@@ -255,6 +267,155 @@ def process_merge_golden(dbt, golden_v, entries, s_copy=False):
   return num_packs
 
 
+def get_gold_data_cols(dbt, src_table):
+  """ data columns of the golden table which are copied from src_table """
+  gold_cols = dbt.golden_table.__table__.columns.keys()
+  return [
+      col for col in GOLD_DATA_COLS
+      if col in gold_cols and col in src_table.__table__.columns.keys()
+  ]
+
+
+def get_src_filter(dbt, src_table, base_golden_v=None):
+  """ filter for the rows to promote, fdb entries of the session or a base
+  golden version """
+  if base_golden_v is not None:
+    return [src_table.golden_miopen_v == base_golden_v, src_table.valid == 1]
+  return [src_table.session == dbt.session_id, src_table.valid == 1]
+
+
+def get_gold_select(session, dbt, golden_v, src_table, src_filter):
+  """ query the source rows as golden table rows, arch and num_cu are joined
+  from the session table, returns (golden column names, query) """
+  data_cols = get_gold_data_cols(dbt, src_table)
+  names = ['golden_miopen_v', 'config', 'solver', 'arch', 'num_cu', 'valid'
+          ] + data_cols
+  columns = [
+      literal(golden_v), src_table.config, src_table.solver, Session.arch,
+      Session.num_cu,
+      literal(1)
+  ] + [getattr(src_table, col) for col in data_cols]
+
+  query = session.query(*columns)\
+      .join(Session, src_table.session == Session.id)\
+      .filter(*src_filter)
+
+  return names, query
+
+
+def get_gold_diff(session, dbt, golden_v, src_table, src_filter):
+  """ count source rows, and of those the ones which would add a new golden
+  entry or change an existing one """
+  #aliased, the source may be the golden table itself
+  gold = aliased(dbt.golden_table)
+  data_cols = get_gold_data_cols(dbt, src_table)
+  changed = or_(
+      gold.valid != 1, *[
+          getattr(gold, col).is_distinct_from(getattr(src_table, col))
+          for col in data_cols
+      ])
+  query = session.query(sqlfunc.count(src_table.id),
+                        sqlfunc.sum(case([(gold.id.is_(None), 1)], else_=0)),
+                        sqlfunc.sum(case([(and_(gold.id.isnot(None), changed), 1)],
+                                         else_=0)))\
+      .select_from(src_table)\
+      .join(Session, src_table.session == Session.id)\
+      .outerjoin(gold, and_(gold.golden_miopen_v == golden_v,
+                            gold.config == src_table.config,
+                            gold.solver == src_table.solver,
+                            gold.arch == Session.arch,
+                            gold.num_cu == Session.num_cu))\
+      .filter(*src_filter)
+
+  total, added, updated = query.one()
+  return {
+      'rows': total or 0,
+      'added': int(added or 0),
+      'updated': int(updated or 0)
+  }
+
+
+def merge_golden_chunk(session,
+                       dbt,
+                       golden_v,
+                       src_table,
+                       src_filter,
+                       *,
+                       simple_copy=False):
+  """ copy one chunk of source rows with a single INSERT ... SELECT, existing
+  golden entries are updated in place unless simple_copy is set """
+  names, query = get_gold_select(session, dbt, golden_v, src_table, src_filter)
+  num_rows = query.count()
+  stmt = mysql_insert(dbt.golden_table.__table__).from_select(
+      names, query.statement)
+  if not simple_copy:
+    stmt = stmt.on_duplicate_key_update(
+        {col: stmt.inserted[col] for col in names[5:]})
+  session.execute(stmt)
+  session.commit()
+
+  return num_rows
+
+
+def merge_golden_set(dbt, golden_v, base_golden_v=None, dry_run=False):  #pylint: disable=too-many-locals
+  """ promote the session's find db, or a base golden version, into golden_v
+  with set based SQL, working through the source table in primary key chunks
+  """
+  simple_copy = base_golden_v is not None
+  src_table = dbt.golden_table if simple_copy else dbt.find_db_table
+  src_filter = get_src_filter(dbt, src_table, base_golden_v)
+  totals = {'rows': 0, 'added': 0, 'updated': 0}
+
+  start = time()
+  with DbSession() as session:
+
+    def actuator(func, chunk_filter):
+      return func(session,
+                  dbt,
+                  golden_v,
+                  src_table,
+                  chunk_filter,
+                  simple_copy=simple_copy)
+
+    min_id, max_id = session.query(sqlfunc.min(src_table.id),
+                                   sqlfunc.max(src_table.id))\
+        .filter(*src_filter).one()
+    if min_id is None:
+      LOGGER.warning('No entries to merge into golden version %s', golden_v)
+      return totals
+
+    for low in range(min_id - 1, max_id, MERGE_CHUNK):
+      high = min(low + MERGE_CHUNK, max_id)
+      chunk_filter = src_filter + [src_table.id > low, src_table.id <= high]
+      if dry_run:
+        for key, val in get_gold_diff(session, dbt, golden_v, src_table,
+                                      chunk_filter).items():
+          totals[key] += val
+      else:
+        num_rows = session_retry(
+            session, merge_golden_chunk,
+            functools.partial(actuator, chunk_filter=chunk_filter), LOGGER)
+        if num_rows is False:
+          LOGGER.error("Failed to merge golden chunk at id %s", low)
+          return False
+        totals['rows'] += num_rows
+
+      LOGGER.info("Merged: %s%%, %s rows, %.0f rows/s",
+                  int((high - min_id + 1) * 100 / (max_id - min_id + 1)),
+                  totals['rows'], totals['rows'] / max(time() - start, 1e-6))
+
+  elapsed = max(time() - start, 1e-6)
+  if dry_run:
+    LOGGER.warning(
+        "Dry run golden_v %s: %s source rows, %s new entries, %s changed entries",
+        golden_v, totals['rows'], totals['added'], totals['updated'])
+  else:
+    LOGGER.warning("Merged %s rows into golden_v %s in %.1fs (%.0f rows/s)",
+                   totals['rows'], golden_v, elapsed, totals['rows'] / elapsed)
+
+  return totals
+
+
 def main():
   """! Main function"""
   args = parse_args()
@@ -270,7 +431,7 @@ def main():
     )
 
   if args.base_golden_v is not None:
-    base_gold_db = get_golden_query(dbt, args.base_golden_v).all()
+    base_gold_db = get_golden_query(dbt, args.base_golden_v).first()
     if not base_gold_db:
       ver = latest_golden_v(dbt)
       if ver == -1:
@@ -279,10 +440,9 @@ def main():
         raise ValueError(
             f'Base golden version {args.base_golden_v} does not exist.')
     else:
-      process_merge_golden(dbt, args.golden_v, base_gold_db, s_copy=True)
+      merge_golden_set(dbt, args.golden_v, args.base_golden_v, args.dry_run)
 
-  query = get_fdb_query(dbt)
-  total = process_merge_golden(dbt, args.golden_v, query.all())
+  total = merge_golden_set(dbt, args.golden_v, dry_run=args.dry_run)
 
   LOGGER.info("Merged: %s", total)
 
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Content addressed store of the kernel binaries, the kernel cache tables
+reference the kernel_blob rows by id and each binary is stored once"""
+
+import base64
+import hashlib
+from time import time
+
+from sqlalchemy import exists, func as sqla_func, or_
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.exc import IntegrityError
+
+from tuna.dbBase.sql_alchemy import DbSession
+
+from tuna.miopen_tables import KernelBlob, ConvFinJobCache, ConvolutionKernelCache
+from tuna.miopen_tables import BNFinJobCache, BNKernelCache
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('blob_store')
+
+# tables referencing kernel_blob
+KERNEL_CACHE_TABLES = [
+    ConvFinJobCache, ConvolutionKernelCache, BNFinJobCache, BNKernelCache
+]
+
+
+def get_blob_md5(blob):
+  """Content address of a kernel binary"""
+  return hashlib.md5(blob).hexdigest()
+
+
+def store_blob(session, blob_text):
+  """Store the base64 blob_text from fin as binary if it is not stored yet,
+  returns the kernel_blob id. References are counted by collect_blobs"""
+  blob = base64.b64decode(blob_text)
+  md5 = get_blob_md5(blob)
+  blob_id = session.query(KernelBlob.id).filter(KernelBlob.md5 == md5).scalar()
+  if blob_id is not None:
+    # a shared lock on the row keeps collect_blobs from deleting it before the
+    # reference is committed, workers sharing the blob do not wait on it
+    blob_id = session.query(KernelBlob.id).filter(KernelBlob.id == blob_id)\
+        .with_for_update(read=True).scalar()
+  if blob_id is not None:
+    return blob_id
+  # pylint: disable-next=no-member
+  query = mysql_insert(KernelBlob.__table__).values(md5=md5, blob=blob)
+  # stored by another worker since, LAST_INSERT_ID(id) hands back its id
+  query = query.on_duplicate_key_update(
+      id=sqla_func.LAST_INSERT_ID(KernelBlob.id))
+  return session.execute(query).lastrowid
+
+
+def query_kernels(session, table, *columns):
+  """Query the kernel cache rows of table along with their stored binary,
+  rows not migrated to the store only have the base64 kernel_blob"""
+  columns = columns or (table,)
+  return session.query(*columns, KernelBlob.blob.label('stored_blob'))\
+      .outerjoin(KernelBlob, KernelBlob.id == table.blob_id)
+
+
+def get_blob_text(kernel, stored_blob):
+  """base64 text of a kernel for the fin input"""
+  if stored_blob is not None:
+    return base64.b64encode(stored_blob).decode('utf-8')
+  return kernel.kernel_blob.decode('utf-8')
+
+
+def get_blob_binary(kernel, stored_blob):
+  """binary of a kernel for the kernel db"""
+  if stored_blob is not None:
+    return stored_blob
+  return base64.b64decode(kernel.kernel_blob)
+
+
+def count_refs(session, id_range=()):
+  """Recount the references of the blobs in id_range, workers do not count
+  them so that storing a kernel does not update the shared blob rows"""
+  ref_count = sum(
+      session.query(sqla_func.count(table.id)).filter(
+          table.blob_id == KernelBlob.id).correlate(KernelBlob).as_scalar()
+      for table in KERNEL_CACHE_TABLES)
+  return session.query(KernelBlob).filter(*id_range).update(
+      {KernelBlob.ref_count: ref_count}, synchronize_session=False)
+
+
+def collect_chunk(session, id_range, dry_run):
+  """Delete the unreferenced blobs in id_range, returns their ids and sizes"""
+  if not dry_run:
+    count_refs(session, id_range)
+    session.commit()
+  referenced = or_(*[
+      exists().where(table.blob_id == KernelBlob.id)  # pylint: disable=comparison-with-callable
+      for table in KERNEL_CACHE_TABLES
+  ])
+  rows = session.query(KernelBlob.id, sqla_func.length(KernelBlob.blob))\
+      .filter(*id_range, KernelBlob.ref_count <= 0, ~referenced).all()
+  if not rows or dry_run:
+    return rows
+  try:
+    session.query(KernelBlob).filter(KernelBlob.id.in_(
+        [row[0] for row in rows])).delete(synchronize_session=False)
+    session.commit()
+  except IntegrityError as err:
+    # a kernel referencing one of the blobs was stored since, keep them all
+    session.rollback()
+    LOGGER.warning('Kernel blobs %u to %u referenced again, kept: %s',
+                   rows[0][0], rows[-1][0], err)
+    return []
+  return rows
+
+
+def collect_blobs(chunk, deadline=None, dry_run=False, start_id=0):
+  """Delete the blobs no kernel cache row references, chunk blob ids per
+  transaction from start_id until deadline. Returns the number of deleted
+  blobs, their size in bytes and the last scanned id, which is None if the
+  scan is complete. dry_run only counts them"""
+  last_id = start_id
+  num_blobs = size = 0
+  start = time()
+  while deadline is None or time() <= deadline:
+    with DbSession() as session:
+      # walks the primary key only, the bound caps the blobs locked per chunk
+      bound = session.query(KernelBlob.id).filter(KernelBlob.id > last_id)\
+          .order_by(KernelBlob.id).offset(chunk - 1).limit(1).scalar()
+      id_range = [KernelBlob.id > last_id]
+      if bound is not None:
+        id_range.append(KernelBlob.id <= bound)
+      rows = collect_chunk(session, id_range, dry_run)
+    num_blobs += len(rows)
+    size += sum(row[1] for row in rows)
+    LOGGER.info('kernel_blob: %s %u blobs, %u bytes (%.1fs)',
+                'found' if dry_run else 'deleted', num_blobs, size,
+                time() - start)
+    if bound is None:
+      return num_blobs, size, None
+    last_id = bound
+  return num_blobs, size, last_id
@@ -39,6 +39,9 @@ from tuna.metadata import NUM_SQL_RETRIES
 
 LOGGER = setup_logger('db_utility')
 
+#solver table rows by name, loaded once per process
+SOLVER_CATALOGUE = {}
+
 
 def get_id_solvers():
   """DB solver id to name map"""
@@ -55,6 +58,19 @@ def get_id_solvers():
   return id_solver_map_c, id_solver_map_h
 
 
+def get_solver_catalogue(session, reload=False):
+  """Solver table rows by name, the table is queried once per process and
+  the detached rows are reused afterwards"""
+  if reload:
+    SOLVER_CATALOGUE.clear()
+  if not SOLVER_CATALOGUE:
+    for slv in session.query(Solver).all():
+      session.expunge(slv)
+      SOLVER_CATALOGUE[slv.solver] = slv
+
+  return SOLVER_CATALOGUE
+
+
 def session_retry(session, callback, actuator, logger=LOGGER):
   """retry handling for a callback function using an actuator (lamda function with params)"""
   for idx in range(NUM_SQL_RETRIES):
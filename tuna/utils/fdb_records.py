@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Columnar find db records, fastest solver selection with numpy sorts"""
+
+from operator import attrgetter
+
+import numpy as np
+
+from tuna.utils.logger import setup_logger
+
+LOGGER = setup_logger('fdb_records')
+
+ROW_FIELDS = ['fdb_key', 'alg_lib', 'solver', 'kernel_time', 'workspace_sz']
+
+
+def group_starts(*cols):
+  """mask of the first element of each run of equal values in sorted columns"""
+  if not cols or np.size(cols[0]) == 0:
+    return np.zeros(0, dtype=bool)
+  starts = np.zeros(len(cols[0]), dtype=bool)
+  starts[0] = True
+  for col in cols:
+    starts[1:] |= col[1:] != col[:-1]
+  return starts
+
+
+def parse_text_val(val):
+  """solver, kernel time and workspace of a text find db value, the workspace
+  is 0 if missing. None if the value has no kernel time"""
+  fields = val.split(',')
+  try:
+    ktime = float(fields[1])
+  except (IndexError, ValueError):
+    return None
+  try:
+    workspace_sz = float(fields[2])
+  except (IndexError, ValueError):
+    workspace_sz = 0.0
+  return fields[0], ktime, workspace_sz
+
+
+def factorize(values):
+  """sorted unique values and the index of every value into them"""
+  uniques = sorted(dict.fromkeys(values))
+  index = {val: idx for idx, val in enumerate(uniques)}
+  return uniques, np.fromiter(map(index.__getitem__, values),
+                              dtype=np.int64,
+                              count=len(values))
+
+
+class FdbRecords():  #pylint: disable=too-many-instance-attributes
+  """Find db records stored column wise, one numpy array per field.
+
+  fdb keys and algorithms are stored once in sorted lists and referenced by
+  index, rows keeps the source object of every record.
+  """
+
+  def __init__(self, keys, algs, rows, columns):
+    self.keys = keys
+    self.algs = algs
+    self.rows = rows
+    self.key_idx = np.asarray(columns['key_idx'], dtype=np.int64)
+    self.alg_idx = np.asarray(columns['alg_idx'], dtype=np.int64)
+    self.solver = np.asarray(columns['solver'])
+    self.kernel_time = np.asarray(columns['kernel_time'], dtype=np.float64)
+    self.workspace_sz = np.asarray(columns['workspace_sz'], dtype=np.float64)
+
+  def __len__(self):
+    return len(self.rows)
+
+  @classmethod
+  def from_columns(cls, rows, fdb_keys, alg_libs, **columns):
+    """build records from per record lists of fdb_key and alg_lib strings"""
+    keys, columns['key_idx'] = factorize(fdb_keys)
+    algs, columns['alg_idx'] = factorize(alg_libs)
+    return cls(keys, algs, rows, columns)
+
+  @classmethod
+  def from_rows(cls, rows):
+    """records from db rows with fdb_key, solver, alg_lib, kernel_time and
+    workspace_sz attributes"""
+    fields = [list(map(attrgetter(field), rows)) for field in ROW_FIELDS]
+    return cls.from_columns(rows,
+                            fields[0],
+                            fields[1],
+                            solver=fields[2],
+                            kernel_time=fields[3],
+                            workspace_sz=fields[4])
+
+  @classmethod
+  def from_text(cls, find_db):  #pylint: disable=too-many-locals
+    """records from a text find db {fdb_key: {alg: 'solver,time,ws,alg,..'}},
+    rows holds the value string of every record and keys all fdb_keys, also
+    those without records. Values without a kernel time are skipped"""
+    keys = sorted(find_db)
+    rank = {key: idx for idx, key in enumerate(keys)}
+    key_idx = []
+    alg_libs = []
+    rows = []
+    solvers = []
+    times = []
+    workspaces = []
+    for key, vals in find_db.items():
+      for alg_lib, val in vals.items():
+        fields = parse_text_val(val)
+        if fields is None:
+          LOGGER.warning('Skipping malformed find db entry %s: %s', key, val)
+          continue
+        key_idx.append(rank[key])
+        alg_libs.append(alg_lib)
+        rows.append(val)
+        solvers.append(fields[0])
+        times.append(fields[1])
+        workspaces.append(fields[2])
+
+    algs, alg_idx = factorize(alg_libs)
+    columns = {
+        'key_idx': key_idx,
+        'alg_idx': alg_idx,
+        'solver': np.array(solvers, dtype=object),
+        'kernel_time': times,
+        'workspace_sz': workspaces
+    }
+    return cls(keys, algs, rows, columns)
+
+  def unique_solvers(self):
+    """indices of the first record of each (fdb_key, solver), in record order"""
+    #lexsort is stable, the first record of a group comes first
+    order = np.lexsort((self.solver, self.key_idx))
+    starts = group_starts(self.key_idx[order], self.solver[order])
+    return np.sort(order[starts])
+
+  def fastest(self, idx=None, per_alg=True):
+    """indices of the fastest record per fdb_key and algorithm (or per fdb_key)
+
+    the result is ordered by fdb_key and kernel_time, ties keep the order in
+    which their algorithm first appears in idx
+    """
+    if idx is None:
+      idx = np.arange(len(self))
+    key = self.key_idx[idx]
+    ktime = self.kernel_time[idx]
+    group = key
+    if per_alg:
+      group = key * max(len(self.algs), 1) + self.alg_idx[idx]
+
+    order = np.lexsort((ktime, group))
+    starts = np.flatnonzero(group_starts(group[order]))
+    if starts.size == 0:
+      return idx[:0]
+    winners = order[starts]
+    #position in idx of the first record of each group
+    first_pos = np.minimum.reduceat(order, starts)
+
+    out = np.lexsort((first_pos, ktime[winners], key[winners]))
+    return idx[winners[out]]
+
+  def ordered(self, idx=None):
+    """indices ordered by fdb_key, then kernel_time, ties keep record order"""
+    if idx is None:
+      idx = np.arange(len(self))
+    return idx[np.lexsort((self.kernel_time[idx], self.key_idx[idx]))]
+
+  def key_counts(self, idx):
+    """number of indices for each entry of keys"""
+    return np.bincount(self.key_idx[idx], minlength=len(self.keys)).tolist()
+
+  def split_by_key(self, idx):
+    """split indices, grouped by fdb_key, into (fdb_key, index list) pairs"""
+    keys = self.key_idx[idx].tolist()
+    idx = np.asarray(idx).tolist()
+    bounds = (np.flatnonzero(np.diff(keys)) + 1).tolist()
+    return [(self.keys[keys[start]], idx[start:end])
+            for start, end in zip([0] + bounds, bounds + [len(idx)])
+            if start < end]
+
+  def best_solvers(self):
+    """{fdb_key: (solver, kernel_time)} of the fastest record of each key"""
+    idx = self.fastest(per_alg=False)
+    return {
+        self.keys[key]: (solver, ktime)
+        for key, solver, ktime in zip(self.key_idx[idx].tolist(
+        ), self.solver[idx].tolist(), self.kernel_time[idx].tolist())
+    }
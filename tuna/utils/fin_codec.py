@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+###############################################################################
+#
+# MIT License
+#
+# Copyright (c) 2022 Advanced Micro Devices, Inc.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+###############################################################################
+"""Compression of the fin payloads streamed to and from remote machines"""
+
+import gzip
+import lzma
+
+# auto picks the first codec whose tool is installed in the docker
+FIN_CODECS = ('auto', 'lzma', 'gzip', 'none')
+# tool, remote decompress and compress commands of a codec
+CODEC_TOOLS = {
+    'lzma': ('xz', 'xz -dc', 'xz -c -1'),
+    'gzip': ('gzip', 'gzip -dc', 'gzip -c -1')
+}
+CODEC_ERRORS = (lzma.LZMAError, OSError, EOFError)
+
+
+def negotiate_codec(installed, codec='auto'):
+  """Return the codec to use given the tools installed on the machine"""
+  if codec != 'auto':
+    return codec
+  for name, (tool, _, _) in CODEC_TOOLS.items():
+    if tool in installed:
+      return name
+  return 'none'
+
+
+def get_tools_cmd():
+  """Command listing the installed compression tools"""
+  return 'which ' + ' '.join(tool for tool, _, _ in CODEC_TOOLS.values())
+
+
+def compress(codec, data):
+  """Compress data with codec"""
+  if codec == 'lzma':
+    return lzma.compress(data, preset=3)
+  if codec == 'gzip':
+    return gzip.compress(data, compresslevel=6)
+  return data
+
+
+def decompress(codec, data):
+  """Decompress data with codec, raises one of CODEC_ERRORS if it is corrupt"""
+  if codec == 'lzma':
+    return lzma.decompress(data)
+  if codec == 'gzip':
+    return gzip.decompress(data)
+  return data
+
+
+def wrap_cmd(codec, cmd):
+  """Decompress the stdin and compress the stdout of cmd on the machine"""
+  if codec not in CODEC_TOOLS:
+    return cmd
+  _, decomp_cmd, comp_cmd = CODEC_TOOLS[codec]
+  return f'set -o pipefail; {decomp_cmd} | {cmd} | {comp_cmd}'
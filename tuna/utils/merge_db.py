@@ -35,6 +35,7 @@ from tuna.utils.logger import setup_logger
 from tuna.analyze_parse_db import parse_pdb_filename, insert_solver_sqlite, get_config_sqlite
 from tuna.analyze_parse_db import get_sqlite_row, get_sqlite_table, get_sqlite_data
 from tuna.helper import prune_cfg_dims
+from tuna.utils.fdb_records import FdbRecords
 from tuna.metadata import DIR_MAP
 
 LOGGER = setup_logger('merge_pdb')
@@ -197,21 +198,19 @@ def load_master_list(master_file):
   return master_list
 
 
+def best_solvers(find_db):
+  """returns {key: (fastest solver, time)} for all keys of a text find db"""
+  return FdbRecords.from_text(find_db).best_solvers()
+
+
 def best_solver(vals):
   """returns the fastest solver"""
-  min_time = float("inf")
-  b_solver = None
-  for val in vals.values():
-    solver, time, _, _, _ = val.split(',')
-    if float(time) < min_time:
-      min_time = float(time)
-      b_solver = solver
-
-  return b_solver, min_time
+  return best_solvers({'': vals}).get('', (None, float("inf")))
 
 
-def target_merge(master_list, key, vals, keep_keys):
-  """merge for explicit target file"""
+def target_merge(master_list, key, vals, keep_keys, bests=None):
+  """merge for explicit target file, bests holds precomputed
+  (old, new) best_solver results for key"""
   # pylint: disable-next=invalid-name ; @chris 'v' can use a better name, though
   fds, v, precision, direction, _ = parse_pdb_key(key, version='1.0.0')
   driver_cmd = build_driver_cmd(fds, v, precision, DIR_MAP[direction])
@@ -219,14 +218,15 @@ def target_merge(master_list, key, vals, keep_keys):
     LOGGER.info('%s: Missing Key \n %s', key, driver_cmd)
     master_list[key] = {}
   else:
-    old_solver, old_time = best_solver(master_list[key])
-    new_solver, new_time = best_solver(vals)
+    if bests is None:
+      bests = (best_solver(master_list[key]), best_solver(vals))
+    old_best, new_best = bests
 
     LOGGER.info(
         '%s: solver_change: %s, speedup: %s, Old Solver: (%s, %s), New Solver: (%s, %s) \n %s',
-        key, old_solver != new_solver,
-        float(new_time) < float(old_time), old_solver, old_time, new_solver,
-        new_time, driver_cmd)
+        key, old_best[0] != new_best[0],
+        float(new_best[1]) < float(old_best[1]), old_best[0], old_best[1],
+        new_best[0], new_best[1], driver_cmd)
 
   if keep_keys:
     #keep old key values
@@ -284,19 +284,34 @@ def multi_job_merge(master_list, machine_id, key, vals, res):
           master_list[key][s_id] = s_val
 
 
+def target_merge_file(master_list, local_file, keep_keys):
+  """merge all lines of an explicit target file, best solvers of the old and
+  new entries are picked for all keys at once"""
+  lines = [parse_jobline(line) for line in local_file]
+  target = dict(lines)
+  new_bests = best_solvers(target)
+  old_bests = best_solvers(
+      {key: master_list[key] for key in target if key in master_list})
+  no_solver = (None, float("inf"))
+  for key, vals in lines:
+    bests = (old_bests.get(key, no_solver), new_bests.get(key, no_solver))
+    target_merge(master_list, key, vals, keep_keys, bests)
+
+
 def update_master_list(master_list, local_paths, mids, keep_keys):
   """merge data in master_list with values from the file at local_path"""
   for local_path, machine_id in zip(local_paths, mids):
     with open(local_path) as local_file:  # pylint: disable=unspecified-encoding
       LOGGER.info('Processing file: %s', local_path)
+      if machine_id < 0:
+        #a file was selected explicitly to merge mid = -1
+        target_merge_file(master_list, local_file, keep_keys)
+        continue
       # read the file get rid of the duplicates by keeping the first entry
       for line in local_file:
         key, vals = parse_jobline(line)
         res = []
-        if machine_id < 0:
-          #a file was selected explicitly to merge mid = -1
-          target_merge(master_list, key, vals, keep_keys)
-        elif not res:
+        if not res:
           no_job_merge(master_list, key, vals)
         elif len(res) == 1:
           single_job_merge(master_list, machine_id, key, vals, res)
@@ -308,15 +323,20 @@ def write_merge_results(master_list, final_file, copy_files):
   """write merge results to file"""
   # serialize the file out
   LOGGER.info('Begin writing to file: %s', final_file)
+  records = FdbRecords.from_text(master_list)
+  #solvers of each key ordered by kernel time
+  order = records.ordered().tolist()
+  alg_idx = records.alg_idx.tolist()
+  params = [
+      f'{records.algs[alg_idx[idx]]}:{records.rows[idx]}' for idx in order
+  ]
+  start = 0
   with open(final_file, "w") as out_file:  # pylint: disable=unspecified-encoding
-    for perfdb_key, solvers in sorted(master_list.items(),
-                                      key=lambda kv: kv[0]):
-      params = []
-      for solver_id, solver_params in sorted(
-          solvers.items(), key=lambda kv: float(kv[1].split(',')[1])):
-        params.append(f'{solver_id}:{solver_params}')
+    for perfdb_key, count in zip(records.keys, records.key_counts(order)):
       # pylint: disable-next=consider-using-f-string ; more readble
-      perf_line = '{}={}'.format(perfdb_key, ';'.join(params))
+      perf_line = '{}={}'.format(perfdb_key,
+                                 ';'.join(params[start:start + count]))
+      start += count
       out_file.write(perf_line + '\n')
   LOGGER.info('Finished writing to file: %s', final_file)
 
@@ -94,6 +94,7 @@ def check_qts(hostname, logger=LOGGER):
 
 def get_env_vars():
   """Utility function to get Tuna specific env_vars"""
+  #pylint: disable=too-many-branches
   env_vars = {}
   if 'TUNA_DB_USER_NAME' in os.environ:
     env_vars['user_name'] = os.environ['TUNA_DB_USER_NAME']
@@ -111,6 +112,23 @@ def get_env_vars():
     env_vars['db_name'] = os.environ['TUNA_DB_NAME']
   else:
     env_vars['db_name'] = ''
+  if 'TUNA_DB_POOL_SIZE' in os.environ:
+    env_vars['pool_size'] = int(os.environ['TUNA_DB_POOL_SIZE'])
+  else:
+    env_vars['pool_size'] = 5
+  if 'TUNA_DB_POOL_MAX_OVERFLOW' in os.environ:
+    env_vars['pool_max_overflow'] = int(os.environ['TUNA_DB_POOL_MAX_OVERFLOW'])
+  else:
+    env_vars['pool_max_overflow'] = 10
+  if 'TUNA_DB_POOL_RECYCLE' in os.environ:
+    env_vars['pool_recycle'] = int(os.environ['TUNA_DB_POOL_RECYCLE'])
+  else:
+    env_vars['pool_recycle'] = 3600
+  if 'TUNA_DB_POOL_PRE_PING' in os.environ:
+    env_vars['pool_pre_ping'] = os.environ['TUNA_DB_POOL_PRE_PING'] not in (
+        '0', 'false', 'False')
+  else:
+    env_vars['pool_pre_ping'] = True
   if 'SLURM_CPUS_ON_NODE' in os.environ:
     env_vars['slurm_cpus'] = int(os.environ['SLURM_CPUS_ON_NODE'])
   else:
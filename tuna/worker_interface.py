@@ -25,7 +25,8 @@
 #
 ###############################################################################
 """Module that represents the WorkerInterface class interface"""
-from multiprocessing import Process, Lock
+# pylint: disable=too-many-lines
+from multiprocessing import Process, Lock, Condition
 try:
   import queue
 except ImportError:
@@ -37,26 +38,44 @@ from datetime import datetime
 import socket
 import random
 import string
-from time import sleep
-from sqlalchemy import func as sqlalchemy_func
+from time import sleep, time
+from sqlalchemy import exists, func as sqlalchemy_func
 from sqlalchemy.exc import IntegrityError, OperationalError  #pylint: disable=wrong-import-order
 
 from tuna.dbBase.sql_alchemy import DbSession
-from tuna.utils.db_utility import get_id_solvers, session_retry
-from tuna.abort import chk_abort_file
+from tuna.db_engine import get_pool_stats
+from tuna.utils.db_utility import get_id_solvers, get_solver_catalogue
+from tuna.utils.db_utility import session_retry
+from tuna.abort import chk_abort_file, chk_abort_flag
 from tuna.fin_utils import compose_config_obj
-from tuna.fin_utils import get_fin_slv_status
+from tuna.fin_utils import get_fin_slv_status, get_result_solvers
 from tuna.metadata import TUNA_LOG_DIR, TUNA_DOCKER_NAME, PREC_TO_CMD
 from tuna.metadata import TABLE_COLS_FUSION_MAP, TABLE_COLS_CONV_MAP, INVERS_DIR_MAP
 from tuna.metadata import ENV_SLVGRP_MAP, SLV_ENV_MAP
 from tuna.metadata import FIND_ONLY_EXCEPTION
 from tuna.metadata import get_solver_ids, TENSOR_PRECISION
-from tuna.metadata import NUM_SQL_RETRIES
+from tuna.metadata import NUM_SQL_RETRIES, ROCM_V_CMD, MIOPEN_V_CMD
+from tuna.metadata import FIN_STREAM_CMD, FIN_TRANSPORTS
 from tuna.tables import DBTables
+from tuna.utils.blob_store import store_blob
+from tuna.utils.fin_codec import FIN_CODECS, CODEC_ERRORS, get_tools_cmd
+from tuna.utils.fin_codec import negotiate_codec, compress, decompress, wrap_cmd
+from tuna.node_blob_cache import NodeBlobCache, FinInput, BLOB_CACHE_SIZE
+from tuna.node_blob_cache import expand_blobs, BLOB_MISSING
 from tuna.db_tables import connect_db
 from tuna.config_type import ConfigType
 
 MAX_JOB_RETRIES = 10
+# a claimed batch should keep all processes on a machine busy for about this long
+CLAIM_INTERVAL = 120.0  # in seconds
+MAX_CLAIM_FACTOR = 4
+# max wait before claiming again when all candidate jobs are locked
+CLAIM_BACKOFF = 0.5  # in seconds
+MIN_RUNTIME_SAMPLES = 5
+# job states that are published in the job event table
+JOB_EVENT_STATES = ('compiled',)
+# job states that will still lead to a compiled job
+PRE_COMPILE_STATES = ('new', 'started', 'compile_start', 'compiling')
 
 TABLE_COLS_CONV_INVMAP = {}
 for clarg, cnvparam in TABLE_COLS_CONV_MAP.items():
@@ -73,6 +92,8 @@ for clarg, cnvparam in TABLE_COLS_FUSION_MAP.items():
     TABLE_COLS_FUSION_INVMAP[cnvparam[0]] = clarg
 
 LOG_TIMEOUT = 10 * 60.0  # in seconds
+# how long the first process at a barrier waits for hung processes
+BARRIER_TIMEOUT = 30 * 60.0  # in seconds
 
 
 class WorkerInterface(Process):
@@ -88,10 +109,12 @@ class WorkerInterface(Process):
     super().__init__()
 
     allowed_keys = set([
-        'machine', 'gpu_id', 'num_procs', 'barred', 'bar_lock', 'envmt',
-        'reset_interval', 'fin_steps', 'fin_infile', 'fin_outfile', 'job_queue',
-        'queue_lock', 'label', 'fetch_state', 'docker_name', 'end_jobs',
-        'config_type', 'dynamic_solvers_only', 'session_id'
+        'machine', 'gpu_id', 'num_procs', 'barred', 'bar_lock', 'bar_cond',
+        'abort_flag', 'health', 'envmt', 'reset_interval', 'fin_steps',
+        'fin_infile', 'fin_outfile', 'job_queue', 'queue_lock', 'label',
+        'fetch_state', 'docker_name', 'end_jobs', 'config_type',
+        'dynamic_solvers_only', 'session_id', 'fin_batch', 'prefetch',
+        'fin_transport', 'fin_codec', 'blob_cache_size'
     ])
     self.__dict__.update((key, None) for key in allowed_keys)
 
@@ -101,6 +124,9 @@ class WorkerInterface(Process):
     self.num_procs = None
     self.barred = None
     self.bar_lock = Lock()
+    self.bar_cond = None
+    self.abort_flag = None
+    self.health = None
     self.envmt = []
     self.fin_steps = []
     self.fin_infile = None
@@ -120,10 +146,31 @@ class WorkerInterface(Process):
     self.config_type = ConfigType.convolution if self.config_type is None else self.config_type
     self.config_dict = None
     self.session_id = None
+    self.fin_batch = 1
+    self.prefetch = False
+    self.fin_transport = FIN_TRANSPORTS[0]
+    self.fin_codec = FIN_CODECS[0]
+    self.blob_cache_size = BLOB_CACHE_SIZE
 
     self.__dict__.update(
         (key, value) for key, value in kwargs.items() if key in allowed_keys)
 
+    if self.bar_cond is None:
+      # only wakes processes sharing this object, go_fish passes one per machine
+      self.bar_cond = Condition(self.bar_lock)
+    self.barrier_stats = {'waits': 0, 'wait_time': 0.0}
+    self.fin_codec_used = None
+    self.blob_cache = None
+    self.payload_stats = {
+        'jobs': 0,
+        'in_raw': 0,
+        'in_sent': 0,
+        'out_recv': 0,
+        'out_raw': 0,
+        'compress_time': 0.0,
+        'decompress_time': 0.0
+    }
+
     self.dbt = DBTables(session_id=self.session_id,
                         config_type=self.config_type)
 
@@ -137,7 +184,18 @@ class WorkerInterface(Process):
     self.config = None
     self.solver = None
     self.cmd_iter = 1
-    self.claim_num = self.num_procs.value
+    self.fin_batch = max(1, self.fin_batch or 1)
+    self.job_batch = []
+    self.claim_num = self.num_procs.value * self.fin_batch
+    self.claim_stats = {
+        'claims': 0,
+        'claimed_jobs': 0,
+        'conflicts': 0,
+        'latency': 0.0
+    }
+    self.job_start = None
+    self.job_runtime = None
+    self.runtime_samples = 0
     self.last_reset = datetime.now()
 
     dir_name = os.path.join(TUNA_LOG_DIR,
@@ -153,14 +211,41 @@ class WorkerInterface(Process):
     #also set cnx here in case WorkerInterface exec_command etc called directly
     self.cnx = self.machine.connect(chk_abort_file)
 
+  def chk_abort(self):
+    """Check if this machine should abort, reads the flag published by the
+    node abort watcher when go_fish provides one"""
+    return chk_abort_flag(self.abort_flag, self.machine.id, self.logger,
+                          self.machine.arch)
+
+  def health_sample(self):
+    """Machine health shared by go_fish, None if there is no fresh sample"""
+    if self.health is not None and self.health.is_fresh():
+      return self.health
+    return None
+
+  def get_used_space(self):
+    """Used disk space in percent from the shared health sample, checks the
+    machine if there is no fresh sample"""
+    health = self.health_sample()
+    if health is not None:
+      return health.get_used_space()
+    return self.machine.getusedspace()
+
   def check_env(self):
     """Checking that presumed rocm/miopen_v corresponds to the env rocm/miopen_v"""
-    env_rocm_v = self.get_rocm_v()
+    health = self.health_sample()
+    if health is not None:
+      env_rocm_v = health.get_rocm_v()
+    else:
+      env_rocm_v = self.get_rocm_v()
     if self.dbt.session.rocm_v != env_rocm_v:
       raise ValueError(
           f'session rocm_v {self.dbt.session.rocm_v} does not match env rocm_v {env_rocm_v}'
       )
-    env_miopen_v = self.get_miopen_v()
+    if health is not None:
+      env_miopen_v = health.get_miopen_v()
+    else:
+      env_miopen_v = self.get_miopen_v()
     if self.dbt.session.miopen_v != env_miopen_v:
       raise ValueError(
           f'session rocm_v {self.dbt.session.rocm_v} does not match env rocm_v {env_rocm_v}'
@@ -203,6 +288,8 @@ class WorkerInterface(Process):
     """Function to reset machhine"""
     self.machine.restart_server()
     self.last_reset = datetime.now()
+    if self.health is not None:
+      self.health.invalidate()
 
   def process_log_line(self, stdout):
     """Parse log from run command"""
@@ -214,9 +301,8 @@ class WorkerInterface(Process):
 
     for line in stdout:
       try:
-        if chk_abort_file(self.machine.id, self.logger, self.machine.arch):
-          with self.bar_lock:
-            self.num_procs.value -= 1
+        if self.chk_abort():
+          self.release_proc()
           break
         decoded_line = line.strip()  # lines.strip().decode()
         self.logger.info(decoded_line)
@@ -286,30 +372,47 @@ class WorkerInterface(Process):
 
     return success
 
-  def compose_job_query(self, find_state, session):
-    """Helper function to compose query"""
+  def get_job_filters(self, find_state):
+    """Criteria of the jobs to claim in find_state"""
+    job_table = self.dbt.job_table
+    config_table = self.dbt.config_table
     # pylint: disable=comparison-with-callable
-    query = session.query(self.dbt.job_table, self.dbt.config_table)\
-                          .filter(self.dbt.job_table.session == self.dbt.session.id)\
-                          .filter(self.dbt.job_table.valid == 1)\
-                          .filter(self.dbt.config_table.valid == 1)
+    filters = [
+        job_table.session == self.dbt.session.id, job_table.valid == 1,
+        job_table.retries < MAX_JOB_RETRIES, job_table.state == find_state,
+        exists().where(config_table.id == job_table.config).where(
+            config_table.valid == 1)
+    ]
     # pylint: enable=comparison-with-callable
 
     if self.label:
-      query = query.filter(self.dbt.job_table.reason == self.label)
+      filters.append(job_table.reason == self.label)
     if self.fin_steps:
-      query = query.filter(
-          self.dbt.job_table.fin_step.like('%' + self.fin_steps[0] + '%'))
+      filters.append(job_table.fin_step.like('%' + self.fin_steps[0] + '%'))
     else:
-      query = query.filter(self.dbt.job_table.fin_step == 'not_fin')
-    query = query.filter(self.dbt.job_table.retries < MAX_JOB_RETRIES)\
-      .filter(self.dbt.job_table.state == find_state)\
-      .filter(self.dbt.config_table.id == self.dbt.job_table.config)
-
-    query = query.order_by(self.dbt.job_table.retries.asc()).limit(
-        self.claim_num).with_for_update()
+      filters.append(job_table.fin_step == 'not_fin')
+    return filters
 
-    return query
+  def compose_job_query(self, find_state, session):
+    """Query the ids of the jobs to claim, the job rows are loaded after the
+    claim so that only they are locked"""
+    query = session.query(self.dbt.job_table.id)\
+        .filter(*self.get_job_filters(find_state))\
+        .order_by(self.dbt.job_table.retries.asc()).limit(self.claim_num)
+
+    if session.bind.dialect.name == 'sqlite':
+      # no row locks in sqlite, the claim update locks the whole db instead
+      return query
+
+    # rows held by a concurrent claim are skipped instead of waited on, the
+    # config rows of the subquery are read without a lock
+    return query.with_for_update(skip_locked=True)
+
+  def jobs_pending(self, session, find_state):
+    """True if jobs are left in find_state, locked ones included"""
+    query = session.query(self.dbt.job_table.id)\
+        .filter(*self.get_job_filters(find_state))
+    return session.query(query.exists()).scalar()
 
   def get_fdb_entry(self, session, solver):
     """ Get FindDb entry from db """
@@ -362,16 +465,17 @@ class WorkerInterface(Process):
     # Now we have the ID, lets add the binary cache objects
     for kern_obj in fdb_obj['kernel_objects']:
       kernel_obj = self.dbt.kernel_cache()
-      self.populate_kernels(kern_obj, kernel_obj)
+      self.populate_kernels(session, kern_obj, kernel_obj)
       kernel_obj.kernel_group = fdb_entry.kernel_group
       session.add(kernel_obj)
     return True
 
-  def populate_kernels(self, kern_obj, kernel_obj):
-    """populate kernel object"""
+  def populate_kernels(self, session, kern_obj, kernel_obj):
+    """populate kernel object, the binary goes to the blob store"""
     kernel_obj.kernel_name = kern_obj['kernel_file']
     kernel_obj.kernel_args = kern_obj['comp_options']
-    kernel_obj.kernel_blob = bytes(kern_obj['blob'], 'utf-8')
+    kernel_obj.kernel_blob = None
+    kernel_obj.blob_id = store_blob(session, kern_obj['blob'])
     kernel_obj.kernel_hash = kern_obj['md5_sum']
     kernel_obj.uncompressed_size = kern_obj['uncompressed_size']
     return kernel_obj
@@ -439,6 +543,23 @@ class WorkerInterface(Process):
     with self.bar_lock:
       self.end_jobs.value = 0
 
+  def get_tunable_configs(self, session, cfg_ids):
+    """Configs among cfg_ids with an applicable tunable solver in this
+    session, resolved with a single query"""
+    if not cfg_ids:
+      return set()
+
+    # pylint: disable=comparison-with-callable
+    query = session.query(self.dbt.solver_app.config).distinct()\
+        .filter(self.dbt.solver_app.session == self.dbt.session.id)\
+        .filter(self.dbt.solver_app.applicable == 1)\
+        .filter(self.dbt.solver_app.config.in_(cfg_ids))\
+        .filter(self.dbt.solver_app.solver == self.dbt.solver_table.id)\
+        .filter(self.dbt.solver_table.tunable == 1)
+    # pylint: enable=comparison-with-callable
+
+    return {cfg_id for cfg_id, in query.all()}
+
   def load_job_queue(self, session, ids):
     """load job_queue with info for job ids"""
     # pylint: disable=comparison-with-callable
@@ -453,28 +574,19 @@ class WorkerInterface(Process):
       raise Exception(
           f'Failed to load job queue. #ids: {len(ids)} - #job_cgfs: {len(job_cfgs)}'
       )
+    catalogue = get_solver_catalogue(session)
+    tunable_cfgs = self.get_tunable_configs(
+        session, {job.config for job, _ in job_cfgs if not job.solver})
+
     for job, config in job_cfgs:
       if job.solver:
-        query = session.query(self.dbt.solver_table)\
-            .filter(self.dbt.solver_table.solver == job.solver)
-        solver = query.one()
+        if job.solver not in catalogue:
+          # solver added since the catalogue was loaded
+          catalogue = get_solver_catalogue(session, reload=True)
+        solver = catalogue[job.solver]
       else:
-        query = session.query(self.dbt.solver_app, self.dbt.solver_table)
-
-        # pylint: disable=comparison-with-callable
-        query = query.filter(self.dbt.solver_app.session == self.dbt.session.id)\
-                     .filter(self.dbt.solver_app.applicable == 1)\
-                     .filter(self.dbt.solver_table.tunable == 1)\
-                     .filter(self.dbt.solver_app.config == job.config)\
-                     .filter(self.dbt.solver_app.solver == self.dbt.solver_table.id)\
-                     .filter(self.dbt.solver_table.tunable == 1)
-        # pylint: enable=comparison-with-callable
-
-        app_solver_desc = query.all()
-        ids = [solver.id for _, solver in app_solver_desc]
-
         solver = self.dbt.solver_table()
-        if ids:
+        if job.config in tunable_cfgs:
           solver.tunable = 1
         else:
           self.logger.warning(
@@ -485,9 +597,70 @@ class WorkerInterface(Process):
       self.job_queue.put((job, config, solver))
       self.logger.info("Put job %s %s %s", job.id, job.state, job.reason)
 
-  #pylint: disable=too-many-branches
+  def record_job_runtime(self):
+    """Track a moving average of the time spent per job by this process"""
+    if self.job_start is None:
+      return
+    #a fin launch covers the whole batch, track the time per job
+    elapsed = (time() - self.job_start) / max(len(self.job_batch), 1)
+    self.job_start = None
+    if self.job_runtime is None:
+      self.job_runtime = elapsed
+    else:
+      self.job_runtime = 0.8 * self.job_runtime + 0.2 * elapsed
+    self.runtime_samples += 1
+
+  def update_claim_num(self):
+    """Size the next claim from the observed job runtime"""
+    if self.runtime_samples < MIN_RUNTIME_SAMPLES or not self.job_runtime:
+      return self.claim_num
+
+    num_procs = max(self.num_procs.value, 1)
+    claim_num = int(num_procs * CLAIM_INTERVAL / self.job_runtime)
+    self.claim_num = max(self.fin_batch,
+                         min(claim_num, num_procs * MAX_CLAIM_FACTOR))
+    return self.claim_num
+
+  def claim_jobs(self, session, find_state, set_state):
+    """Select and mark a batch of jobs in a single transaction,
+    returns the claimed job ids"""
+    start = time()
+    query = self.compose_job_query(find_state, session)
+    ids = tuple(str(job_id) for job_id, in query.all())
+
+    if not ids:
+      session.commit()
+      return ()
+
+    if set_state == "eval_start":
+      mid_col = self.dbt.job_table.eval_mid
+    else:
+      #note for a compile job gpu_id is an index 0 tuna process number, not a gpu
+      mid_col = self.dbt.job_table.machine_id
+    session.query(self.dbt.job_table).filter(
+        self.dbt.job_table.id.in_(ids)).update(
+            {
+                self.dbt.job_table.state: set_state,
+                mid_col: self.machine.id,
+                self.dbt.job_table.gpu_id: self.gpu_id
+            },
+            synchronize_session='fetch')
+    session.commit()
+
+    latency = time() - start
+    self.claim_stats['claims'] += 1
+    self.claim_stats['claimed_jobs'] += len(ids)
+    self.claim_stats['latency'] += latency
+    self.logger.info(
+        'Claimed %s %s jobs in %.3fs (claims: %s, jobs: %s, conflicts: %s)',
+        len(ids), find_state, latency, self.claim_stats['claims'],
+        self.claim_stats['claimed_jobs'], self.claim_stats['conflicts'])
+
+    return ids
+
   def get_job(self, find_state, set_state, imply_end):
     """Interface function to get new job for builder/evaluator"""
+    self.record_job_runtime()
     for idx in range(NUM_SQL_RETRIES):
       try:
         with self.queue_lock:
@@ -495,12 +668,18 @@ class WorkerInterface(Process):
             self.logger.warning('No %s jobs found, skip query', find_state)
             return False
           if self.job_queue.empty():
-            ids = ()
+            self.update_claim_num()
             with DbSession() as session:
-              query = self.compose_job_query(find_state, session)
-              job_cfgs = query.all()
-
-              if not job_cfgs:
+              ids = self.claim_jobs(session, find_state, set_state)
+              while not ids and self.jobs_pending(session, find_state):
+                # every candidate is held by a concurrent claim, those
+                # commit shortly and move their jobs out of find_state
+                session.commit()
+                self.claim_stats['conflicts'] += 1
+                sleep(random.uniform(0, CLAIM_BACKOFF))
+                ids = self.claim_jobs(session, find_state, set_state)
+
+              if not ids:
                 # we are done
                 self.logger.warning(
                     'No %s jobs found, fin_step: %s, session %s', find_state,
@@ -510,29 +689,7 @@ class WorkerInterface(Process):
                   self.end_jobs.value = 1
                 return False
 
-              ids = tuple((str(job_row.id) for job_row, _ in job_cfgs))
               self.logger.info("%s jobs %s", find_state, ids)
-              if set_state == "eval_start":
-                session.query(self.dbt.job_table).filter(
-                    self.dbt.job_table.id.in_(ids)).update(
-                        {
-                            self.dbt.job_table.state: set_state,
-                            self.dbt.job_table.eval_mid: self.machine.id,
-                            self.dbt.job_table.gpu_id: self.gpu_id
-                        },
-                        synchronize_session='fetch')
-              else:
-                #note for a compile job gpu_id is an index 0 tuna process number, not a gpu
-                session.query(self.dbt.job_table).filter(
-                    self.dbt.job_table.id.in_(ids)).update(
-                        {
-                            self.dbt.job_table.state: set_state,
-                            self.dbt.job_table.machine_id: self.machine.id,
-                            self.dbt.job_table.gpu_id: self.gpu_id
-                        },
-                        synchronize_session='fetch')
-              session.commit()
-
               self.load_job_queue(session, ids)
 
           #also in queue_lock
@@ -541,16 +698,20 @@ class WorkerInterface(Process):
           self.logger.info("Got job %s %s %s", self.job.id, self.job.state,
                            self.job.reason)
 
+        self.job_start = time()
         return True
       except OperationalError as error:
-        self.logger.warning('%s, Db contention, sleeping ...', error)
-        sleep(random.randint(1, 30))
+        # with skip locked claims this is a deadlock or lost connection, not
+        # a queue collision, so a short bounded backoff is enough
+        self.claim_stats['conflicts'] += 1
+        self.logger.warning('%s, Db contention, attempt %s ...', error, idx)
+        sleep(random.uniform(0, min(2**idx, 30)))
       except IntegrityError as error:
-        session.rollback()
+        self.claim_stats['conflicts'] += 1
         self.logger.warning(
             'Attempt %s to update job (host = %s, worker = %s) failed (%s), retrying ... ',
             idx, self.hostname, self.gpu_id, error)
-        sleep(5)
+        sleep(random.uniform(0, min(2**idx, 30)))
       except queue.Empty:
         self.logger.warning('Shared job queue empty, retrying ... ')
 
@@ -559,6 +720,51 @@ class WorkerInterface(Process):
         NUM_SQL_RETRIES, self.hostname, self.gpu_id)
     return False
 
+  def get_queued_job(self):
+    """Take a job that is already claimed from the shared queue, does not
+    claim new jobs"""
+    with self.queue_lock:
+      try:
+        self.job, self.config, self.solver = self.job_queue.get_nowait()
+      except queue.Empty:
+        return False
+      self.config_dict = compose_config_obj(self.config)
+    self.logger.info("Got job %s %s %s", self.job.id, self.job.state,
+                     self.job.reason)
+    return True
+
+  def get_job_batch(self, find_state, set_state, imply_end):
+    """Get up to fin_batch jobs for a single fin launch, only the first job
+    may claim new jobs from the db"""
+    found = self.get_job(find_state, set_state, imply_end)
+    self.job_batch = []
+    if not found:
+      return self.job_batch
+
+    self.job_batch.append((self.job, self.config, self.solver))
+    while len(self.job_batch) < self.fin_batch and self.get_queued_job():
+      self.job_batch.append((self.job, self.config, self.solver))
+
+    return self.job_batch
+
+  def batch_jobs(self):
+    """Jobs of the current fin launch, the current job if no batch was
+    claimed"""
+    if not self.job_batch:
+      self.job_batch = [(self.job, self.config, self.solver)]
+    return self.job_batch
+
+  def use_job(self, job_item):
+    """Make a (job, config, solver) entry of the batch the current job"""
+    self.job, self.config, self.solver = job_item
+    self.config_dict = compose_config_obj(self.config)
+
+  def set_batch_state(self, state, **kwargs):
+    """Set the state of every job in the batch"""
+    for job_item in self.batch_jobs():
+      self.use_job(job_item)
+      self.set_job_state(state, **kwargs)
+
   # JD: This should take a session obj as an input to remove the creation of an extraneous session
   def set_job_state(self, state, increment_retries=False, result=''):
     """Interface function to update job state for builder/evaluator"""
@@ -596,6 +802,11 @@ class WorkerInterface(Process):
                       self.dbt.job_table.cache_loc: cache_loc,
                       self.dbt.job_table.result: result
                   })
+          if state in JOB_EVENT_STATES:
+            session.add(
+                self.dbt.job_event_table(session=self.dbt.session.id,
+                                         job_id=self.job.id,
+                                         state=state))
           session.commit()
           return True
         except OperationalError as error:
@@ -622,11 +833,12 @@ class WorkerInterface(Process):
       err.channel.settimeout(LOG_TIMEOUT)
     return ret_code, out, err
 
-  def exec_docker_cmd(self, cmd):
+  def exec_docker_cmd(self, cmd, cnx=None):
     """forward command execution to machine method"""
     ret_code, out, err = self.machine.exec_command(cmd,
                                                    docker_name=self.docker_name,
-                                                   timeout=LOG_TIMEOUT)
+                                                   timeout=LOG_TIMEOUT,
+                                                   cnx=cnx)
     if out:
       out = out.read().strip()
     if not out and err:
@@ -640,15 +852,13 @@ class WorkerInterface(Process):
 
   def get_miopen_v(self):
     """Interface function to get new branch hash"""
-    _, out, _ = self.exec_docker_cmd(
-        "cat /opt/rocm/miopen/include/miopen/version.h "
-        "| grep MIOPEN_VERSION_TWEAK | cut -d ' ' -f 3")
+    _, out, _ = self.exec_docker_cmd(MIOPEN_V_CMD)
     self.logger.info('Got branch commit hash: %s', out)
     return out
 
   def get_rocm_v(self):
     """Interface function to get rocm version info"""
-    _, out, _ = self.exec_docker_cmd("cat /opt/rocm/.info/version")
+    _, out, _ = self.exec_docker_cmd(ROCM_V_CMD)
     self.logger.info('Got rocm version: %s', out)
     return out
 
@@ -676,19 +886,174 @@ class WorkerInterface(Process):
                   lcl_envmt.append(cnstr)
     return lcl_envmt
 
-  def run_fin_cmd(self):
-    """Run a fin command after generating the JSON"""
-    fin_output = self.machine.make_temp_file()
+  def write_fin_input(self, fin_input):
+    """Serialize the fin input, it is kept in memory when streaming and
+    written to a temp file on the machine otherwise"""
+    if self.fin_transport == 'stream':
+      # negotiated here so the fin thread of an evaluator only reads it
+      self.get_fin_codec()
+      blobs = self.cache_blobs(fin_input)
+      return FinInput(json.dumps(fin_input, indent=2).encode(), blobs)
+    fin_input = json.dumps(fin_input, indent=2).encode()
+    return self.machine.write_file(fin_input, is_temp=True)
+
+  def cache_blobs(self, fin_input):
+    """Replace the kernel blobs of the fin jobs by references to the blob cache
+    of the machine, returns the referenced md5 -> blob"""
+    blobs = {}
+    if self.machine.local_machine or not self.blob_cache_size:
+      return blobs
+    if self.blob_cache is None:
+      self.blob_cache = NodeBlobCache(self.machine, self.blob_cache_size)
+    fjobs = fin_input if isinstance(fin_input, list) else [fin_input]
+    fjobs = [fjob for fjob in fjobs if isinstance(fjob, dict)]
+    job_ids = [job.id for job, _, _ in self.job_batch]
+    if len(job_ids) != len(fjobs):
+      job_ids = [None] * len(fjobs)
+    for job_id, fjob in zip(job_ids, fjobs):
+      hits, misses = self.blob_cache.prepare(fjob, blobs)
+      if hits or misses:
+        self.logger.info('Blob cache job %s: %u hits, %u misses', job_id, hits,
+                         misses)
+    return blobs
+
+  def get_fin_codec(self):
+    """Codec of the streamed fin payloads, negotiated once with the machine.
+    Local machines do not compress"""
+    if self.fin_codec_used is None:
+      if self.machine.local_machine:
+        self.fin_codec_used = 'none'
+      else:
+        installed = ''
+        if self.fin_codec == 'auto':
+          _, installed, _ = self.exec_docker_cmd(get_tools_cmd())
+        self.fin_codec_used = negotiate_codec(installed or '', self.fin_codec)
+      self.logger.info('Fin payload codec: %s', self.fin_codec_used)
+    return self.fin_codec_used
+
+  def record_payload(self, sizes, times, num_jobs):
+    """Count the streamed payload sizes (raw in, sent, received, raw out) and
+    the compress/decompress times of a fin launch of num_jobs jobs"""
+    num_jobs = max(1, num_jobs)
+    for key, val in zip(('in_raw', 'in_sent', 'out_recv', 'out_raw'), sizes):
+      self.payload_stats[key] += val
+    self.payload_stats['compress_time'] += times[0]
+    self.payload_stats['decompress_time'] += times[1]
+    self.payload_stats['jobs'] += num_jobs
+    self.logger.info(
+        'Fin payload %s per job: in %u -> %u bytes (%.3fs), out %u -> %u bytes'
+        ' (%.3fs)', self.fin_codec_used, sizes[0] / num_jobs,
+        sizes[1] / num_jobs, times[0] / num_jobs, sizes[2] / num_jobs,
+        sizes[3] / num_jobs, times[1] / num_jobs)
+
+  def get_fin_stream_cmd(self, codec, blobs):
+    """fin command reading a streamed input which references the cached blobs
+    of the machine, if any"""
+    cmd = f'{" ".join(self.envmt)} {FIN_STREAM_CMD}'
+    if blobs:
+      cmd = f'{self.blob_cache.get_expand_cmd()} | {cmd}'
+    cmd = wrap_cmd(codec, cmd)
+    if blobs:
+      cmd = f'{self.blob_cache.get_touch_cmd(blobs)}; set -o pipefail; {cmd}'
+    return cmd
+
+  def exec_fin_stream(self, cmd, payload, blobs, cnx=None):
+    """Run the streaming fin command, retried on disk I/O errors. Returns the
+    output, None if fin failed, and False if the command could not be run
+    over the exec channel or a cached blob is missing"""
+    for i in range(MAX_JOB_RETRIES):
+      ret_code, out, err = self.machine.exec_stream(
+          cmd,
+          payload,
+          docker_name=self.docker_name,
+          timeout=LOG_TIMEOUT,
+          cnx=cnx)
+      for line in err.splitlines():
+        self.logger.info(line)
+      if ret_code is None:
+        self.logger.error('Unable to stream command: %s', cmd)
+        return False
+      if ret_code == 0:
+        return out
+      self.logger.error('Error executing command: %s', cmd)
+      self.logger.error('%s : %s', ret_code, err[-1024:])
+      if blobs and BLOB_MISSING in err:
+        return False
+      if "disk I/O error" not in err:
+        break
+      self.logger.error('fin retry : %u', i)
+      sleep(random.randint(1, 10))
+    return None
+
+  def run_fin_stream(self, fin_input, num_jobs, cnx=None):
+    """Run fin with its input on stdin and its output on fd 3. Returns the fin
+    output, None if fin failed, and False if the input or output could not be
+    passed over the exec channel"""
+    codec = self.get_fin_codec()
+    start = time()
+    payload = compress(codec, fin_input)
+    compress_time = time() - start
+    blobs = getattr(fin_input, 'blobs', None)
+    out = self.exec_fin_stream(self.get_fin_stream_cmd(codec, blobs), payload,
+                               blobs, cnx)
+    if out is None or out is False:
+      return out
+    try:
+      start = time()
+      fin_output = decompress(codec, out)
+      self.record_payload(
+          (len(fin_input), len(payload), len(out), len(fin_output)),
+          (compress_time, time() - start), num_jobs)
+      return json.loads(fin_output)[1:]
+    except CODEC_ERRORS as cerr:
+      self.logger.error('Unable to decompress streamed fin output: %s', cerr)
+    except (TypeError, ValueError) as verr:
+      self.logger.error('Unable to parse streamed fin output: %s', verr)
+    return False
+
+  def run_fin_cmd(self, fin_input=None):
+    """Run a fin command after generating the JSON, or on a fin input that
+    is already prepared"""
+    if fin_input is None:
+      fin_input = self.get_fin_input()  # pylint: disable=no-member
+    fin_json, self.fin_transport = self.run_fin_input(fin_input,
+                                                      self.batch_jobs())
+    return fin_json
+
+  def run_fin_input(self, fin_input, batch, cnx=None):
+    """Run fin on the prepared input of batch, on cnx if given. Streamed input
+    falls back to temp files if it could not be streamed, fin errors are not
+    retried. Returns the fin output and the transport to use from now on"""
+    if not isinstance(fin_input, bytes):
+      return self.run_fin_file(fin_input, cnx), 'file'
+
+    fin_json = self.run_fin_stream(fin_input, len(batch), cnx)
+    if fin_json is not False:
+      return fin_json, 'stream'
+    if getattr(fin_input, 'blobs', None):
+      self.logger.warning('Streaming fin input failed, retrying without the'
+                          ' blob cache')
+      self.blob_cache.forget(fin_input.blobs)
+      fin_input = expand_blobs(fin_input)
+      fin_json = self.run_fin_stream(fin_input, len(batch), cnx)
+      if fin_json is not False:
+        return fin_json, 'stream'
+    self.logger.warning('Streaming fin input failed, switching to temp files')
+    fin_input = self.machine.write_file(fin_input, is_temp=True, cnx=cnx)
+    return self.run_fin_file(fin_input, cnx), 'file'
+
+  def run_fin_file(self, fin_input, cnx=None):
+    """Run fin on an input file on the machine, the output goes through a
+    temp file"""
+    fin_output = self.machine.make_temp_file(cnx)
     cmd = []
 
     env_str = " ".join(self.envmt)
     cmd.append(env_str)
-    cmd.extend(
-        ['/opt/rocm/bin/fin', '-i',
-         self.get_fin_input(), '-o', fin_output])  # pylint: disable=no-member
+    cmd.extend(['/opt/rocm/bin/fin', '-i', fin_input, '-o', fin_output])
 
     for i in range(MAX_JOB_RETRIES):
-      ret_code, _, err = self.exec_docker_cmd(cmd)
+      ret_code, _, err = self.exec_docker_cmd(cmd, cnx)
 
       if ret_code != 0:
         self.logger.error('Error executing command: %s', ' '.join(cmd))
@@ -709,13 +1074,49 @@ class WorkerInterface(Process):
     if ret_code != 0:
       return None
 
-    # load the output json file and strip the env
-    fin_json = json.loads(self.machine.read_file(fin_output))[1:]
-    assert len(fin_json) == 1
-    # JD: if we implement multiple jobs per fin launch, this would be a loop
-    fin_json = fin_json[0]
+    # load the output json file and strip the env, one entry per input job
+    fin_json = json.loads(self.machine.read_file(fin_output, cnx=cnx))[1:]
+    xfer_stats = self.machine.get_xfer_stats(cnx)
+    if xfer_stats:
+      self.logger.info(
+          'sftp: %u opens, %u writes %u bytes %.2fs, %u reads %u bytes %.2fs',
+          xfer_stats['sftp_opens'], xfer_stats['writes'],
+          xfer_stats['bytes_written'], xfer_stats['write_time'],
+          xfer_stats['reads'], xfer_stats['bytes_read'],
+          xfer_stats['read_time'])
     return fin_json
 
+  def demux_fin_output(self, fin_json):
+    """Pair the fin output with the jobs of the batch, fin writes the results
+    in the order of the input jobs. If a result does not match its job, or
+    the number of results differs, every job of the batch gets None"""
+    batch = self.batch_jobs()
+    failed = [(job_item, None) for job_item in batch]
+    if fin_json is None:
+      return failed
+
+    if len(fin_json) != len(batch):
+      self.logger.error('Fin returned %s results for %s jobs, failing batch',
+                        len(fin_json), len(batch))
+      return failed
+    for idx, (job_item, job_json) in enumerate(zip(batch, fin_json)):
+      if not job_json:
+        continue
+      job, config, _ = job_item
+      if job_json.get('config_tuna_id') != config.id:
+        self.logger.error(
+            'Fin result %s is for config %s, expected %s, failing batch', idx,
+            job_json.get('config_tuna_id'), config.id)
+        return failed
+      solvers = get_result_solvers(job_json)
+      if job.solver and solvers - {job.solver}:
+        self.logger.error(
+            'Fin result %s is for solvers %s, expected %s, failing batch', idx,
+            sorted(solvers), job.solver)
+        return failed
+
+    return list(zip(batch, fin_json))
+
   def run_driver_cmd(self):
     """Definition of running the MIOpen driver cmd"""
 
@@ -761,84 +1162,110 @@ class WorkerInterface(Process):
 
     return self.exec_docker_cmd(cmd)
 
+  def release_proc(self):
+    """Remove this process from the running processes of the machine and wake
+    a barrier that may be waiting for it"""
+    with self.bar_cond:
+      self.num_procs.value -= 1
+      self.bar_cond.notify_all()
+
+  def record_barrier_wait(self, start):
+    """Track the time this process spent waiting at a barrier"""
+    elapsed = time() - start
+    self.barrier_stats['waits'] += 1
+    self.barrier_stats['wait_time'] += elapsed
+    self.logger.info('Barrier wait: %.3fs (waits: %s, total: %.3fs)', elapsed,
+                     self.barrier_stats['waits'],
+                     self.barrier_stats['wait_time'])
+
   def set_barrier(self, funct, with_timeout):
     """Setting time barrier for Process to define execution timeout"""
-    if self.barred.value == 0:
+    with self.bar_cond:
+      if self.barred.value != 0:
+        return False
       # this is the first proc to reach the barrier
-      with self.bar_lock:
-        self.barred.value += 1
-      self.logger.info('Waiting for other instances to pause')
-      wait_cnt = 0
-      timeout = False
-      while self.barred.value < self.num_procs.value:
-        sleep(10)
-        if with_timeout and self.barred.value == 1:
-          wait_cnt += 1
-          timeout = True
-          if wait_cnt > 180:
-            break
-      if timeout:
-        self.logger.warning(
-            'Timed out waiting for hung process, proceeding ... ')
-      else:
-        self.logger.info('Finished waiting for instances to pause')
-      funct()
-      with self.bar_lock:
-        self.barred.value = 0
-      return True
-
-    return False
+      self.barred.value += 1
+
+    self.logger.info('Waiting for other instances to pause')
+    start = time()
+    with self.bar_cond:
+      paused = self.bar_cond.wait_for(
+          lambda: self.barred.value >= self.num_procs.value,
+          BARRIER_TIMEOUT if with_timeout else None)
+    self.record_barrier_wait(start)
+    if not paused:
+      self.logger.warning('Timed out waiting for hung process, proceeding ... ')
+    else:
+      self.logger.info('Finished waiting for instances to pause')
+    funct()
+    with self.bar_cond:
+      self.barred.value = 0
+      self.bar_cond.notify_all()
+    return True
 
   def check_wait_barrier(self):
     """Checking time barrier"""
     self.logger.info('Checking barrier')
-    if self.barred.value != 0:
+    with self.bar_cond:
+      if self.barred.value == 0:
+        return False
       self.logger.info('Blocked procs found')
       self.logger.info('Current barrier count: %s', self.barred.value)
-      with self.bar_lock:
-        self.barred.value += 1
+      self.barred.value += 1
+      self.bar_cond.notify_all()
+
       self.logger.warning('Waiting for processes to finish')
-      while self.barred.value != 0:
-        sleep(60)
-      self.logger.warning('Finished waiting for processes')
-      return True
-    return False
+      start = time()
+      self.bar_cond.wait_for(lambda: self.barred.value == 0)
+    self.record_barrier_wait(start)
+    self.logger.warning('Finished waiting for processes')
+    return True
 
-  def get_compile_jobs(self):
-    """Checking num compile jobs left to determine
-    when the evaluator should stop waiting for jobs to compile"""
+  def get_job_event(self, state, cursor):
+    """Latest job event for state after cursor in this session, None if no
+    job reached state since cursor"""
     with DbSession() as session:
-      try:
-        # pylint: disable=comparison-with-callable
-        query = session.query(sqlalchemy_func.count(self.dbt.job_table.id))\
-            .filter(self.dbt.job_table.valid == 1)\
-            .filter(self.dbt.job_table.session == self.dbt.session.id)\
-            .filter(self.dbt.job_table.state.in_(('new', 'started', 'compile_start', 'compiling',
-                                                  'compiled')))
-        # pylint: enable=comparison-with-callable
-
-        if self.label:
-          query = query.filter(self.dbt.job_table.reason == self.label)
-        if self.fin_steps:
-          query = query.filter(
-              self.dbt.job_table.fin_step.like('%' + self.fin_steps[0] + '%'))
-        else:
-          query = query.filter(self.dbt.job_table.fin_step == 'not_fin')
-        compile_jobs = query.one()[0]
-      except IntegrityError as error:
-        session.rollback()
-        self.logger.warning('Attempt to get #compile jobs failed')
-        self.logger.warning(error)
-    return compile_jobs
+      event_table = self.dbt.job_event_table
+      # pylint: disable=comparison-with-callable
+      query = session.query(sqlalchemy_func.max(event_table.id))\
+          .filter(event_table.session == self.dbt.session.id)\
+          .filter(event_table.state == state)\
+          .filter(event_table.id > cursor)
+      # pylint: enable=comparison-with-callable
+      return query.scalar()
+
+  def compile_jobs_pending(self):
+    """Check if any job can still be compiled, to determine when the
+    evaluator should stop waiting for jobs to compile. Stops at the first
+    matching row instead of counting"""
+    with DbSession() as session:
+      # pylint: disable=comparison-with-callable
+      query = session.query(self.dbt.job_table.id)\
+          .filter(self.dbt.job_table.valid == 1)\
+          .filter(self.dbt.job_table.session == self.dbt.session.id)\
+          .filter(self.dbt.job_table.retries < MAX_JOB_RETRIES)\
+          .filter(self.dbt.job_table.state.in_(PRE_COMPILE_STATES))
+      # pylint: enable=comparison-with-callable
+
+      if self.label:
+        query = query.filter(self.dbt.job_table.reason == self.label)
+      if self.fin_steps:
+        query = query.filter(
+            self.dbt.job_table.fin_step.like('%' + self.fin_steps[0] + '%'))
+      else:
+        query = query.filter(self.dbt.job_table.fin_step == 'not_fin')
+      return session.query(query.exists()).scalar()
 
   def reset_job_state(self):
     """Helper function to reset job state during signal interrupt"""
-    if self.job and self.job.state != 'compiled' and self.job.state != 'evaluated':
-      self.logger.warning('resetting job state to %s', self.fetch_state[0])
-      if "new" in self.fetch_state:
-        self.set_job_state("new")
-      if "compiled" in self.fetch_state:
-        self.set_job_state("compiled")
+    for job_item in self.job_batch or [(self.job, self.config, self.solver)]:
+      self.job, self.config, self.solver = job_item
+      if self.job and self.job.state != 'compiled' and self.job.state != 'evaluated':
+        self.logger.warning('resetting job state to %s', self.fetch_state[0])
+        if "new" in self.fetch_state:
+          self.set_job_state("new")
+        if "compiled" in self.fetch_state:
+          self.set_job_state("compiled")
 
     while not self.job_queue.empty():
       try:
@@ -863,15 +1290,14 @@ class WorkerInterface(Process):
       while True:
         self.check_wait_barrier()
 
-        if chk_abort_file(self.machine.id, self.logger, self.machine.arch):
-          with self.bar_lock:
-            self.num_procs.value -= 1
+        if self.chk_abort():
+          self.release_proc()
           return False
 
         # re-establish node connection
         usage = None
         try:
-          usage = self.machine.getusedspace()
+          usage = self.get_used_space()
         except (socket.timeout, socket.error):
           usage = None
         if not usage:
@@ -885,6 +1311,7 @@ class WorkerInterface(Process):
         # the step member is defined in the derived class
         ret = self.step()  # pylint: disable=no-member
         self.logger.info("proc %s step %s", self.gpu_id, ret)
+        self.logger.info("db pool: %s", get_pool_stats())
         if not ret:
           self.logger.warning('No more steps, quiting...')
           return True
@@ -437,6 +437,12 @@ def pytestSuite1() {
            sh "pytest tests/test_fin_utils.py -s"
            sh "pytest tests/test_add_session.py -s"
            sh "pytest tests/test_merge_db.py -s"
+           sh "pytest tests/test_fdb_records.py -s"
+           sh "pytest tests/test_node_blob_cache.py -s"
+           sh "pytest tests/test_fin_codec.py -s"
+           sh "pytest tests/test_fleet.py -s"
+           sh "pytest tests/test_gc_fin_cache.py -s"
+           sh "pytest tests/test_export_db.py -s"
            // The OBMC host used in the following test is down
            // sh "pytest tests/test_mmi.py "
         }